@@ -7,25 +7,36 @@ RAG-powered lesson plan generator for K-12 teachers.
 import os
 import json
 import logging
-import re
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from contextlib import nullcontext
 from datetime import datetime
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Iterator
 from pathlib import Path
 
 # Flask and web components
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, Response, g, render_template, request, jsonify, send_from_directory, stream_with_context
 from werkzeug.exceptions import RequestEntityTooLarge
 
 # ML/AI libraries
 import numpy as np
 import faiss
 from sentence_transformers import SentenceTransformer
-from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM
-import torch
+from transformers import TextIteratorStreamer, StoppingCriteria, StoppingCriteriaList
+
+from bm25_index import reciprocal_rank_fusion
+from collection_registry import (Collection, CollectionRegistry, CollectionState, CollectionUnavailableError,
+                                 UnknownCollectionError)
+from query_cache import QueryEmbeddingCache, ResponseCache, normalize_query
+from query_analysis import QueryAnalyzer, QueryAnalysis
+from metrics import MetricsRegistry, load_ingest_stats
+from memory_governor import MemoryGovernor, MemoryPressureError, PRESSURE_LEVELS
+from inference_backends import (load_sentence_encoder, load_causal_lm, text_generation_pipeline,
+                                check_embedding_parity, check_llm_parity)
 
 # Utilities
-from functools import lru_cache
-import gc
 import psutil
 
 # Configure logging
@@ -39,14 +50,116 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+class GenerationRejectedError(RuntimeError):
+    """A request's LLM fallback could not enter the ASGI generation lane (full or timed out)."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+# Errors that shed a query with 503 and Retry-After instead of failing it
+SHED_ERRORS = (MemoryPressureError, GenerationRejectedError)
+
+# Returned when generation fails; never cached, so the next identical query tries again
+GENERATION_FAILED_RESPONSE = "I apologize, but I encountered an error while generating your lesson plan. Please try again."
+
+class EmbeddingBatcher:
+    """Coalesces concurrent single-query encodes into one batched forward pass."""
+
+    def __init__(self, model: SentenceTransformer, window_ms: float = 5.0, max_batch: int = 32):
+        """
+        Initialize the batcher.
+
+        Args:
+            model: Sentence transformer used for encoding
+            window_ms: How long to wait for more queries once one has arrived
+            max_batch: Maximum queries encoded in one call
+        """
+        self.model = model
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self.requests = queue.Queue()
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        self.thread = None
+        self.thread_pid = None
+
+        # Statistics
+        self.batches = 0
+        self.items = 0
+
+    def encode(self, text: str) -> np.ndarray:
+        """Encode one text, sharing a forward pass with concurrent callers."""
+        future = Future()
+        with self.lock:
+            # Start the worker lazily, and again in each forked gunicorn worker
+            if self.thread is None or self.thread_pid != os.getpid():
+                self.requests = queue.Queue()
+                self.in_flight = 0
+                self.thread = threading.Thread(target=self.run, name='embedding-batcher', daemon=True)
+                self.thread_pid = os.getpid()
+                self.thread.start()
+            self.in_flight += 1
+            self.requests.put((text, future))
+        return future.result()
+
+    def run(self) -> None:
+        """Collect queued texts for up to the batch window, then encode them together."""
+        requests = self.requests
+        while True:
+            batch = [requests.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                with self.lock:
+                    # Nobody else is waiting: don't hold a lone query for the window
+                    if self.in_flight <= len(batch) and requests.empty():
+                        break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            texts = [text for text, _ in batch]
+            try:
+                vectors = self.model.encode(texts)
+                for (_, future), vector in zip(batch, vectors):
+                    future.set_result(vector)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            finally:
+                with self.lock:
+                    self.in_flight -= len(batch)
+                self.batches += 1
+                self.items += len(batch)
+
+    def stats(self) -> Dict[str, Any]:
+        """Batching statistics for /health."""
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0
+        }
+
+class StopOnEvent(StoppingCriteria):
+    """Stops LLM generation once an event is set (e.g. the streaming client disconnected)."""
+
+    def __init__(self, stop_event: threading.Event):
+        self.stop_event = stop_event
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.stop_event.is_set()
+
 class EducationalAssistant:
     """Main class for the educational assistant with RAG functionality."""
 
     def __init__(self):
         """Initialize the educational assistant."""
-        self.index = None
-        self.documents = []
         self.embedding_model = None
+        self.embedding_batcher = None
         self.llm_pipeline = None
         self.tokenizer = None
 
@@ -56,72 +169,265 @@ class EducationalAssistant:
         self.max_chunks = int(os.getenv('MAX_CHUNKS', 4))
         self.embedding_model_name = os.getenv('EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
         self.llm_model_name = os.getenv('LLM_MODEL', 'microsoft/DialoGPT-medium')
-
-        # Load components
-        self.load_components()
+        self.index_load_mode = os.getenv('INDEX_LOAD_MODE', 'mmap').lower()
+        self.embed_batch_window_ms = float(os.getenv('EMBED_BATCH_WINDOW_MS', 5))
+        self.embed_batch_max = int(os.getenv('EMBED_BATCH_MAX', 32))
+        self.stream_token_timeout = float(os.getenv('STREAM_TOKEN_TIMEOUT', 60))
+        self.batch_max_queries = int(os.getenv('BATCH_MAX_QUERIES', 64))
+
+        # Index files per corpus: the working directory's 'default' collection, plus named
+        # collections under COLLECTIONS_DIR loaded on first use, all sharing the models below
+        self.collections = CollectionRegistry(
+            root=os.getenv('COLLECTIONS_DIR', 'collections'),
+            budget_mb=float(os.getenv('COLLECTIONS_MEMORY_MB', 0)),
+            max_loaded=int(os.getenv('COLLECTIONS_MAX_LOADED', 8)),
+            index_load_mode=self.index_load_mode
+        )
+        self.default_collection = self.collections.default
+
+        # Bounds concurrent LLM generations across all request threads
+        self.generation_concurrency = max(1, int(os.getenv('GENERATION_CONCURRENCY', 1)))
+        self.llm_slots = threading.BoundedSemaphore(self.generation_concurrency)
+        self.admission_stats = None  # set by asgi.py when serving through ASGI
+        # Set by asgi.py: moves a retrieval-lane request into the generation lane before it runs the LLM
+        self.lane_handoff = None
+
+        # Memory budget: collects garbage only under pressure and queues or sheds LLM generations
+        self.memory_governor = MemoryGovernor(
+            budget_mb=float(os.getenv('MEMORY_BUDGET_MB', 0)),
+            gc_ratio=float(os.getenv('MEMORY_GC_RATIO', 0.8)),
+            shed_ratio=float(os.getenv('MEMORY_SHED_RATIO', 0.95)),
+            gc_interval=float(os.getenv('MEMORY_GC_INTERVAL', 10)),
+            queue_timeout=float(os.getenv('MEMORY_QUEUE_TIMEOUT', 10))
+        )
+        # Under memory pressure, unload the least recently used collection before collecting,
+        # unless it served a request since the last collection (the next request would reload it)
+        self.memory_governor.add_release_hook(
+            lambda: self.collections.evict_one(idle_seconds=self.memory_governor.gc_interval)
+        )
+
+        # Hybrid retrieval: BM25 and FAISS candidates fused by reciprocal rank
+        self.retrieval_mode = os.getenv('RETRIEVAL_MODE', 'hybrid').lower()
+        self.hybrid_candidates = int(os.getenv('HYBRID_CANDIDATES', 20))
+        self.rrf_k = int(os.getenv('RRF_K', 60))
+        self.bm25_budget_ms = float(os.getenv('BM25_BUDGET_MS', 20))
+
+        # Inference backends: torch (float32), int8 (dynamic quantization) or onnx (ONNX Runtime)
+        self.embedding_backend = os.getenv('EMBEDDING_BACKEND', 'torch').lower()
+        self.llm_backend = os.getenv('LLM_BACKEND', 'torch').lower()
+        self.onnx_export_dir = os.getenv('ONNX_EXPORT_DIR', 'onnx_models')
+        self.backend_parity_check = os.getenv('BACKEND_PARITY_CHECK', 'false').lower() == 'true'
+        self.backend_parity = {}
+
+        # Per-stage latency histograms and request counters served at /metrics
+        self.metrics = MetricsRegistry()
+        self.metrics.describe('query_stage_seconds', 'histogram', 'Time spent in each query processing stage')
+        self.metrics.describe('http_request_seconds', 'histogram', 'Request latency by endpoint')
+        self.metrics.describe('http_requests_total', 'counter', 'Requests by endpoint and status code')
+        self.metrics.describe('http_requests_in_flight', 'gauge', 'Requests currently being served by endpoint')
+        self.metrics.register_collector(self.collect_metrics)
+        self.ingest_stats_path = os.getenv('INGEST_STATS_PATH', 'ingest_stats.json')
+        self.process = psutil.Process()
+
+        # Keyword tables and duration patterns, compiled once
+        self.query_analyzer = QueryAnalyzer()
+
+        # Query embedding cache
+        self.query_cache = QueryEmbeddingCache(
+            max_items=int(os.getenv('QUERY_CACHE_SIZE', 10000)),
+            max_mb=float(os.getenv('QUERY_CACHE_MAX_MB', 64)),
+            ttl_seconds=float(os.getenv('QUERY_CACHE_TTL', 3600)),
+            backend=os.getenv('QUERY_CACHE_BACKEND', 'memory').lower(),
+            sqlite_path=os.getenv('QUERY_CACHE_PATH', 'query_cache.sqlite')
+        )
+
+        # Response cache, invalidated when the index files change on disk
+        self.response_cache = ResponseCache(capacity=int(os.getenv('RESPONSE_CACHE_SIZE', 1000)))
+        self.index_reload_interval = float(os.getenv('INDEX_RELOAD_INTERVAL', 5))
+
+        # Staged startup: serve immediately, load components in the background
+        self.startup_mode = os.getenv('STARTUP_LOAD', 'background').lower()
+        self.llm_load_mode = os.getenv('LLM_LOAD', 'lazy').lower()
+        self.started_at = time.time()
+        self.component_status = {
+            name: {'state': 'pending'} for name in ('faiss_index', 'documents', 'bm25_index', 'embedding_model', 'llm')
+        }
+        self.loaded_event = threading.Event()
+        self.llm_lock = threading.Lock()
+        self.load_thread = None
+
+        # Load components (under a preloading gunicorn master, each worker starts loading after fork)
+        if os.getenv('STARTUP_LOAD_AFTER_FORK', 'false').lower() != 'true':
+            self.start_loading()
+
+    # The default collection's index files, as loaded at startup
+    @property
+    def index(self) -> Optional[faiss.Index]:
+        return self.default_collection.index
+
+    @index.setter
+    def index(self, index: Optional[faiss.Index]) -> None:
+        self.default_collection.index = index
+
+    @property
+    def documents(self):
+        return self.default_collection.documents
+
+    @property
+    def bm25(self):
+        return self.default_collection.bm25
+
+    @property
+    def index_config(self) -> Dict[str, Any]:
+        return self.default_collection.index_config
+
+    @property
+    def index_version(self) -> Optional[str]:
+        return self.default_collection.version
+
+    @index_version.setter
+    def index_version(self, version: Optional[str]) -> None:
+        self.default_collection.version = version
+
+    def start_loading(self) -> None:
+        """Load components synchronously, in a background thread, or not at all (STARTUP_LOAD)."""
+        if self.startup_mode == 'off':
+            return
+        if self.startup_mode == 'sync':
+            self.load_components()
+            return
+        self.load_thread = threading.Thread(target=self.load_components, name='component-loader', daemon=True)
+        self.load_thread.start()
+
+    def run_stage(self, name: str, loader, failed_state: str = 'missing') -> bool:
+        """Run one loading stage, recording its state and duration for /ready."""
+        self.component_status[name] = {'state': 'loading'}
+        start = time.perf_counter()
+        try:
+            loaded = loader()
+        except Exception as e:
+            logger.error(f"❌ Failed to load {name}: {e}")
+            loaded = False
+        self.component_status[name] = {
+            'state': 'ready' if loaded else failed_state,
+            'seconds': round(time.perf_counter() - start, 3)
+        }
+        return loaded
 
     def load_components(self) -> bool:
-        """Load all required components (index, documents, models)."""
+        """Load the retrieval components (index, documents, embedding model); the LLM loads lazily."""
         try:
             logger.info("🚀 Loading Educational Assistant components...")
 
+            self.index_version = self.index_files_version()
+            self.default_collection.checked_at = time.monotonic()
+
             # Load FAISS index
-            if not self.load_faiss_index():
+            if not self.run_stage('faiss_index', self.load_faiss_index):
                 logger.warning("⚠️ FAISS index not found - running in fallback mode")
 
             # Load documents
-            if not self.load_documents():
+            if not self.run_stage('documents', self.load_documents):
                 logger.warning("⚠️ Documents not found - running in fallback mode")
 
+            # Load BM25 index (optional; retrieval is dense-only without it)
+            self.run_stage('bm25_index', self.load_bm25_index)
+            self.default_collection.size_bytes = self.default_collection.memory_bytes()
+
             # Load embedding model
-            if not self.load_embedding_model():
+            if not self.run_stage('embedding_model', self.load_embedding_model, failed_state='failed'):
                 logger.error("❌ Failed to load embedding model")
                 return False
 
-            # Load LLM (optional for fallback)
-            self.load_llm()
+            # Load LLM now only if asked to; otherwise on the first request that needs it
+            if self.llm_load_mode == 'eager':
+                self.ensure_llm()
+            else:
+                self.component_status['llm'] = {'state': 'disabled' if self.llm_load_mode == 'off' else 'lazy'}
+
+            # Startup objects are never garbage; keep collections (and gunicorn's shared pages) away from them
+            self.memory_governor.freeze()
 
-            logger.info("✅ Educational Assistant components loaded successfully")
+            logger.info(f"✅ Educational Assistant components loaded in {time.time() - self.started_at:.1f}s")
             return True
 
         except Exception as e:
             logger.error(f"❌ Failed to load components: {e}")
             return False
 
-    def load_faiss_index(self) -> bool:
-        """Load the FAISS vector index."""
-        try:
-            if os.path.exists('document.index'):
-                self.index = faiss.read_index('document.index')
-                logger.info(f"✅ Loaded FAISS index with {self.index.ntotal} vectors")
-                return True
-            else:
-                logger.warning("⚠️ document.index not found")
-                return False
-        except Exception as e:
-            logger.error(f"❌ Failed to load FAISS index: {e}")
+        finally:
+            self.loaded_event.set()
+
+    def ensure_llm(self) -> bool:
+        """Load the LLM on first use; a failed load is not retried on every request."""
+        if self.llm_pipeline is not None:
+            return True
+        if self.llm_load_mode == 'off':
             return False
+        with self.llm_lock:
+            if self.llm_pipeline is None and self.component_status['llm']['state'] in ('pending', 'lazy'):
+                self.run_stage('llm', self.load_llm, failed_state='failed')
+        return self.llm_pipeline is not None
+
+    def llm_available(self) -> bool:
+        """Whether the LLM is loaded or can still be loaded on first use."""
+        if self.llm_pipeline is not None:
+            return True
+        return self.llm_load_mode != 'off' and self.component_status['llm']['state'] in ('pending', 'lazy')
 
-    def load_documents(self) -> bool:
-        """Load document chunks metadata."""
-        try:
-            if os.path.exists('documents.json'):
-                with open('documents.json', 'r', encoding='utf-8') as f:
-                    self.documents = json.load(f)
-                logger.info(f"✅ Loaded {len(self.documents)} document chunks")
-                return True
-            else:
-                logger.warning("⚠️ documents.json not found")
-                return False
-        except Exception as e:
-            logger.error(f"❌ Failed to load documents: {e}")
+    def is_ready(self) -> bool:
+        """Whether the retrieval components have finished loading."""
+        return self.loaded_event.is_set() and self.embedding_model is not None
+
+    def wait_until_loaded(self, timeout: Optional[float] = None) -> bool:
+        """Block until startup loading has finished (used by gunicorn before forking)."""
+        if self.startup_mode == 'off':
             return False
+        return self.loaded_event.wait(timeout)
+
+    def load_faiss_index(self) -> bool:
+        """Load the default collection's FAISS vector index."""
+        return self.default_collection.load_faiss_index()
+
+    def load_documents(self) -> bool:
+        """Load the default collection's document chunks."""
+        return self.default_collection.load_documents()
+
+    def load_bm25_index(self) -> bool:
+        """Load the default collection's BM25 index."""
+        return self.default_collection.load_bm25_index()
+
+    def index_files_version(self) -> str:
+        """Fingerprint the default collection's index files on disk."""
+        return self.default_collection.files_version()
+
+    def refresh_if_changed(self, collection: Optional[Collection] = None) -> bool:
+        """Reload a collection (default: the default one) if ingest.py rewrote its files."""
+        if (collection or self.default_collection).refresh_if_changed(self.index_reload_interval):
+            self.response_cache.clear()
+            return True
+        return False
 
     def load_embedding_model(self) -> bool:
         """Load the sentence transformer model."""
         try:
-            logger.info(f"Loading embedding model: {self.embedding_model_name}")
-            self.embedding_model = SentenceTransformer(self.embedding_model_name)
+            logger.info(f"Loading embedding model: {self.embedding_model_name} ({self.embedding_backend})")
+            model, backend = load_sentence_encoder(self.embedding_model_name, self.embedding_backend,
+                                                   self.onnx_export_dir)
+            if backend != 'torch' and self.backend_parity_check:
+                report, reference = check_embedding_parity(self.embedding_model_name, model)
+                self.backend_parity['embedding_model'] = report
+                logger.info(f"Embedding parity ({backend} vs float32): {report}")
+                if not report['passed']:
+                    logger.warning(f"⚠️ {backend} embeddings diverge from float32, using torch")
+                    model, backend = reference, 'torch'
+                del reference
+            self.embedding_model = model
+            self.embedding_backend = backend
+            if self.embed_batch_window_ms > 0:
+                self.embedding_batcher = EmbeddingBatcher(self.embedding_model,
+                                                          window_ms=self.embed_batch_window_ms,
+                                                          max_batch=self.embed_batch_max)
             logger.info("✅ Embedding model loaded successfully")
             return True
         except Exception as e:
@@ -131,25 +437,30 @@ class EducationalAssistant:
     def load_llm(self) -> bool:
         """Load the language model for text generation."""
         try:
-            logger.info(f"Loading LLM: {self.llm_model_name}")
+            logger.info(f"Loading LLM: {self.llm_model_name} ({self.llm_backend})")
 
             # Use CPU-only for better compatibility
             device = "cpu"
 
             # Load tokenizer and model
-            self.tokenizer = AutoTokenizer.from_pretrained(self.llm_model_name)
-            model = AutoModelForCausalLM.from_pretrained(
-                self.llm_model_name,
-                torch_dtype=torch.float32,
-                device_map=device,
-                low_cpu_mem_usage=True
-            )
+            tokenizer, model, backend = load_causal_lm(self.llm_model_name, self.llm_backend,
+                                                       self.onnx_export_dir)
+            if backend != 'torch' and self.backend_parity_check:
+                report, reference = check_llm_parity(self.llm_model_name, tokenizer, model)
+                self.backend_parity['llm'] = report
+                logger.info(f"LLM parity ({backend} vs float32): {report}")
+                if not report['passed']:
+                    logger.warning(f"⚠️ {backend} LLM diverges from float32, using torch")
+                    model, backend = reference, 'torch'
+                del reference
+            self.tokenizer = tokenizer
+            self.llm_backend = backend
 
             # Create pipeline
-            self.llm_pipeline = pipeline(
-                "text-generation",
-                model=model,
-                tokenizer=self.tokenizer,
+            self.llm_pipeline = text_generation_pipeline(
+                model,
+                self.tokenizer,
+                backend,
                 device=device,
                 max_length=1024,
                 do_sample=True,
@@ -164,98 +475,276 @@ class EducationalAssistant:
             logger.warning(f"⚠️ Failed to load LLM (will use fallback): {e}")
             return False
 
-    @lru_cache(maxsize=1000)
-    def get_cached_embedding(self, text: str) -> np.ndarray:
-        """Get cached embedding for text."""
-        return self.embedding_model.encode([text])[0]
+    def index_memory_stats(self) -> Dict[str, Any]:
+        """Report process and default FAISS index memory, split into resident and shared pages."""
+        mb = 1024 * 1024
+        process = psutil.Process()
+        memory_info = process.memory_info()
+        collection = self.default_collection
+        stats = {
+            'process_rss_mb': round(memory_info.rss / mb, 1),
+            'process_shared_mb': round(getattr(memory_info, 'shared', 0) / mb, 1),
+            'index_load_mode': collection.index_load_mode,
+            # An index loaded by the gunicorn master before fork is shared copy-on-write
+            'index_preloaded': collection.loaded_in_pid is not None and collection.loaded_in_pid != os.getpid()
+        }
+
+        index_path = os.path.abspath(collection.file('document.index'))
+        if os.path.exists(index_path):
+            stats['index_file_mb'] = round(os.path.getsize(index_path) / mb, 1)
+            try:
+                for mapping in process.memory_maps(grouped=True):
+                    if mapping.path == index_path:
+                        shared = getattr(mapping, 'shared_clean', 0) + getattr(mapping, 'shared_dirty', 0)
+                        stats['index_mapped_rss_mb'] = round(mapping.rss / mb, 1)
+                        stats['index_mapped_shared_mb'] = round(shared / mb, 1)
+                        break
+            except (psutil.AccessDenied, NotImplementedError):
+                pass
+
+        return stats
+
+    def stage(self, name: str):
+        """Context manager timing one query processing stage into /metrics."""
+        return self.metrics.timer('query_stage_seconds', stage=name)
+
+    def collect_metrics(self) -> List[Tuple[str, str, str, list]]:
+        """Metrics read at scrape time: caches, memory, components, admission lanes and the last ingestion."""
+        metrics = [
+            ('process_resident_memory_bytes', 'gauge', 'Resident set size of this process',
+             [('', {'pid': os.getpid()}, self.process.memory_info().rss)]),
+            ('system_memory_used_ratio', 'gauge', 'Fraction of system memory in use',
+             [('', {}, psutil.virtual_memory().percent / 100)]),
+            ('component_ready', 'gauge', 'Whether each component is ready (1) or not (0)',
+             [('', {'component': name}, int(status.get('state') == 'ready'))
+              for name, status in self.component_status.items()])
+        ]
 
-    def retrieve_context(self, query: str) -> List[Dict[str, Any]]:
-        """Retrieve relevant context using RAG."""
+        caches = {'query_embedding': self.query_cache.stats(), 'response': self.response_cache.stats()}
+        metrics.append(('cache_hits_total', 'counter', 'Cache hits',
+                        [('', {'cache': cache}, stats['hits']) for cache, stats in caches.items()]))
+        metrics.append(('cache_misses_total', 'counter', 'Cache misses',
+                        [('', {'cache': cache}, stats['misses']) for cache, stats in caches.items()]))
+        metrics.append(('cache_hit_ratio', 'gauge', 'Cache hits / lookups since startup',
+                        [('', {'cache': cache}, stats['hit_rate']) for cache, stats in caches.items()]))
+
+        if self.embedding_batcher is not None:
+            batcher = self.embedding_batcher.stats()
+            metrics.append(('embedding_batches_total', 'counter', 'Batched query embedding forward passes',
+                            [('', {}, batcher['batches'])]))
+            metrics.append(('embedding_batch_items_total', 'counter', 'Queries encoded through the batcher',
+                            [('', {}, batcher['items'])]))
+        bm25_truncated = [('', {'collection': collection.name}, state.bm25.truncated_searches)
+                          for collection in self.collections.loaded_collections()
+                          for state in (collection.state,) if state.bm25 is not None]
+        if bm25_truncated:
+            metrics.append(('bm25_truncated_searches_total', 'counter', 'BM25 searches cut short by BM25_BUDGET_MS',
+                            bm25_truncated))
+
+        collections = self.collections.stats()
+        metrics.append(('collections_loaded', 'gauge', 'Named collections currently loaded',
+                        [('', {}, len(collections['loaded']))]))
+        metrics.append(('collections_loaded_bytes', 'gauge', 'Index file size of the loaded named collections',
+                        [('', {}, int(collections['loaded_mb'] * 1024 * 1024))]))
+        metrics.append(('collection_loads_total', 'counter', 'Named collections loaded on first use',
+                        [('', {}, collections['loads'])]))
+        metrics.append(('collection_load_failures_total', 'counter', 'Named collections that failed to load',
+                        [('', {}, collections['load_failures'])]))
+        metrics.append(('collection_load_seconds_total', 'counter', 'Time spent loading named collections',
+                        [('', {}, collections['load_seconds'])]))
+        metrics.append(('collection_evictions_total', 'counter', 'Named collections evicted for budget or memory pressure',
+                        [('', {}, collections['evictions'])]))
+
+        governor = self.memory_governor.stats()
+        metrics.append(('memory_budget_bytes', 'gauge', 'Resident memory budget of this process',
+                        [('', {}, self.memory_governor.budget_bytes)]))
+        metrics.append(('memory_pressure_level', 'gauge', 'Memory governor pressure (0 ok, 1 high, 2 shedding)',
+                        [('', {}, PRESSURE_LEVELS.index(governor['pressure']))]))
+        metrics.append(('memory_gc_collections_total', 'counter', 'Garbage collections run by the memory governor',
+                        [('', {}, governor['collections'])]))
+        metrics.append(('memory_gc_seconds_total', 'counter', 'Time spent in governor garbage collections',
+                        [('', {}, governor['collection_seconds'])]))
+        metrics.append(('memory_llm_decisions_total', 'counter', 'LLM generations admitted, queued or shed for memory',
+                        [('', {'decision': decision}, governor[f"llm_{decision}"])
+                         for decision in ('admitted', 'queued', 'shed')]))
+
+        if self.admission_stats is not None:
+            lanes = self.admission_stats()
+            for field, kind, help_text in (
+                    ('running', 'gauge', 'Requests running in each admission lane'),
+                    ('waiting', 'gauge', 'Requests queued for each admission lane'),
+                    ('admitted', 'counter', 'Requests admitted to each lane'),
+                    ('rejected_full', 'counter', 'Requests rejected with 429 because the lane queue was full'),
+                    ('rejected_timeout', 'counter', 'Requests rejected with 503 after waiting too long'),
+                    ('handed_off', 'counter', 'Requests that left the lane for the generation lane (LLM fallback)')):
+                name = f"admission_{field}_total" if kind == 'counter' else f"admission_{field}"
+                metrics.append((name, kind, help_text,
+                                [('', {'lane': lane}, stats[field]) for lane, stats in lanes.items()]))
+
+        ingest = load_ingest_stats(self.ingest_stats_path)
+        if ingest:
+            metrics.append(('ingest_last_run_timestamp_seconds', 'gauge', 'When the last ingestion run finished',
+                            [('', {}, ingest.get('finished_at'))]))
+            metrics.append(('ingest_last_run_success', 'gauge', 'Whether the last ingestion run succeeded',
+                            [('', {}, int(bool(ingest.get('success'))))]))
+            metrics.append(('ingest_last_run_wall_seconds', 'gauge', 'Wall time of the last ingestion run',
+                            [('', {}, ingest.get('wall_seconds'))]))
+            metrics.append(('ingest_last_run_items', 'gauge', 'Files, bytes and chunks handled by the last ingestion run',
+                            [('', {'item': name}, value) for name, value in ingest.get('counters', {}).items()]))
+            metrics.append(('ingest_last_run_stage_seconds', 'gauge', 'Busy time per stage of the last ingestion run',
+                            [('', {'stage': name}, value) for name, value in ingest.get('stage_seconds', {}).items()]))
+            metrics.append(('ingest_last_run_throughput', 'gauge', 'Throughput per stage of the last ingestion run',
+                            [('', {'rate': name}, value) for name, value in ingest.get('throughput', {}).items()]))
+
+        return metrics
+
+    def query_cache_key(self, normalized: str) -> str:
+        """Query embedding cache key: model, backend and normalized query text."""
+        return f"{self.embedding_model_name}:{self.embedding_backend}\0{normalized}"
+
+    def get_cached_embeddings(self, normalized_texts: List[str]) -> np.ndarray:
+        """Embed normalized queries, encoding all cache misses in a single batched call."""
+        embeddings: List[Optional[np.ndarray]] = [self.query_cache.get(self.query_cache_key(text))
+                                                  for text in normalized_texts]
+        missing = list(dict.fromkeys(text for text, embedding in zip(normalized_texts, embeddings)
+                                     if embedding is None))
+        if missing:
+            encoded = dict(zip(missing, self.embedding_model.encode(missing, batch_size=self.embed_batch_max)))
+            for text, embedding in encoded.items():
+                self.query_cache.put(self.query_cache_key(text), embedding)
+            embeddings = [encoded[text] if embedding is None else embedding
+                          for text, embedding in zip(normalized_texts, embeddings)]
+        return np.vstack(embeddings).astype('float32')
+
+    def get_cached_embedding(self, text: str, normalized: Optional[str] = None) -> np.ndarray:
+        """Get the embedding of a query's normalized text, from the query cache when possible."""
+        if normalized is None:
+            normalized = normalize_query(text)
+        key = self.query_cache_key(normalized)
+
+        embedding = self.query_cache.get(key)
+        if embedding is None:
+            if self.embedding_batcher is not None:
+                embedding = self.embedding_batcher.encode(normalized)
+            else:
+                embedding = self.embedding_model.encode([normalized])[0]
+            self.query_cache.put(key, embedding)
+        return embedding
+
+    def retrieval_plan(self, state: CollectionState) -> Tuple[bool, bool, int]:
+        """Which retrievers run for the current RETRIEVAL_MODE and how many candidates each returns."""
+        use_bm25 = state.bm25 is not None and self.retrieval_mode in ('hybrid', 'bm25')
+        use_dense = self.retrieval_mode != 'bm25' or not use_bm25
+        candidates = max(self.max_chunks, self.hybrid_candidates) if use_bm25 and use_dense else self.max_chunks
+        return use_dense, use_bm25, candidates
+
+    def retrieve_context(self, query: str, analysis: Optional[QueryAnalysis] = None,
+                         collection: Optional[Collection] = None) -> List[Dict[str, Any]]:
+        """Retrieve relevant context from a collection (default: the default one) using RAG."""
         try:
-            if not self.index or not self.documents:
-                logger.warning("⚠️ No index or documents available for retrieval")
+            collection = collection or self.default_collection
+            # One consistent set of index files for the whole query, even if a reload swaps them meanwhile
+            state = collection.state
+            if not state.index or not state.documents:
+                logger.warning(f"⚠️ No index or documents available for retrieval in '{collection.name}'")
                 return []
 
-            # Create query embedding
-            query_embedding = self.get_cached_embedding(query)
-            query_embedding = query_embedding.reshape(1, -1).astype('float32')
+            normalized = analysis.normalized if analysis else normalize_query(query)
+            use_dense, use_bm25, candidates = self.retrieval_plan(state)
 
-            # Normalize for cosine similarity
-            faiss.normalize_L2(query_embedding)
+            scores = vector_ids = None
+            if use_dense:
+                # Create query embedding
+                with self.stage('embed'):
+                    query_embedding = self.get_cached_embedding(query, normalized)
+                query_embedding = query_embedding.reshape(1, -1).astype('float32')
 
-            # Search for similar chunks
-            scores, indices = self.index.search(query_embedding, self.max_chunks)
+                # Normalize for cosine similarity
+                faiss.normalize_L2(query_embedding)
 
-            # Get relevant documents
-            relevant_docs = []
-            for i, (score, idx) in enumerate(zip(scores[0], indices[0])):
-                if idx < len(self.documents) and score > 0.1:  # Similarity threshold
-                    doc = self.documents[idx].copy()
-                    doc['similarity_score'] = float(score)
-                    doc['rank'] = i + 1
-                    relevant_docs.append(doc)
+                # Search for similar chunks
+                with self.stage('faiss_search'):
+                    scores, vector_ids = state.index.search(query_embedding, candidates)
+                scores, vector_ids = scores[0], vector_ids[0]
 
-            logger.info(f"Retrieved {len(relevant_docs)} relevant document chunks")
-            return relevant_docs
+            return self.fuse_context(normalized, scores, vector_ids, use_bm25, candidates, state)
 
         except Exception as e:
             logger.error(f"❌ Failed to retrieve context: {e}")
             return []
 
-    def detect_elementary_music(self, query: str) -> bool:
-        """Detect if query is for elementary general music."""
-        music_keywords = [
-            'music', 'musical', 'song', 'singing', 'rhythm', 'melody', 'beat',
-            'instrument', 'piano', 'guitar', 'drum', 'orchestra', 'choir',
-            'note', 'scale', 'tempo', 'dynamics', 'pitch'
-        ]
-
-        elementary_keywords = [
-            'elementary', 'primary', 'kindergarten', 'k-5', 'grade 1', 'grade 2',
-            'grade 3', 'grade 4', 'grade 5', 'young', 'children'
+    def retrieve_contexts(self, analyses: List[QueryAnalysis],
+                          collection: Optional[Collection] = None) -> List[List[Dict[str, Any]]]:
+        """Retrieve context for many queries with one batched encode and one FAISS search."""
+        collection = collection or self.default_collection
+        state = collection.state
+        if not state.index or not state.documents:
+            logger.warning(f"⚠️ No index or documents available for retrieval in '{collection.name}'")
+            return [[] for _ in analyses]
+
+        use_dense, use_bm25, candidates = self.retrieval_plan(state)
+
+        scores = vector_ids = None
+        if use_dense:
+            with self.stage('embed'):
+                query_embeddings = self.get_cached_embeddings([analysis.normalized for analysis in analyses])
+            faiss.normalize_L2(query_embeddings)
+            with self.stage('faiss_search'):
+                scores, vector_ids = state.index.search(query_embeddings, candidates)
+
+        return [
+            self.fuse_context(analysis.normalized,
+                              scores[i] if use_dense else None,
+                              vector_ids[i] if use_dense else None,
+                              use_bm25, candidates, state)
+            for i, analysis in enumerate(analyses)
         ]
 
-        query_lower = query.lower()
-
-        has_music = any(keyword in query_lower for keyword in music_keywords)
-        has_elementary = any(keyword in query_lower for keyword in elementary_keywords)
+    def fuse_context(self, normalized: str, scores: Optional[np.ndarray], vector_ids: Optional[np.ndarray],
+                     use_bm25: bool, candidates: int, state: CollectionState) -> List[Dict[str, Any]]:
+        """Combine one query's FAISS hits with its BM25 hits and materialize the top chunks."""
+        # Dense candidates: chunk row -> cosine similarity
+        dense = {}
+        if vector_ids is not None:
+            for score, vector_id in zip(scores, vector_ids):
+                idx = state.documents.lookup(int(vector_id))
+                if idx >= 0 and score > 0.1:  # Similarity threshold
+                    dense[idx] = float(score)
+
+        # Lexical candidates: chunk row -> BM25 score, within the latency budget
+        lexical = {}
+        if use_bm25:
+            with self.stage('bm25_search'):
+                rows, bm25_scores = state.bm25.search(normalized, candidates, budget_ms=self.bm25_budget_ms)
+            lexical = dict(zip(rows.tolist(), bm25_scores.tolist()))
+
+        fused = reciprocal_rank_fusion([list(dense), list(lexical)], k=self.rrf_k)
+
+        # Get relevant documents
+        relevant_docs = []
+        for i, (idx, fusion_score) in enumerate(fused[:self.max_chunks]):
+            doc = state.documents[idx]
+            doc['similarity_score'] = dense.get(idx, 0.0)
+            if use_bm25:
+                doc['bm25_score'] = round(lexical.get(idx, 0.0), 4)
+                doc['fusion_score'] = round(fusion_score, 6)
+            doc['rank'] = i + 1
+            relevant_docs.append(doc)
+
+        logger.info(f"Retrieved {len(relevant_docs)} relevant document chunks")
+        return relevant_docs
 
-        return has_music and has_elementary
+    def detect_elementary_music(self, query: str) -> bool:
+        """Detect if query is for elementary general music."""
+        return self.query_analyzer.analyze(query).is_elementary_music
 
     def detect_external_knowledge_request(self, query: str) -> bool:
         """Detect if user wants external knowledge beyond documents."""
-        external_triggers = [
-            'search the web', 'best practices', 'include external ideas',
-            'go beyond the documents', 'latest research', 'current trends',
-            'what else', 'additional ideas', 'more information',
-            'external sources', 'beyond curriculum'
-        ]
-
-        query_lower = query.lower()
-        return any(trigger in query_lower for trigger in external_triggers)
+        return self.query_analyzer.analyze(query).external_knowledge
 
     def extract_duration(self, query: str) -> Optional[int]:
-        """Extract lesson duration from query."""
-        # Look for duration patterns
-        duration_patterns = [
-            r'(\d+)\s*(?:minute|min)s?',
-            r'(\d+)\s*(?:hour|hr)s?',
-            r'(\d+)\s*(?:period|class)s?'
-        ]
-
-        for pattern in duration_patterns:
-            match = re.search(pattern, query.lower())
-            if match:
-                duration = int(match.group(1))
-                # Convert hours to minutes
-                if 'hour' in pattern or 'hr' in pattern:
-                    duration *= 60
-                # Assume class periods are 45 minutes
-                elif 'period' in pattern or 'class' in pattern:
-                    duration *= 45
-                return duration
-
-        return None
+        """Extract lesson duration from query (minutes; hours and class periods are converted)."""
+        return self.query_analyzer.analyze(query).duration
 
     def format_elementary_music_lesson(self, content: str, duration: int) -> str:
         """Format lesson plan for elementary music (12-section format)."""
@@ -356,16 +845,19 @@ Students will be able to understand and apply the key concepts presented in this
 """
         return template
 
-    def generate_response(self, query: str, context: List[Dict], use_external: bool = False) -> str:
+    def generate_response(self, query: str, context: List[Dict], use_external: bool = False,
+                          analysis: Optional[QueryAnalysis] = None) -> str:
         """Generate response using LLM or fallback method."""
         try:
+            analysis = analysis or self.query_analyzer.analyze(query)
+
             # Extract duration
-            duration = self.extract_duration(query)
+            duration = analysis.duration
             if duration is None:
                 return "How long should the lesson be? Please specify the duration (e.g., 30 minutes, 1 hour)."
 
             # Detect lesson type
-            is_elementary_music = self.detect_elementary_music(query)
+            is_elementary_music = analysis.is_elementary_music
 
             # Prepare context
             context_text = ""
@@ -375,28 +867,38 @@ Students will be able to understand and apply the key concepts presented in this
             # Generate response based on available context
             if context_text and not use_external:
                 # Document-grounded response
-                if is_elementary_music:
-                    response = self.format_elementary_music_lesson(context_text, duration)
-                    return f"### 📚 Based on District Documents:\n\n{response}"
-                else:
-                    response = self.format_general_lesson(context_text, duration)
-                    return f"### 📚 Based on District Documents:\n\n{response}"
+                with self.stage('template'):
+                    if is_elementary_music:
+                        response = self.format_elementary_music_lesson(context_text, duration)
+                    else:
+                        response = self.format_general_lesson(context_text, duration)
+                return f"### 📚 Based on District Documents:\n\n{response}"
 
             elif use_external or not context_text:
                 # External knowledge or fallback response
-                if self.llm_pipeline:
+                content = f"Lesson plan content for: {query}"
+                if self.llm_available():
                     # Use LLM for generation
                     prompt = f"Create a lesson plan for: {query}"
-                    generated = self.llm_pipeline(prompt, max_length=512, num_return_sequences=1)
-                    content = generated[0]['generated_text']
-                else:
-                    # Fallback content
-                    content = f"Lesson plan content for: {query}"
-
-                if is_elementary_music:
-                    response = self.format_elementary_music_lesson(content, duration)
-                else:
-                    response = self.format_general_lesson(content, duration)
+                    # A document query that found no context takes a generation-lane slot first
+                    with self.lane_handoff() if self.lane_handoff else nullcontext():
+                        with self.stage('llm_wait'):
+                            # Admitted before the first (lazy) load, which needs the memory itself
+                            self.memory_governor.admit_llm()
+                            self.llm_slots.acquire()
+                        try:
+                            if self.ensure_llm():
+                                with self.stage('llm'):
+                                    generated = self.llm_pipeline(prompt, max_length=512, num_return_sequences=1)
+                                content = generated[0]['generated_text']
+                        finally:
+                            self.llm_slots.release()
+
+                with self.stage('template'):
+                    if is_elementary_music:
+                        response = self.format_elementary_music_lesson(content, duration)
+                    else:
+                        response = self.format_general_lesson(content, duration)
 
                 if use_external:
                     return f"### 🌐 Supplemented from General Knowledge:\n\n{response}"
@@ -406,50 +908,305 @@ Students will be able to understand and apply the key concepts presented in this
             else:
                 return "This information does not appear in the uploaded curriculum documents."
 
+        except SHED_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"❌ Failed to generate response: {e}")
-            return "I apologize, but I encountered an error while generating your lesson plan. Please try again."
+            return GENERATION_FAILED_RESPONSE
 
-    def process_query(self, query: str, duration: str = None) -> Dict[str, Any]:
-        """Process a user query and return structured response."""
+    def process_query(self, query: str, duration: str = None,
+                      collection: Optional[Collection] = None) -> Dict[str, Any]:
+        """Process a user query against a collection (default: the default one) and return structured response."""
         try:
             logger.info(f"Processing query: {query[:100]}...")
+            collection = collection or self.default_collection
 
             # Add duration to query if provided separately
             if duration and duration != "":
                 query = f"{query} Duration: {duration}"
 
-            # Check for external knowledge request
-            use_external = self.detect_external_knowledge_request(query)
+            # Analyze once: external knowledge request, lesson type, duration, normalized text
+            with self.stage('analyze'):
+                analysis = self.query_analyzer.analyze(query)
+            use_external = analysis.external_knowledge
+
+            # Serve repeated document-grounded queries from the response cache
+            self.refresh_if_changed(collection)
+            with self.stage('response_cache'):
+                cache_key, cached = self.cached_result(analysis, collection)
+            if cached is not None:
+                return cached
 
             # Retrieve context
-            context = self.retrieve_context(query) if not use_external else []
+            if not use_external:
+                with self.stage('retrieve'):
+                    context = self.retrieve_context(query, analysis, collection)
+            else:
+                context = []
 
             # Generate response
-            response = self.generate_response(query, context, use_external)
+            with self.stage('generate'):
+                result = self.complete_query(query, analysis, context, cache_key)
+
+            # Collect garbage only if memory is over the governor's threshold
+            with self.stage('gc'):
+                self.memory_governor.after_request()
+
+            return result
+
+        except SHED_ERRORS as e:
+            return {
+                'response': None,
+                'error': str(e),
+                'retry_after': e.retry_after,
+                'timestamp': datetime.now().isoformat()
+            }
+        except Exception as e:
+            logger.error(f"❌ Failed to process query: {e}")
+            return {
+                'response': "I apologize, but I encountered an error while processing your request. Please try again.",
+                'error': str(e),
+                'timestamp': datetime.now().isoformat()
+            }
+
+    def cached_result(self, analysis: QueryAnalysis,
+                      collection: Collection) -> Tuple[Optional[Tuple], Optional[Dict[str, Any]]]:
+        """Response cache key for a document-grounded query, and the cached result if there is one."""
+        if analysis.external_knowledge or not self.response_cache.capacity:
+            return None, None
+        cache_key = (analysis.normalized, analysis.duration, analysis.query_type, collection.name, collection.version)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            cached['timestamp'] = datetime.now().isoformat()
+            cached['cache'] = 'hit'
+        return cache_key, cached
+
+    def complete_query(self, query: str, analysis: QueryAnalysis, context: List[Dict[str, Any]],
+                       cache_key: Optional[Tuple]) -> Dict[str, Any]:
+        """Generate the response for a query whose context has been retrieved, and cache it."""
+        response = self.generate_response(query, context, analysis.external_knowledge, analysis)
+
+        # Prepare result
+        result = {
+            'response': response,
+            'context_used': len(context),
+            'sources': [doc['source'] for doc in context] if context else [],
+            'timestamp': datetime.now().isoformat(),
+            'query_type': analysis.query_type,
+            'external_knowledge': analysis.external_knowledge,
+            'cache': 'bypass'
+        }
+
+        # Only a lesson from the template path is deterministic; LLM output, the
+        # duration question and failures are never cached
+        lesson = analysis.duration is not None and response != GENERATION_FAILED_RESPONSE
+        if cache_key is not None and context and lesson:
+            result['cache'] = 'miss'
+            self.response_cache.put(cache_key, result)
+
+        return result
+
+    def process_queries(self, items: List[Dict[str, Any]],
+                        collection: Optional[Collection] = None) -> List[Dict[str, Any]]:
+        """
+        Process a batch of queries with one batched encode and one FAISS search.
+
+        Args:
+            items: Dicts with a 'query' and an optional 'duration'
+            collection: Collection every query is answered from (default: the default one)
+
+        Returns:
+            One result per item, in order, each with its 'index'; an item that
+            fails carries 'error' without affecting the rest of the batch
+        """
+        logger.info(f"Processing batch of {len(items)} queries")
+        collection = collection or self.default_collection
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        self.refresh_if_changed(collection)
+
+        # Analyze every query and serve what the response cache already has
+        pending = []
+        for position, item in enumerate(items):
+            try:
+                if not isinstance(item, dict):
+                    raise ValueError('Each item must be an object with a query')
+                query = str(item.get('query') or '').strip()
+                if not query:
+                    raise ValueError('Query cannot be empty')
+                duration = str(item.get('duration') or '').strip()
+                if duration:
+                    query = f"{query} Duration: {duration}"
+
+                with self.stage('analyze'):
+                    analysis = self.query_analyzer.analyze(query)
+                with self.stage('response_cache'):
+                    cache_key, cached = self.cached_result(analysis, collection)
+                if cached is not None:
+                    results[position] = cached
+                else:
+                    pending.append((position, query, analysis, cache_key))
+            except Exception as e:
+                results[position] = self.batch_error(e)
+
+        # Retrieve context for all document-grounded queries at once
+        contexts: Dict[int, List[Dict[str, Any]]] = {}
+        grounded = [(position, analysis) for position, _, analysis, _ in pending if not analysis.external_knowledge]
+        if grounded:
+            try:
+                with self.stage('retrieve'):
+                    retrieved = self.retrieve_contexts([analysis for _, analysis in grounded], collection)
+                contexts = {position: context for (position, _), context in zip(grounded, retrieved)}
+            except Exception as e:
+                logger.error(f"❌ Failed to retrieve batch context: {e}")
+
+        for position, query, analysis, cache_key in pending:
+            try:
+                with self.stage('generate'):
+                    results[position] = self.complete_query(query, analysis, contexts.get(position, []), cache_key)
+            except Exception as e:
+                results[position] = self.batch_error(e)
+
+        for position, result in enumerate(results):
+            result['index'] = position
+
+        # Collect garbage only if memory is over the governor's threshold
+        with self.stage('gc'):
+            self.memory_governor.after_request()
+
+        return results
+
+    def batch_error(self, error: Exception) -> Dict[str, Any]:
+        """Result for one failed item of a batch."""
+        logger.error(f"❌ Failed to process batch item: {error}")
+        result = {
+            'response': None,
+            'error': str(error),
+            'timestamp': datetime.now().isoformat()
+        }
+        if isinstance(error, SHED_ERRORS):
+            result['retry_after'] = error.retry_after
+        return result
+
+    def stream_llm(self, prompt: str, stop_event: threading.Event) -> Iterator[str]:
+        """Yield LLM output text as it is generated; setting stop_event ends generation early."""
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True,
+                                        timeout=self.stream_token_timeout)
+        inputs = self.tokenizer(prompt, return_tensors='pt')
+        generation_kwargs = dict(
+            **inputs,
+            max_length=512,
+            do_sample=True,
+            temperature=0.7,
+            pad_token_id=self.tokenizer.eos_token_id,
+            streamer=streamer,
+            stopping_criteria=StoppingCriteriaList([StopOnEvent(stop_event)])
+        )
+
+        def generate():
+            with self.stage('llm_wait'):
+                self.llm_slots.acquire()
+            try:
+                if not stop_event.is_set():
+                    with self.stage('llm_stream'):
+                        self.llm_pipeline.model.generate(**generation_kwargs)
+            finally:
+                self.llm_slots.release()
+
+        thread = threading.Thread(target=generate, name='llm-stream', daemon=True)
+        thread.start()
+        try:
+            for text in streamer:
+                if text:
+                    yield text
+        finally:
+            stop_event.set()
+
+    def stream_query(self, query: str, duration: str = None,
+                     collection: Optional[Collection] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Process a query as a stream of (event, data) pairs for Server-Sent Events.
+
+        Events: 'meta' (query type and sources), 'section' (markdown emitted before
+        generation), 'token' (LLM text as generated), 'lesson' (the complete formatted
+        lesson plan), 'done', or 'error'. Closing the generator stops LLM generation.
+        """
+        stop_event = threading.Event()
+        try:
+            logger.info(f"Streaming query: {query[:100]}...")
+
+            # Add duration to query if provided separately
+            if duration and duration != "":
+                query = f"{query} Duration: {duration}"
+
+            with self.stage('analyze'):
+                analysis = self.query_analyzer.analyze(query)
+            use_external = analysis.external_knowledge
+            is_elementary_music = analysis.is_elementary_music
+            if not use_external:
+                self.refresh_if_changed(collection)
+                with self.stage('retrieve'):
+                    context = self.retrieve_context(query, analysis, collection)
+            else:
+                context = []
 
-            # Prepare result
-            result = {
-                'response': response,
+            yield 'meta', {
                 'context_used': len(context),
                 'sources': [doc['source'] for doc in context] if context else [],
-                'timestamp': datetime.now().isoformat(),
-                'query_type': 'elementary_music' if self.detect_elementary_music(query) else 'general',
+                'query_type': analysis.query_type,
                 'external_knowledge': use_external
             }
 
-            # Force garbage collection
-            gc.collect()
-
-            return result
+            lesson_duration = analysis.duration
+            if lesson_duration is None or (context and not use_external) or not self.llm_available():
+                # Nothing to generate token by token: template and fallback paths are instant
+                yield 'lesson', {'response': self.generate_response(query, context, use_external, analysis)}
+            else:
+                # Only a stream that runs the LLM moves into the generation lane, like /ask
+                with self.lane_handoff() if self.lane_handoff else nullcontext():
+                    # Queue or shed under memory pressure before the LLM is loaded or any generated section is sent
+                    with self.stage('llm_wait'):
+                        self.memory_governor.admit_llm()
+                    if not self.ensure_llm():
+                        yield 'lesson', {'response': self.generate_response(query, context, use_external, analysis)}
+                        yield 'done', {'timestamp': datetime.now().isoformat()}
+                        return
+                    if use_external:
+                        header = "### 🌐 Supplemented from General Knowledge:"
+                    else:
+                        header = "### 📚 Based on Available Resources:"
+                    yield 'section', {'markdown': f"{header}\n\n## Generated Ideas\n\n"}
 
+                    prompt = f"Create a lesson plan for: {query}"
+                    pieces = [prompt]
+                    for text in self.stream_llm(prompt, stop_event):
+                        pieces.append(text)
+                        yield 'token', {'text': text}
+
+                    content = ''.join(pieces)
+                    if is_elementary_music:
+                        lesson = self.format_elementary_music_lesson(content, lesson_duration)
+                    else:
+                        lesson = self.format_general_lesson(content, lesson_duration)
+                    yield 'lesson', {'response': f"{header}\n\n{lesson}"}
+
+            yield 'done', {'timestamp': datetime.now().isoformat()}
+
+        except SHED_ERRORS as e:
+            yield 'error', {
+                'response': None,
+                'error': str(e),
+                'retry_after': e.retry_after,
+                'timestamp': datetime.now().isoformat()
+            }
         except Exception as e:
-            logger.error(f"❌ Failed to process query: {e}")
-            return {
+            logger.error(f"❌ Failed to stream query: {e}")
+            yield 'error', {
                 'response': "I apologize, but I encountered an error while processing your request. Please try again.",
                 'error': str(e),
                 'timestamp': datetime.now().isoformat()
             }
+        finally:
+            stop_event.set()
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -458,6 +1215,28 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 # Initialize educational assistant
 assistant = EducationalAssistant()
 
+@app.before_request
+def start_request_metrics():
+    """Count the request as in flight and note when it started."""
+    g.metrics_endpoint = request.endpoint or 'unknown'
+    g.metrics_start = time.perf_counter()
+    assistant.metrics.inc('http_requests_in_flight', endpoint=g.metrics_endpoint)
+
+@app.after_request
+def count_response(response):
+    """Count responses by endpoint and status code."""
+    assistant.metrics.inc('http_requests_total', endpoint=request.endpoint or 'unknown', status=response.status_code)
+    return response
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    """Record request latency; for streamed responses this runs when the stream ends."""
+    endpoint = g.pop('metrics_endpoint', None)
+    if endpoint is not None:
+        assistant.metrics.observe('http_request_seconds', time.perf_counter() - g.pop('metrics_start'),
+                                  endpoint=endpoint)
+        assistant.metrics.inc('http_requests_in_flight', -1, endpoint=endpoint)
+
 @app.route('/')
 def index():
     """Serve the main page."""
@@ -472,9 +1251,22 @@ def health_check():
             'status': 'healthy',
             'timestamp': datetime.now().isoformat(),
             'memory_usage': f"{memory_usage}%",
+            'memory': assistant.index_memory_stats(),
+            'embedding_batcher': assistant.embedding_batcher.stats() if assistant.embedding_batcher else None,
+            'query_cache': assistant.query_cache.stats(),
+            'response_cache': assistant.response_cache.stats(),
+            'admission': assistant.admission_stats() if assistant.admission_stats else None,
+            'memory_governor': assistant.memory_governor.stats(),
+            'collections': assistant.collections.stats(),
+            'inference_backends': {
+                'embedding_model': assistant.embedding_backend,
+                'llm': assistant.llm_backend,
+                'parity': assistant.backend_parity
+            },
             'components': {
                 'faiss_index': assistant.index is not None,
                 'documents': len(assistant.documents) > 0,
+                'bm25_index': assistant.bm25 is not None,
                 'embedding_model': assistant.embedding_model is not None,
                 'llm_pipeline': assistant.llm_pipeline is not None
             }
@@ -486,10 +1278,67 @@ def health_check():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+@app.route('/ready')
+def readiness_check():
+    """Readiness endpoint: 200 once the retrieval components are loaded, 503 before."""
+    ready = assistant.is_ready()
+    response = jsonify({
+        'ready': ready,
+        'timestamp': datetime.now().isoformat(),
+        'uptime_seconds': round(time.time() - assistant.started_at, 1),
+        'components': assistant.component_status
+    })
+    if ready:
+        return response
+    response.headers['Retry-After'] = '5'
+    return response, 503
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics: per-stage latency histograms, request counts, caches, memory and ingestion."""
+    try:
+        return Response(assistant.metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    except Exception as e:
+        logger.error(f"❌ Error in /metrics endpoint: {e}")
+        return Response(f"# metrics unavailable: {e}\n", status=500, mimetype='text/plain')
+
+def not_ready_response():
+    """503 returned by query endpoints while components are still loading."""
+    response = jsonify({
+        'error': 'Service is starting up',
+        'message': 'Models are still loading, please retry shortly',
+        'components': assistant.component_status
+    })
+    response.headers['Retry-After'] = '5'
+    return response, 503
+
+def requested_collection(data: Dict[str, Any]):
+    """
+    The collection a request names in 'collection', loaded on first use.
+
+    Returns:
+        (collection, None), or (None, error response): 404 for an unknown
+        collection, 503 for one whose index files could not be loaded
+    """
+    name = str(data.get('collection') or '').strip() or None
+    try:
+        with assistant.stage('collection'):
+            return assistant.collections.get(name), None
+    except UnknownCollectionError as e:
+        return None, (jsonify({'error': str(e), 'collections': assistant.collections.available()}), 404)
+    except CollectionUnavailableError as e:
+        # Usually a collection that is being ingested; a retry loads it once its files are complete
+        response = jsonify({'error': str(e), 'message': 'Collection index is not available, please retry shortly'})
+        response.headers['Retry-After'] = '5'
+        return None, (response, 503)
+
 @app.route('/ask', methods=['POST'])
 def ask():
     """Handle lesson plan generation requests."""
     try:
+        if not assistant.is_ready():
+            return not_ready_response()
+
         data = request.get_json()
 
         if not data or 'query' not in data:
@@ -501,8 +1350,18 @@ def ask():
         if not query:
             return jsonify({'error': 'Query cannot be empty'}), 400
 
+        collection, error_response = requested_collection(data)
+        if error_response:
+            return error_response
+
         # Process the query
-        result = assistant.process_query(query, duration)
+        result = assistant.process_query(query, duration, collection)
+
+        if 'retry_after' in result:
+            # Shed by the memory governor or the generation lane
+            response = jsonify(result)
+            response.headers['Retry-After'] = str(result['retry_after'])
+            return response, 503
 
         return jsonify(result)
 
@@ -515,6 +1374,97 @@ def ask():
             'message': 'Please try again later'
         }), 500
 
+@app.route('/ask/batch', methods=['POST'])
+def ask_batch():
+    """Handle a batch of lesson plan requests, e.g. every lesson of a unit plan."""
+    try:
+        if not assistant.is_ready():
+            return not_ready_response()
+
+        data = request.get_json()
+
+        if not data or not isinstance(data.get('queries'), list):
+            return jsonify({'error': 'Missing queries list'}), 400
+
+        queries = data['queries']
+        if not queries:
+            return jsonify({'error': 'Queries cannot be empty'}), 400
+        if len(queries) > assistant.batch_max_queries:
+            return jsonify({'error': f"At most {assistant.batch_max_queries} queries per batch"}), 400
+
+        # Items may be plain strings; a top-level duration applies to items without one
+        default_duration = data.get('duration', '')
+        items = []
+        for item in queries:
+            if isinstance(item, str):
+                item = {'query': item}
+            if isinstance(item, dict) and not item.get('duration'):
+                item = dict(item, duration=default_duration)
+            items.append(item)
+
+        collection, error_response = requested_collection(data)
+        if error_response:
+            return error_response
+
+        results = assistant.process_queries(items, collection)
+
+        return jsonify({
+            'results': results,
+            'count': len(results),
+            'failed': sum(1 for result in results if 'error' in result)
+        })
+
+    except RequestEntityTooLarge:
+        return jsonify({'error': 'Request too large'}), 413
+    except Exception as e:
+        logger.error(f"❌ Error in /ask/batch endpoint: {e}")
+        return jsonify({
+            'error': 'Internal server error',
+            'message': 'Please try again later'
+        }), 500
+
+@app.route('/ask/stream', methods=['POST'])
+def ask_stream():
+    """Stream lesson plan generation as Server-Sent Events."""
+    try:
+        if not assistant.is_ready():
+            return not_ready_response()
+
+        data = request.get_json()
+
+        if not data or 'query' not in data:
+            return jsonify({'error': 'Missing query parameter'}), 400
+
+        query = data['query'].strip()
+        duration = data.get('duration', '').strip()
+
+        if not query:
+            return jsonify({'error': 'Query cannot be empty'}), 400
+
+        collection, error_response = requested_collection(data)
+        if error_response:
+            return error_response
+
+        def events():
+            # Closing this generator on client disconnect stops the LLM via stream_query
+            for event, payload in assistant.stream_query(query, duration, collection):
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+        return Response(
+            stream_with_context(events()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+    except RequestEntityTooLarge:
+        return jsonify({'error': 'Request too large'}), 413
+    except Exception as e:
+        logger.error(f"❌ Error in /ask/stream endpoint: {e}")
+        return jsonify({
+            'error': 'Internal server error',
+            'message': 'Please try again later'
+        }), 500
+
 @app.route('/static/<path:filename>')
 def static_files(filename):
     """Serve static files."""
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+Educational Assistant - ASGI Server Mode
+Serves the Flask app from an asyncio event loop with admission control:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+Requests are sorted into two lanes, each with its own bounded thread pool and
+bounded admission queue:
+    retrieval  - document-grounded /ask, /ask/batch and /ask/stream (fast template path)
+    generation - queries asking for external knowledge (LLM)
+When a lane's queue is full the request is rejected with 429; a request that
+waits longer than ADMISSION_TIMEOUT for a worker gets 503. Both carry a
+Retry-After estimated from the lane's recent service times. A retrieval
+request whose query finds no context falls back to the LLM: it gives up its
+retrieval slot and waits for a generation slot first (503 if it gets none, and
+every later LLM fallback in the same batch is rejected too). /health, /ready
+and static files bypass admission so probes keep working under load.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app import app as flask_app, assistant, GenerationRejectedError
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+
+class AdmissionLane:
+    """A bounded executor plus a bounded queue of requests waiting for it."""
+
+    def __init__(self, name: str, concurrency: int, queue_size: int, timeout: float, spare_threads: int = 0):
+        """
+        Initialize the lane.
+
+        Args:
+            name: Lane name used in logs and rejections
+            concurrency: Requests executing at once (slots)
+            queue_size: Requests allowed to wait for a free slot
+            timeout: Seconds a request may wait before it is rejected with 503
+            spare_threads: Executor threads beyond concurrency, for requests that
+                gave their slot up for another lane but still run on this lane's thread
+        """
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.queue_size = max(0, queue_size)
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency + max(0, spare_threads),
+                                           thread_name_prefix=f"{name}-lane")
+        self.slots: Optional[asyncio.Semaphore] = None
+        self.waiting = 0
+        self.running = 0
+        self.service_seconds = 1.0  # moving average, seeds Retry-After
+
+        # Statistics
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self.handed_off = 0
+
+    def retry_after(self) -> int:
+        """Seconds a rejected client should wait: time to drain the current queue."""
+        backlog = (self.waiting + self.running) / self.concurrency
+        return max(1, int(round(backlog * self.service_seconds)))
+
+    async def acquire(self) -> Optional[int]:
+        """
+        Wait for a free thread.
+
+        Returns:
+            None when admitted, otherwise the HTTP status to reject with (429 or 503)
+        """
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(self.concurrency)
+        if self.slots.locked() and self.waiting >= self.queue_size:
+            self.rejected_full += 1
+            return 429
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.slots.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.rejected_timeout += 1
+            return 503
+        finally:
+            self.waiting -= 1
+
+        self.running += 1
+        self.admitted += 1
+        return None
+
+    def release(self, seconds: float) -> None:
+        """Free the thread and fold the request's duration into the moving average."""
+        self.running -= 1
+        self.service_seconds = 0.8 * self.service_seconds + 0.2 * seconds
+        self.slots.release()
+
+    def hand_off(self, seconds: float) -> None:
+        """Free the slot of a request that moves on to another lane."""
+        self.handed_off += 1
+        self.release(seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        """Lane statistics."""
+        return {
+            'concurrency': self.concurrency,
+            'queue_size': self.queue_size,
+            'running': self.running,
+            'waiting': self.waiting,
+            'admitted': self.admitted,
+            'rejected_full': self.rejected_full,
+            'rejected_timeout': self.rejected_timeout,
+            'handed_off': self.handed_off,
+            'avg_service_seconds': round(self.service_seconds, 3)
+        }
+
+
+class Admission:
+    """The lane slot a request holds; changes when the request is handed off to another lane."""
+
+    def __init__(self, lane: AdmissionLane, loop: asyncio.AbstractEventLoop):
+        self.lane: Optional[AdmissionLane] = lane
+        self.loop = loop
+        self.started = time.perf_counter()
+        self.rejected = False  # the generation lane turned the request away; it holds no slot
+
+
+class AsgiApp:
+    """ASGI application running the Flask (WSGI) app in admission-controlled thread pools."""
+
+    def __init__(self, wsgi_app, retrieval: AdmissionLane, generation: AdmissionLane):
+        """
+        Initialize the ASGI app.
+
+        Args:
+            wsgi_app: WSGI application to serve
+            retrieval: Lane for document-grounded queries
+            generation: Lane for LLM generation
+        """
+        self.wsgi_app = wsgi_app
+        self.lanes = {'retrieval': retrieval, 'generation': generation}
+        self.local = threading.local()  # the Admission of the request running on each executor thread
+        # Probes, the page and static files: never queued behind queries
+        self.control_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='control')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        body = await self.read_body(receive)
+        if body is None:
+            await self.send_json(send, 413, {'error': 'Request too large'})
+            return
+
+        lane = self.lanes.get(self.classify(scope, body))
+        if lane is None:
+            await self.run_wsgi(scope, body, receive, send, self.control_executor)
+            return
+
+        status = await lane.acquire()
+        if status is not None:
+            retry_after = lane.retry_after()
+            logger.warning(f"⚠️ {lane.name} lane {'full' if status == 429 else 'timed out'}, "
+                           f"rejecting with {status} (retry after {retry_after}s)")
+            await self.send_json(send, status, {
+                'error': 'Server busy' if status == 429 else 'Server overloaded',
+                'message': f"Too many {lane.name} requests in progress, please retry shortly",
+                'lane': lane.name
+            }, headers=[(b'retry-after', str(retry_after).encode())])
+            return
+
+        admission = Admission(lane, asyncio.get_running_loop())
+        try:
+            await self.run_wsgi(scope, body, receive, send, lane.executor, admission)
+        finally:
+            if admission.lane is not None:
+                admission.lane.release(time.perf_counter() - admission.started)
+
+    @contextmanager
+    def generation_handoff(self) -> Iterator[None]:
+        """
+        Move the request running on this thread from the retrieval lane into the
+        generation lane before it runs the LLM (EducationalAssistant.lane_handoff).
+
+        The retrieval slot is released first, so slow generations never hold the
+        slots of document-grounded queries; the request keeps its executor thread
+        (the retrieval lane has spare threads for this).
+
+        Raises:
+            GenerationRejectedError: The generation lane was full or had no free slot in
+                time, now or for an earlier LLM fallback of the same request (batch items)
+        """
+        admission = getattr(self.local, 'admission', None)
+        retrieval, generation = self.lanes['retrieval'], self.lanes['generation']
+        if admission is not None and admission.rejected:
+            # The request holds no slot any more; its remaining fallbacks must not run ungated
+            raise GenerationRejectedError('Too many generation requests in progress, please retry shortly',
+                                          retry_after=generation.retry_after())
+        if admission is None or admission.lane is not retrieval:
+            yield
+            return
+
+        loop = admission.loop
+        admission.lane = None
+        loop.call_soon_threadsafe(retrieval.hand_off, time.perf_counter() - admission.started)
+        status = asyncio.run_coroutine_threadsafe(generation.acquire(), loop).result()
+        if status is not None:
+            admission.rejected = True
+            retry_after = generation.retry_after()
+            logger.warning(f"⚠️ generation lane {'full' if status == 429 else 'timed out'}, "
+                           f"shedding LLM fallback (retry after {retry_after}s)")
+            raise GenerationRejectedError('Too many generation requests in progress, please retry shortly',
+                                          retry_after=retry_after)
+        admission.lane = generation
+        admission.started = time.perf_counter()
+        yield
+
+    def classify(self, scope: Dict[str, Any], body: bytes) -> Optional[str]:
+        """Pick the lane for a request; None bypasses admission."""
+        path = scope['path']
+        if scope['method'] != 'POST' or not path.startswith('/ask'):
+            return None
+
+        try:
+            data = json.loads(body or b'{}')
+            if path == '/ask/batch':
+                queries = data.get('queries') or []
+                texts = [q.get('query', '') if isinstance(q, dict) else q for q in queries]
+            else:
+                texts = [data.get('query', '')]
+            if any(isinstance(text, str) and assistant.query_analyzer.analyze(text).external_knowledge
+                   for text in texts):
+                return 'generation'
+        except (ValueError, AttributeError):
+            pass  # Flask reports malformed bodies
+        return 'retrieval'
+
+    async def read_body(self, receive) -> Optional[bytes]:
+        """Read the full request body (None if it exceeds MAX_BODY_BYTES)."""
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                return None
+            chunks.append(chunk)
+            if not message.get('more_body'):
+                break
+        return b''.join(chunks)
+
+    def environ(self, scope: Dict[str, Any], body: bytes):
+        """Build a WSGI environ for an ASGI HTTP scope."""
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            'PATH_INFO': scope['path'],
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+            elif name != 'CONTENT_LENGTH':
+                key = f"HTTP_{name}"
+                environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+    async def run_wsgi(self, scope, body: bytes, receive, send, executor: ThreadPoolExecutor,
+                       admission: Optional[Admission] = None) -> None:
+        """
+        Run the WSGI app on one executor thread and relay its output.
+
+        The whole response is produced on a single thread (Flask's request context
+        is thread-bound); chunks are handed to the event loop as they are yielded,
+        so Server-Sent Events stream. A client disconnect closes the WSGI iterator,
+        which stops LLM generation for /ask/stream.
+        """
+        loop = asyncio.get_running_loop()
+        messages: asyncio.Queue = asyncio.Queue()
+        disconnected = threading.Event()
+        environ = self.environ(scope, body)
+
+        def emit(item) -> None:
+            loop.call_soon_threadsafe(messages.put_nowait, item)
+
+        def start_response(status: str, headers: List[Tuple[str, str]], exc_info=None):
+            emit(('start', int(status.split(' ', 1)[0]), headers))
+            return lambda data: emit(('body', data))
+
+        def respond() -> None:
+            iterable = None
+            self.local.admission = admission
+            try:
+                iterable = self.wsgi_app(environ, start_response)
+                for chunk in iterable:
+                    if disconnected.is_set():
+                        break
+                    if chunk:
+                        emit(('body', chunk))
+            except Exception as e:
+                logger.error(f"❌ Unhandled error serving {environ['PATH_INFO']}: {e}")
+                emit(('error', None))
+            finally:
+                close = getattr(iterable, 'close', None)
+                if close is not None:
+                    close()
+                self.local.admission = None
+                emit(('end', None))
+
+        async def watch_disconnect() -> None:
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    disconnected.set()
+                    return
+
+        watcher = asyncio.ensure_future(watch_disconnect())
+        job = loop.run_in_executor(executor, respond)
+        started = finished = False
+        try:
+            while True:
+                kind, *payload = await messages.get()
+                if kind == 'start':
+                    status, headers = payload
+                    await send({
+                        'type': 'http.response.start',
+                        'status': status,
+                        'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+                    })
+                    started = True
+                elif kind == 'body':
+                    if not disconnected.is_set() and not finished:
+                        await send({'type': 'http.response.body', 'body': payload[0], 'more_body': True})
+                elif kind == 'error':
+                    if not started:
+                        await self.send_json(send, 500, {'error': 'Internal server error'})
+                        started = finished = True
+                else:
+                    if started and not finished and not disconnected.is_set():
+                        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+                    break
+        except OSError:
+            disconnected.set()
+        finally:
+            watcher.cancel()
+            await job
+
+    async def send_json(self, send, status: int, payload: Dict[str, Any],
+                        headers: Optional[List[Tuple[bytes, bytes]]] = None) -> None:
+        """Send a complete JSON response."""
+        body = json.dumps(payload).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json'),
+                        (b'content-length', str(len(body)).encode())] + (headers or [])
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def lifespan(self, receive, send) -> None:
+        """Handle server startup and shutdown."""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                logger.info(f"🚀 ASGI lanes: {', '.join(f'{n}={l.concurrency}+{l.queue_size}' for n, l in self.lanes.items())}")
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for lane in self.lanes.values():
+                    lane.executor.shutdown(wait=False)
+                self.control_executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-lane admission statistics."""
+        return {name: lane.stats() for name, lane in self.lanes.items()}
+
+
+admission_timeout = float(os.getenv('ADMISSION_TIMEOUT', 30))
+generation_queue = int(os.getenv('GENERATION_QUEUE', 8))
+app = AsgiApp(
+    flask_app,
+    retrieval=AdmissionLane('retrieval',
+                            concurrency=int(os.getenv('RETRIEVAL_CONCURRENCY', 8)),
+                            queue_size=int(os.getenv('RETRIEVAL_QUEUE', 64)),
+                            timeout=admission_timeout,
+                            # Handed-off requests running or waiting in the generation lane
+                            spare_threads=assistant.generation_concurrency + generation_queue),
+    generation=AdmissionLane('generation',
+                             concurrency=assistant.generation_concurrency,
+                             queue_size=generation_queue,
+                             timeout=admission_timeout)
+)
+# /health reports lane statistics, and LLM fallbacks take generation slots, when serving through ASGI
+assistant.admission_stats = app.stats
+assistant.lane_handoff = app.generation_handoff
@@ -0,0 +1,11 @@
+"""
+Educational Assistant - Benchmarks
+Offline load and latency benchmarks run against deterministic stub models.
+
+Modules:
+    stubs             - hashing sentence encoder, text generator and Drive service with simulated latency
+    corpus            - synthetic chunk, PDF and query corpora, and recorded query files
+    harness           - stage timing, memory sampling, percentile summaries, git revision checkouts, result tables
+    query_benchmark   - replays queries through process_query and /ask (python -m benchmarks.query_benchmark)
+    ingest_benchmark  - ingests synthetic PDF folders through process_folder (python -m benchmarks.ingest_benchmark)
+"""
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Educational Assistant - Benchmark Corpora
+Synthetic curriculum chunks, PDF folders and teacher queries generated from a
+seed, and loading of recorded query files, so every run replays the same workload.
+"""
+
+import os
+import json
+import random
+import shutil
+from typing import Any, Dict, Iterator, List
+
+# Topic vocabularies; chunks and queries draw on the same words so retrieval finds matches
+TOPICS = {
+    'music': ('rhythm', 'melody', 'beat', 'tempo', 'dynamics', 'pitch', 'singing', 'choir', 'drum',
+              'instrument', 'ensemble', 'notation', 'ostinato', 'percussion', 'harmony', 'meter'),
+    'math': ('fractions', 'place', 'value', 'multiplication', 'division', 'geometry', 'angles', 'measurement',
+             'equations', 'patterns', 'decimals', 'area', 'perimeter', 'graphing', 'estimation', 'number'),
+    'science': ('ecosystems', 'water', 'cycle', 'weather', 'plants', 'energy', 'magnets', 'matter',
+                'habitats', 'erosion', 'forces', 'motion', 'solar', 'system', 'life', 'cells'),
+    'reading': ('phonics', 'fluency', 'comprehension', 'vocabulary', 'inference', 'narrative', 'poetry',
+                'main', 'idea', 'characters', 'setting', 'summarize', 'fiction', 'informational', 'text', 'author'),
+}
+STANDARD_PREFIXES = {'music': 'MU', 'math': 'MA', 'science': 'SC', 'reading': 'ELA'}
+STRANDS = ('C', 'S', 'H', 'F', 'O')
+PEDAGOGY = ('students', 'will', 'identify', 'describe', 'demonstrate', 'practice', 'collaborate', 'assessment',
+            'objective', 'differentiation', 'scaffold', 'modeling', 'guided', 'independent', 'rubric',
+            'formative', 'summative', 'engagement', 'discussion', 'reflection', 'grade', 'lesson', 'unit')
+SYLLABLES = ('ka', 'ri', 'mo', 'lu', 'te', 'sa', 'vi', 'no', 'pe', 'da', 'zo', 'mi', 'ra', 'tu', 'be', 'lo')
+
+ACTIVITIES = ('Create a lesson', 'Plan an activity', 'Design a unit opener', 'Write a review lesson',
+              'Build a small-group lesson', 'Plan a hands-on lesson')
+GRADES = ('kindergarten', 'grade 1', 'grade 2', 'grade 3', 'grade 4', 'grade 5', 'grade 7', 'grade 10')
+DURATIONS = ('20 minutes', '30 minutes', '45 minutes', '1 hour', '2 class periods')
+EXTERNAL_PHRASES = ('include best practices', 'search the web for current trends', 'go beyond the documents')
+
+
+def standard_code(rng: random.Random, subject: str) -> str:
+    """A standards code shaped like the Florida ones in the curriculum, e.g. MU.2.S.3.1."""
+    grade = rng.choice(('K', '1', '2', '3', '4', '5'))
+    return f"{STANDARD_PREFIXES[subject]}.{grade}.{rng.choice(STRANDS)}.{rng.randint(1, 3)}.{rng.randint(1, 5)}"
+
+
+def synthetic_chunks(count: int, words_per_chunk: int = 300, seed: int = 0,
+                     chunks_per_file: int = 40) -> Iterator[Dict[str, Any]]:
+    """
+    Generate curriculum-like chunks.
+
+    Each chunk mixes one topic's vocabulary, pedagogy terms, a standards code and
+    filler words from a Zipf-like vocabulary, in the shape ingest.py produces.
+
+    Args:
+        count: Number of chunks
+        words_per_chunk: Words in each chunk
+        seed: Random seed
+        chunks_per_file: Consecutive chunks attributed to the same source PDF
+
+    Yields:
+        Chunk dicts with text, source and the metadata columns ingest.py writes
+    """
+    rng = random.Random(seed)
+    filler = [''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(5000)]
+    filler_weights = [1.0 / (rank + 1) for rank in range(len(filler))]
+    subjects = list(TOPICS)
+
+    for i in range(count):
+        subject = subjects[(i // chunks_per_file) % len(subjects)]
+        topical = rng.choices(TOPICS[subject], k=words_per_chunk // 4)
+        pedagogy = rng.choices(PEDAGOGY, k=words_per_chunk // 4)
+        words = topical + pedagogy + rng.choices(filler, weights=filler_weights,
+                                                 k=words_per_chunk - len(topical) - len(pedagogy) - 1)
+        rng.shuffle(words)
+        words.insert(rng.randrange(len(words)), standard_code(rng, subject))
+
+        file_number = i // chunks_per_file
+        yield {
+            'text': ' '.join(words),
+            'source': f"synthetic_{subject}_{file_number:05d}.pdf",
+            'chunk_id': i % chunks_per_file,
+            'word_count': len(words),
+            'start_word': (i % chunks_per_file) * words_per_chunk,
+            'end_word': (i % chunks_per_file + 1) * words_per_chunk,
+            'file_id': f"synthetic-{file_number:05d}",
+            'vector_id': i
+        }
+
+
+def write_synthetic_pdfs(folder: str, documents: int, pages: int, words_per_page: int = 400,
+                         seed: int = 0) -> Dict[str, int]:
+    """
+    Write a folder of curriculum-like PDFs with PyMuPDF.
+
+    Every page holds one synthetic chunk's words as wrapped lines of text, so
+    extraction has real PDF text objects to parse. An existing folder written
+    with the same arguments is reused.
+
+    Args:
+        folder: Output directory
+        documents: Number of PDF files
+        pages: Pages per file
+        words_per_page: Words on each page
+        seed: Random seed
+
+    Returns:
+        Counts of documents, pages, words and bytes in the folder
+    """
+    import fitz  # PyMuPDF
+
+    summary_path = os.path.join(folder, 'corpus.json')
+    if os.path.exists(summary_path):
+        with open(summary_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    partial = f"{folder}.partial"
+    shutil.rmtree(partial, ignore_errors=True)
+    os.makedirs(partial)
+
+    words_per_line = 14
+    lines_per_page = -(-words_per_page // words_per_line)
+    # Letter pages with one-inch margins; shrink the font when the text would not fit
+    margin, usable_height = 72, 792 - 2 * 72
+    fontsize = min(9.0, usable_height / (lines_per_page * 1.25))
+
+    chunks = synthetic_chunks(documents * pages, words_per_chunk=words_per_page, seed=seed, chunks_per_file=pages)
+    total_bytes = 0
+    for number in range(documents):
+        doc = fitz.open()
+        name = None
+        for _ in range(pages):
+            chunk = next(chunks)
+            name = chunk['source']
+            words = chunk['text'].split()
+            lines = [' '.join(words[i:i + words_per_line]) for i in range(0, len(words), words_per_line)]
+            page = doc.new_page(width=612, height=792)
+            page.insert_text((margin, margin + fontsize), lines, fontsize=fontsize)
+        path = os.path.join(partial, name)
+        doc.save(path, garbage=3, deflate=True)
+        doc.close()
+        total_bytes += os.path.getsize(path)
+
+    summary = {'documents': documents, 'pages': documents * pages, 'words': documents * pages * words_per_page,
+               'bytes': total_bytes}
+    with open(os.path.join(partial, 'corpus.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f)
+    shutil.rmtree(folder, ignore_errors=True)
+    os.rename(partial, folder)
+    return summary
+
+
+def synthetic_queries(count: int, seed: int = 0, external_ratio: float = 0.1) -> List[Dict[str, str]]:
+    """
+    Generate teacher queries with durations.
+
+    Args:
+        count: Number of distinct queries
+        seed: Random seed
+        external_ratio: Fraction asking for knowledge beyond the documents (the LLM path)
+
+    Returns:
+        Dicts with 'query' and 'duration'
+    """
+    rng = random.Random(seed)
+    queries = []
+    seen = set()
+    while len(queries) < count:
+        subject = rng.choice(list(TOPICS))
+        topic = ' '.join(rng.sample(TOPICS[subject], 2))
+        query = f"{rng.choice(ACTIVITIES)} on {topic} for {rng.choice(GRADES)}"
+        if subject == 'music' and rng.random() < 0.5:
+            query += f" aligned to {standard_code(rng, subject)}"
+        if rng.random() < external_ratio:
+            query += f", {rng.choice(EXTERNAL_PHRASES)}"
+        if query in seen:
+            continue
+        seen.add(query)
+        queries.append({'query': query, 'duration': rng.choice(DURATIONS)})
+    return queries
+
+
+def load_queries(path: str) -> List[Dict[str, str]]:
+    """
+    Load a recorded query corpus.
+
+    Lines are either JSON objects with 'query' (and optionally 'duration') or
+    plain query text; blank lines are skipped.
+    """
+    queries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                item = json.loads(line)
+                queries.append({'query': str(item['query']), 'duration': str(item.get('duration') or '')})
+            else:
+                queries.append({'query': line, 'duration': ''})
+    return queries
+
+
+def replay_order(queries: List[Dict[str, str]], requests: int, seed: int = 0) -> List[Dict[str, str]]:
+    """
+    The request sequence: the corpus cycled to the requested length, shuffled.
+
+    More requests than distinct queries produce repeats, so cache hit rates
+    follow from requests / len(queries).
+    """
+    if not queries:
+        raise ValueError("Query corpus is empty")
+    sequence = [queries[i % len(queries)] for i in range(requests)]
+    random.Random(seed).shuffle(sequence)
+    return sequence
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Educational Assistant - Benchmark Harness
+Stage timing, percentile summaries, git revision checkouts and result tables
+shared by the benchmark scripts.
+
+Each measurement runs in a fresh Python process whose import path starts with
+the source tree under test, so a git revision is benchmarked with its own
+app.py / ingest.py while the harness itself always comes from this checkout.
+"""
+
+import os
+import sys
+import bisect
+import json
+import time
+import shutil
+import tempfile
+import threading
+import subprocess
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKING_TREE = '.'  # revision label for the uncommitted checkout
+# Imports the benchmarks package from this checkout even when the tree under test has its own (older) copy
+WORKER_BOOTSTRAP = ("import sys; sys.path.insert(0, {root!r}); import benchmarks; sys.path.pop(0); "
+                    "from {module} import worker_main; sys.exit(worker_main())")
+
+
+class StageRecorder:
+    """Thread-safe lists of stage durations in seconds, and when each call ran."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = {}
+        self.spans: Dict[str, List[Tuple[float, float]]] = {}
+
+    def record(self, stage: str, seconds: float) -> None:
+        """Record a call of the stage that ended just now."""
+        end = time.perf_counter()
+        with self.lock:
+            self.samples.setdefault(stage, []).append(seconds)
+            self.spans.setdefault(stage, []).append((end - seconds, end))
+
+    def reset(self) -> None:
+        with self.lock:
+            self.samples = {}
+            self.spans = {}
+
+    def busy(self, stage: str) -> float:
+        """Wall seconds during which at least one call of the stage was running."""
+        with self.lock:
+            spans = sorted(self.spans.get(stage, ()))
+        seconds, current_start, current_end = 0.0, None, None
+        for start, end in spans:
+            if current_end is None or start > current_end:
+                if current_end is not None:
+                    seconds += current_end - current_start
+                current_start, current_end = start, end
+            else:
+                current_end = max(current_end, end)
+        if current_end is not None:
+            seconds += current_end - current_start
+        return seconds
+
+    def wrap(self, stage: str, function: Callable) -> Callable:
+        """Wrap a callable so every call is recorded under stage."""
+        @wraps(function)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+        return timed
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Count, mean and p50/p95/p99 in milliseconds per stage."""
+        with self.lock:
+            samples = {stage: list(values) for stage, values in self.samples.items()}
+        return {stage: summarize(values) for stage, values in sorted(samples.items())}
+
+
+class TimedProxy:
+    """Delegates to an object, recording calls to one of its methods (e.g. a FAISS index's search)."""
+
+    def __init__(self, target: Any, method: str, stage: str, recorder: StageRecorder):
+        self._target = target
+        self._method = method
+        self._timed = recorder.wrap(stage, getattr(target, method))
+
+    def __getattr__(self, name: str) -> Any:
+        if name == self._method:
+            return self._timed
+        return getattr(self._target, name)
+
+
+class MemorySampler:
+    """
+    Samples the resident memory of this process and its children (e.g. extraction
+    workers) on a background thread, so peaks can be attributed to the stages
+    that were running when they occurred.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        import psutil
+
+        self.process = psutil.Process()
+        self.interval = interval
+        self.samples: List[Tuple[float, int]] = []
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='memory-sampler', daemon=True)
+
+    def rss(self) -> int:
+        """Resident bytes of this process plus its live children."""
+        total = self.process.memory_info().rss
+        for child in self.process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except Exception:
+                pass  # exited between listing and sampling
+        return total
+
+    def run(self) -> None:
+        while not self.stop_event.is_set():
+            self.samples.append((time.perf_counter(), self.rss()))
+            self.stop_event.wait(self.interval)
+
+    def __enter__(self) -> 'MemorySampler':
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop_event.set()
+        self.thread.join()
+        self.samples.append((time.perf_counter(), self.rss()))
+
+    def peak_mb(self, spans: Optional[Sequence[Tuple[float, float]]] = None) -> Optional[float]:
+        """
+        Highest sampled RSS in MB, overall or while any of the (start, end) spans
+        was running. Each span also takes the first sample after it ends, so calls
+        shorter than the sampling interval still count.
+        """
+        if spans is None:
+            values = [rss for _, rss in self.samples]
+        else:
+            times = [at for at, _ in self.samples]
+            values = []
+            for start, end in spans:
+                first = bisect.bisect_left(times, start)
+                values.extend(rss for _, rss in self.samples[first:bisect.bisect_right(times, end) + 1])
+        return round(max(values) / 1024 / 1024, 1) if values else None
+
+
+def summarize(seconds: Sequence[float]) -> Dict[str, float]:
+    """Count, mean and p50/p95/p99 of durations, in milliseconds."""
+    if not len(seconds):
+        return {'count': 0}
+    values = np.asarray(seconds, dtype=np.float64) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'count': int(len(values)),
+        'mean_ms': round(float(values.mean()), 3),
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3)
+    }
+
+
+def resolve_revision(revision: str) -> str:
+    """Full commit hash of a revision (branch, tag, sha or HEAD~n)."""
+    return subprocess.run(['git', 'rev-parse', '--verify', f"{revision}^{{commit}}"], cwd=REPO_ROOT,
+                          check=True, capture_output=True, text=True).stdout.strip()
+
+
+@contextmanager
+def checkout(revision: str) -> Iterator[str]:
+    """
+    Source tree of a revision: this checkout for WORKING_TREE, otherwise a
+    temporary detached git worktree removed afterwards.
+    """
+    if revision == WORKING_TREE:
+        yield REPO_ROOT
+        return
+
+    commit = resolve_revision(revision)
+    path = tempfile.mkdtemp(prefix=f"bench-{commit[:12]}-")
+    os.rmdir(path)
+    subprocess.run(['git', 'worktree', 'add', '--detach', path, commit], cwd=REPO_ROOT,
+                   check=True, capture_output=True)
+    try:
+        yield path
+    finally:
+        subprocess.run(['git', 'worktree', 'remove', '--force', path], cwd=REPO_ROOT, capture_output=True)
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def run_worker(module: str, tree: str, cwd: str, args: List[str],
+               env: Optional[Dict[str, str]] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Run a benchmark module's worker_main in a fresh process against a source tree.
+
+    Args:
+        module: Benchmark module providing the worker entry point
+        tree: Source tree imported first (its app.py, ingest.py, ...)
+        cwd: Working directory (where index files are read and written)
+        args: Worker arguments
+        env: Extra environment variables
+        timeout: Seconds before the worker is killed
+
+    Returns:
+        The JSON object the worker wrote to its result file
+    """
+    os.makedirs(cwd, exist_ok=True)
+    fd, result_path = tempfile.mkstemp(prefix='bench-result-', suffix='.json')
+    os.close(fd)
+
+    worker_env = dict(os.environ)
+    worker_env.update(env or {})
+    # The tree under test provides app.py, ingest.py, ...
+    worker_env['PYTHONPATH'] = os.pathsep.join([tree, worker_env.get('PYTHONPATH', '')]).rstrip(os.pathsep)
+    # Stub models only: never try to reach the Hugging Face hub
+    worker_env.setdefault('HF_HUB_OFFLINE', '1')
+    worker_env.setdefault('TRANSFORMERS_OFFLINE', '1')
+
+    try:
+        completed = subprocess.run(
+            [sys.executable, '-c', WORKER_BOOTSTRAP.format(root=REPO_ROOT, module=module), '--result', result_path] + args,
+            cwd=cwd, env=worker_env, capture_output=True, text=True, timeout=timeout
+        )
+        if completed.returncode != 0:
+            raise RuntimeError(f"{module} worker failed ({completed.returncode}):\n{completed.stderr[-4000:]}")
+        with open(result_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    finally:
+        os.remove(result_path)
+
+
+def write_result(path: str, result: Dict[str, Any]) -> None:
+    """Write a worker's result for run_worker to read."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(result, f)
+
+
+def print_table(headers: Sequence[str], rows: Sequence[Sequence[Any]]) -> None:
+    """Print rows as an aligned text table."""
+    cells = [[str(header) for header in headers]] + [[format_cell(value) for value in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    for n, row in enumerate(cells):
+        print('  ' + '  '.join(cell.rjust(width) if i else cell.ljust(width)
+                               for i, (cell, width) in enumerate(zip(row, widths))))
+        if n == 0:
+            print('  ' + '  '.join('-' * width for width in widths))
+
+
+def format_cell(value: Any) -> str:
+    if value is None:
+        return '-'
+    if isinstance(value, float):
+        return f"{value:.1f}" if abs(value) >= 100 else f"{value:.2f}"
+    return str(value)
+
+
+def relative_change(base: Optional[float], value: Optional[float]) -> Optional[float]:
+    """(value - base) / base, or None when either is missing or base is zero."""
+    if not base or value is None:
+        return None
+    return (value - base) / base
+
+
+def compare_results(baseline: List[Dict[str, Any]], candidate: List[Dict[str, Any]], key: Callable[[Dict], Tuple],
+                    metrics: Sequence[Tuple[str, Callable[[Dict], Optional[float]], bool]],
+                    threshold: float) -> Tuple[List[List[Any]], int]:
+    """
+    Pair results by key and compute relative changes.
+
+    Args:
+        baseline: Results of the baseline revision
+        candidate: Results of the revision compared against it
+        key: Identifies the same scenario in both runs (e.g. corpus size and concurrency)
+        metrics: (name, getter, higher_is_better) triples
+        threshold: Relative worsening reported as a regression (0.1 = 10%)
+
+    Returns:
+        Table rows (scenario, then "value (+x%)" per metric, then a verdict) and the regression count
+    """
+    base_by_key = {key(result): result for result in baseline}
+    rows = []
+    regressions = 0
+    for result in candidate:
+        base = base_by_key.get(key(result))
+        if base is None:
+            continue
+        row: List[Any] = list(key(result))
+        regressed = []
+        for name, getter, higher_is_better in metrics:
+            change = relative_change(getter(base), getter(result))
+            value = getter(result)
+            if change is None:
+                row.append(format_cell(value))
+                continue
+            worse = -change if higher_is_better else change
+            if worse > threshold:
+                regressed.append(name)
+            row.append(f"{format_cell(value)} ({change:+.0%})")
+        row.append(('REGRESSION: ' + ', '.join(regressed)) if regressed else 'ok')
+        regressions += bool(regressed)
+        rows.append(row)
+    return rows, regressions
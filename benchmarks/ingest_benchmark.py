@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Educational Assistant - Ingestion Benchmark
+Drives DocumentIngester.process_folder over synthetic PDF folders served by a
+stub Drive service, with a stub embedding model, and reports per-stage
+throughput (pages/s, chunks/s, embeddings/s) and peak memory for several
+document counts and sizes, comparing git revisions like the query benchmark.
+
+PDF folders are generated once with PyMuPDF and shared by every revision; each
+measurement runs in a fresh process against an empty output directory.
+
+Usage:
+    python -m benchmarks.ingest_benchmark --documents 20 200 --pages 5 40
+    python -m benchmarks.ingest_benchmark --extract-workers 0 3 --drive-latency-ms 50
+    python -m benchmarks.ingest_benchmark --revisions HEAD~1 . --fail-on-regression
+"""
+
+import os
+import re
+import sys
+import json
+import shutil
+import inspect
+import argparse
+import itertools
+from typing import Any, Dict, List, Optional
+
+from benchmarks.corpus import write_synthetic_pdfs
+from benchmarks.harness import (MemorySampler, StageRecorder, WORKING_TREE, checkout, compare_results,
+                                print_table, resolve_revision, run_worker, write_result)
+from benchmarks.stubs import StubDriveService, StubEncoder
+
+MODULE = 'benchmarks.ingest_benchmark'
+# Display order; extract (process_pdf) covers clean and chunk, and total covers everything
+STAGES = ('total', 'download', 'extract', 'clean', 'chunk', 'embed', 'index', 'save')
+# Work units each stage's throughput is measured in
+STAGE_UNITS = {'download': 'MB/s', 'extract': 'pages/s', 'clean': 'pages/s', 'chunk': 'chunks/s',
+               'embed': 'embeddings/s', 'index': 'vectors/s', 'save': 'chunks/s', 'total': 'pages/s'}
+
+
+def make_ingester(ingest_module: Any, opts: argparse.Namespace, drive: StubDriveService) -> Any:
+    """A DocumentIngester configured for a full rebuild, passing only the options the revision supports."""
+    options = {
+        'chunk_size': opts.chunk_size,
+        'chunk_overlap': opts.chunk_overlap,
+        'index_type': opts.index_type,
+        'incremental': False,
+        'download_workers': opts.download_workers,
+        'extract_workers': opts.extract_workers,
+        'embed_batch_size': opts.embed_batch_size,
+        'embedding_cache_dir': None,  # every run encodes every chunk
+        'build_bm25': True,
+        'stats_path': None,
+        'service_factory': lambda: drive,
+    }
+    accepted = inspect.signature(ingest_module.DocumentIngester).parameters
+    ingester = ingest_module.DocumentIngester(**{name: value for name, value in options.items() if name in accepted})
+    ingester.service = drive
+    return ingester
+
+
+def instrument(ingester: Any, recorder: StageRecorder) -> None:
+    """
+    Record stage timings by wrapping methods, which works on any revision of ingest.py.
+
+    Extraction, cleaning and chunking are only seen here when they run in this
+    process (extract_workers=0); worker processes use their own PdfProcessor. The
+    extract stage is the whole of process_pdf, like the ingestion stats' extract
+    time, since extraction and chunking interleave page by page; chunk_text is
+    only called separately by revisions that chunk the whole text at once.
+    """
+    for method, stage in (('download_pdf', 'download'), ('process_pdf', 'extract'),
+                          ('clean_text', 'clean'), ('chunk_text', 'chunk'), ('create_embeddings', 'embed'),
+                          ('build_faiss_index', 'index'), ('update_faiss_index', 'index'),
+                          ('save_index_and_documents', 'save'), ('process_folder', 'total')):
+        if hasattr(ingester, method):
+            setattr(ingester, method, recorder.wrap(stage, getattr(ingester, method)))
+
+
+def run_ingestion(opts: argparse.Namespace) -> Dict[str, Any]:
+    """Ingest the synthetic folder in this process, writing the index into the working directory."""
+    import ingest
+
+    with open(os.path.join(opts.folder, 'corpus.json'), 'r', encoding='utf-8') as f:
+        corpus = json.load(f)
+
+    drive = StubDriveService(opts.folder, latency_ms=opts.drive_latency_ms, mbps=opts.drive_mbps)
+    encoder = StubEncoder(opts.dimension, batch_ms=opts.encode_batch_ms, item_ms=opts.encode_item_ms)
+    ingester = make_ingester(ingest, opts, drive)
+    ingester.embedding_model = encoder
+
+    recorder = StageRecorder()
+    instrument(ingester, recorder)
+    with MemorySampler() as memory:
+        baseline_mb = round(memory.rss() / 1024 / 1024, 1)
+        success = ingester.process_folder('synthetic')
+
+    # Revisions with ingestion stats also time extraction inside worker processes
+    stats = ingester.stats.snapshot(success) if hasattr(getattr(ingester, 'stats', None), 'snapshot') else None
+    embeddings = encoder.items
+    units = {'download': corpus['bytes'] / 1024 / 1024, 'extract': corpus['pages'], 'clean': corpus['pages'],
+             'chunk': embeddings, 'embed': embeddings, 'index': embeddings, 'save': embeddings,
+             'total': corpus['pages']}
+
+    stages = {}
+    for stage in STAGES:
+        calls = len(recorder.samples.get(stage, ()))
+        busy = recorder.busy(stage) if calls else None
+        if busy is None and stats and stats['stage_seconds'].get(stage):
+            # Summed over worker processes, so the rate is per process
+            busy = stats['stage_seconds'][stage]
+        if busy is None:
+            continue
+        stages[stage] = {
+            'calls': calls,
+            'seconds': round(busy, 3),
+            'per_second': round(units[stage] / busy, 2) if busy else None,
+            'unit': STAGE_UNITS[stage],
+            'peak_rss_mb': memory.peak_mb(recorder.spans.get(stage)) if calls else None
+        }
+
+    total = recorder.busy('total')
+    return {
+        'documents': corpus['documents'],
+        'pages': corpus['pages'],
+        'bytes': corpus['bytes'],
+        'extract_workers': opts.extract_workers,
+        'success': bool(success),
+        'chunks': embeddings,
+        'wall_seconds': round(total, 3),
+        'pages_per_second': round(corpus['pages'] / total, 2) if total else None,
+        'chunks_per_second': round(embeddings / total, 2) if total else None,
+        'embeddings_per_second': stages.get('embed', {}).get('per_second'),
+        'stages': stages,
+        'baseline_rss_mb': baseline_mb,
+        'peak_rss_mb': memory.peak_mb()
+    }
+
+
+def worker_main(argv: Optional[List[str]] = None) -> int:
+    """Entry point of the per-measurement process started by run_worker."""
+    parser = argparse.ArgumentParser(description='Ingestion benchmark worker')
+    parser.add_argument('--result', required=True)
+    parser.add_argument('--folder', required=True)
+    parser.add_argument('--chunk-size', type=int, default=300)
+    parser.add_argument('--chunk-overlap', type=int, default=50)
+    parser.add_argument('--index-type', default='flat')
+    parser.add_argument('--download-workers', type=int, default=4)
+    parser.add_argument('--extract-workers', type=int, default=0)
+    parser.add_argument('--embed-batch-size', type=int, default=256)
+    parser.add_argument('--dimension', type=int, default=384)
+    parser.add_argument('--encode-batch-ms', type=float, default=0.0)
+    parser.add_argument('--encode-item-ms', type=float, default=0.0)
+    parser.add_argument('--drive-latency-ms', type=float, default=0.0)
+    parser.add_argument('--drive-mbps', type=float, default=0.0)
+    opts = parser.parse_args(argv)
+
+    write_result(opts.result, run_ingestion(opts))
+    return 0
+
+
+def stage_value(result: Dict[str, Any], stage: str, field: str) -> Optional[float]:
+    return result['stages'].get(stage, {}).get(field)
+
+
+def report(results: List[Dict[str, Any]]) -> None:
+    """Print overall and per-stage throughput and memory of every measurement."""
+    for revision in dict.fromkeys(result['revision'] for result in results):
+        runs = [result for result in results if result['revision'] == revision]
+        print(f"\n{revision}")
+        print_table(
+            ('docs', 'pages', 'workers', 'ok', 'chunks', 'seconds', 'pages/s', 'chunks/s', 'emb/s',
+             'base MB', 'peak MB'),
+            [(r['documents'], r['pages'], r['extract_workers'], r['success'], r['chunks'], r['wall_seconds'],
+              r['pages_per_second'], r['chunks_per_second'], r['embeddings_per_second'],
+              r['baseline_rss_mb'], r['peak_rss_mb']) for r in runs]
+        )
+        print()
+        print_table(
+            ('docs', 'pages', 'workers', 'stage', 'calls', 'seconds', 'rate', 'unit', 'peak MB'),
+            [(r['documents'], r['pages'], r['extract_workers'], stage, r['stages'][stage]['calls'],
+              r['stages'][stage]['seconds'], r['stages'][stage]['per_second'], r['stages'][stage]['unit'],
+              r['stages'][stage]['peak_rss_mb']) for r in runs for stage in STAGES if stage in r['stages']]
+        )
+
+
+def compare(results: List[Dict[str, Any]], baseline: str, threshold: float) -> int:
+    """Print every other revision relative to the baseline; returns the number of regressed scenarios."""
+    metrics = [
+        ('pages/s', lambda r: r['pages_per_second'], True),
+        ('extract/s', lambda r: stage_value(r, 'extract', 'per_second'), True),
+        ('emb/s', lambda r: r['embeddings_per_second'], True),
+        ('index/s', lambda r: stage_value(r, 'index', 'per_second'), True),
+        ('peak MB', lambda r: r['peak_rss_mb'], False),
+    ]
+    base_runs = [result for result in results if result['revision'] == baseline]
+    regressions = 0
+    for revision in dict.fromkeys(result['revision'] for result in results):
+        if revision == baseline:
+            continue
+        rows, count = compare_results(base_runs, [r for r in results if r['revision'] == revision],
+                                      key=lambda r: (r['documents'], r['pages'], r['extract_workers']),
+                                      metrics=metrics, threshold=threshold)
+        print(f"\n{revision} vs {baseline} (regression threshold {threshold:.0%})")
+        print_table(('docs', 'pages', 'workers') + tuple(name for name, _, _ in metrics) + ('verdict',), rows)
+        regressions += count
+    return regressions
+
+
+def main():
+    """Run the benchmark matrix and print (and optionally save) the results."""
+    parser = argparse.ArgumentParser(description='Offline ingestion throughput benchmark')
+    parser.add_argument('--revisions', nargs='+', default=[WORKING_TREE],
+                        help="git revisions to benchmark, '.' for the working tree; the first is the baseline")
+    parser.add_argument('--documents', nargs='+', type=int, default=[20, 100], help='PDFs per synthetic folder')
+    parser.add_argument('--pages', nargs='+', type=int, default=[10], help='pages per PDF')
+    parser.add_argument('--words-per-page', type=int, default=400)
+    parser.add_argument('--extract-workers', nargs='+', type=int, default=[0],
+                        help='extraction processes (0 extracts in-process, which also times clean and chunk)')
+    parser.add_argument('--download-workers', type=int, default=4)
+    parser.add_argument('--embed-batch-size', type=int, default=256)
+    parser.add_argument('--chunk-size', type=int, default=300)
+    parser.add_argument('--chunk-overlap', type=int, default=50)
+    parser.add_argument('--index-type', default='flat')
+    parser.add_argument('--dimension', type=int, default=384)
+    parser.add_argument('--encode-batch-ms', type=float, default=5.0, help='simulated cost of one encode call')
+    parser.add_argument('--encode-item-ms', type=float, default=1.0, help='simulated cost per encoded chunk')
+    parser.add_argument('--drive-latency-ms', type=float, default=0.0, help='simulated Drive request round trip')
+    parser.add_argument('--drive-mbps', type=float, default=0.0, help='simulated download MB/s (0 is unlimited)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                        help='environment for the ingester under test (repeatable)')
+    parser.add_argument('--workdir', default='benchmark_runs', help='where PDFs and indexes are written')
+    parser.add_argument('--output', help='write all results to this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.10, help='relative worsening reported as a regression')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    parser.add_argument('--timeout', type=float, default=3600, help='seconds per measurement')
+    args = parser.parse_args()
+
+    env = dict(item.split('=', 1) for item in args.env)
+    workdir = os.path.abspath(args.workdir)
+    os.makedirs(workdir, exist_ok=True)
+
+    # Every revision ingests exactly the same PDFs
+    folders = {}
+    for documents, pages in itertools.product(args.documents, args.pages):
+        folder = os.path.join(workdir, 'pdfs', f"{documents}x{pages}x{args.words_per_page}-seed{args.seed}")
+        print(f"Generating {documents} PDFs of {pages} pages...", flush=True)
+        summary = write_synthetic_pdfs(folder, documents, pages, args.words_per_page, seed=args.seed)
+        folders[documents, pages] = folder
+        print(f"  {summary['pages']} pages, {summary['bytes'] / 1024 / 1024:.1f} MB", flush=True)
+
+    worker_args = ['--chunk-size', str(args.chunk_size), '--chunk-overlap', str(args.chunk_overlap),
+                   '--index-type', args.index_type, '--download-workers', str(args.download_workers),
+                   '--embed-batch-size', str(args.embed_batch_size), '--dimension', str(args.dimension),
+                   '--encode-batch-ms', str(args.encode_batch_ms), '--encode-item-ms', str(args.encode_item_ms),
+                   '--drive-latency-ms', str(args.drive_latency_ms), '--drive-mbps', str(args.drive_mbps)]
+
+    results = []
+    for revision in args.revisions:
+        label = 'working tree' if revision == WORKING_TREE else revision
+        commit = None if revision == WORKING_TREE else resolve_revision(revision)
+        with checkout(revision) as tree:
+            for (documents, pages), workers in itertools.product(folders, args.extract_workers):
+                output = os.path.join(workdir, 'ingest', re.sub(r'[^\w.-]', '_', label),
+                                      f"{documents}x{pages}-w{workers}")
+                shutil.rmtree(output, ignore_errors=True)
+                result = run_worker(MODULE, tree, output, worker_args + [
+                    '--folder', folders[documents, pages], '--extract-workers', str(workers)],
+                    env=env, timeout=args.timeout)
+                result.update(revision=label, commit=commit)
+                results.append(result)
+                print(f"[{label}] documents={documents} pages={pages} extract_workers={workers}: "
+                      f"{result['pages_per_second']} pages/s, {result['chunks_per_second']} chunks/s, "
+                      f"peak {result['peak_rss_mb']} MB{'' if result['success'] else ' (FAILED)'}", flush=True)
+
+    report(results)
+    regressions = 0
+    if len(args.revisions) > 1:
+        baseline = 'working tree' if args.revisions[0] == WORKING_TREE else args.revisions[0]
+        regressions = compare(results, baseline, args.threshold)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'settings': vars(args), 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    failed = any(not result['success'] for result in results)
+    return 1 if failed or (regressions and args.fail_on_regression) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
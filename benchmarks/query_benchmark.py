@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Educational Assistant - Query Benchmark
+Replays a query corpus against EducationalAssistant.process_query and the Flask
+/ask route with deterministic stub models, at several concurrency levels and
+corpus sizes, and compares git revisions so regressions show up.
+
+For every revision and corpus size a synthetic index is built with that
+revision's own ingest.py; every (target, concurrency) pair then runs in a fresh
+process so caches, memory and threads never leak between measurements.
+
+Usage:
+    python -m benchmarks.query_benchmark --chunks 1000 10000 --concurrency 1 4 16
+    python -m benchmarks.query_benchmark --corpus queries.jsonl --target flask
+    python -m benchmarks.query_benchmark --revisions HEAD~1 . --fail-on-regression
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import itertools
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.corpus import synthetic_chunks, synthetic_queries, load_queries, replay_order
+from benchmarks.harness import (StageRecorder, TimedProxy, WORKING_TREE, checkout, compare_results,
+                                print_table, resolve_revision, run_worker, write_result)
+from benchmarks.stubs import StubEncoder, StubTextGenerator
+
+MODULE = 'benchmarks.query_benchmark'
+TARGETS = ('process_query', 'flask')
+# Display order; nested stages are included in their parent (retrieve covers embed and the searches)
+STAGES = ('total', 'retrieve', 'embed', 'faiss_search', 'bm25_search', 'generate', 'llm', 'template', 'gc')
+
+
+def build_fixture(chunks: int, words: int, seed: int, dimension: int, index_type: str) -> Dict[str, Any]:
+    """Write a synthetic index into the working directory with the revision's own ingest.py."""
+    import ingest
+
+    try:
+        ingester = ingest.DocumentIngester(index_type=index_type)
+    except TypeError:
+        # Revisions before configurable index types always build a flat index
+        ingester = ingest.DocumentIngester()
+
+    start = time.perf_counter()
+    documents = list(synthetic_chunks(chunks, words_per_chunk=words, seed=seed))
+    embeddings = StubEncoder(dimension).encode([doc['text'] for doc in documents], batch_size=256)
+    index = ingester.build_faiss_index(embeddings)
+    if index is None or not ingester.save_index_and_documents(index, documents):
+        raise RuntimeError("Failed to write the benchmark index")
+    return {'chunks': len(documents), 'build_seconds': round(time.perf_counter() - start, 2)}
+
+
+def install_stub_models(app_module: Any, assistant: Any, encoder: StubEncoder, generator: StubTextGenerator) -> None:
+    """Load the index files and put the stub models where load_embedding_model / load_llm would."""
+    for loader in ('load_faiss_index', 'load_documents', 'load_bm25_index'):
+        if hasattr(assistant, loader):
+            getattr(assistant, loader)()
+
+    assistant.embedding_model = encoder
+    if getattr(assistant, 'embed_batch_window_ms', 0) > 0 and hasattr(app_module, 'EmbeddingBatcher'):
+        assistant.embedding_batcher = app_module.EmbeddingBatcher(encoder, window_ms=assistant.embed_batch_window_ms,
+                                                                  max_batch=assistant.embed_batch_max)
+    assistant.llm_pipeline = generator
+
+    # Mark startup as finished on revisions with staged loading
+    if hasattr(assistant, 'index_files_version'):
+        assistant.index_version = assistant.index_files_version()
+    if hasattr(assistant, 'component_status'):
+        for name in assistant.component_status:
+            assistant.component_status[name] = {'state': 'ready'}
+    if hasattr(assistant, 'loaded_event'):
+        assistant.loaded_event.set()
+
+
+def instrument(app_module: Any, assistant: Any, recorder: StageRecorder) -> None:
+    """Record stage timings by wrapping methods, which works on any revision of app.py."""
+    for method, stage in (('retrieve_context', 'retrieve'), ('get_cached_embedding', 'embed'),
+                          ('generate_response', 'generate'), ('format_elementary_music_lesson', 'template'),
+                          ('format_general_lesson', 'template')):
+        if hasattr(assistant, method):
+            setattr(assistant, method, recorder.wrap(stage, getattr(assistant, method)))
+
+    if assistant.index is not None:
+        assistant.index = TimedProxy(assistant.index, 'search', 'faiss_search', recorder)
+    if getattr(assistant, 'bm25', None) is not None:
+        assistant.bm25.search = recorder.wrap('bm25_search', assistant.bm25.search)
+    assistant.llm_pipeline = recorder.wrap('llm', assistant.llm_pipeline)
+    if hasattr(assistant, 'memory_governor'):
+        # Revisions with a memory governor collect garbage only under pressure
+        governor = assistant.memory_governor
+        governor.after_request = recorder.wrap('gc', governor.after_request)
+    elif hasattr(app_module, 'gc'):
+        app_module.gc = TimedProxy(app_module.gc, 'collect', 'gc', recorder)
+
+
+def make_target(target: str, app_module: Any, assistant: Any) -> Callable[[Dict[str, str]], bool]:
+    """A callable serving one query item and returning whether it succeeded."""
+    if target == 'process_query':
+        def call(item: Dict[str, str]) -> bool:
+            return 'error' not in assistant.process_query(item['query'], item.get('duration', ''))
+        return call
+
+    local = threading.local()
+
+    def call(item: Dict[str, str]) -> bool:
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app_module.app.test_client()
+        return client.post('/ask', json=item).status_code == 200
+    return call
+
+
+def replay(call: Callable[[Dict[str, str]], bool], workload: List[Dict[str, str]], concurrency: int,
+           recorder: StageRecorder) -> Tuple[float, int]:
+    """
+    Serve the workload from concurrency closed-loop client threads.
+
+    Returns:
+        Wall seconds and number of failed requests
+    """
+    positions = itertools.count()
+    failures = []
+
+    def client() -> None:
+        while True:
+            position = next(positions)
+            if position >= len(workload):
+                return
+            start = time.perf_counter()
+            try:
+                ok = call(workload[position])
+            except Exception:
+                ok = False
+            recorder.record('total', time.perf_counter() - start)
+            if not ok:
+                failures.append(position)
+
+    threads = [threading.Thread(target=client, name=f"bench-client-{i}") for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, len(failures)
+
+
+def cache_counts(assistant: Any) -> Dict[str, Tuple[int, int]]:
+    """(hits, misses) of the caches the revision has."""
+    counts = {}
+    for name in ('query_cache', 'response_cache'):
+        cache = getattr(assistant, name, None)
+        if cache is not None and hasattr(cache, 'hits'):
+            counts[name] = (cache.hits, cache.misses)
+    return counts
+
+
+def run_queries(opts: argparse.Namespace) -> Dict[str, Any]:
+    """Replay the workload in this process against the index in the working directory."""
+    # Components are installed by hand; the index files never change during a run
+    os.environ.setdefault('STARTUP_LOAD', 'off')
+    os.environ.setdefault('INDEX_RELOAD_INTERVAL', '1000000')
+    import app as app_module
+    import psutil
+
+    assistant = app_module.assistant
+    encoder = StubEncoder(opts.dimension, batch_ms=opts.encode_batch_ms, item_ms=opts.encode_item_ms)
+    generator = StubTextGenerator(token_ms=opts.llm_token_ms)
+    install_stub_models(app_module, assistant, encoder, generator)
+
+    recorder = StageRecorder()
+    instrument(app_module, assistant, recorder)
+    call = make_target(opts.target, app_module, assistant)
+
+    # Warm up with queries outside the workload so its cache hits are its own
+    for item in synthetic_queries(opts.warmup, seed=opts.seed + 1, external_ratio=0.0):
+        call(item)
+    recorder.reset()
+    caches_before = cache_counts(assistant)
+    encoder_before = (encoder.calls, encoder.items)
+
+    workload = replay_order(load_queries(opts.corpus), opts.requests, seed=opts.seed)
+    wall_seconds, failures = replay(call, workload, opts.concurrency, recorder)
+
+    hit_rates = {}
+    for name, (hits, misses) in cache_counts(assistant).items():
+        hits -= caches_before[name][0]
+        misses -= caches_before[name][1]
+        hit_rates[name] = round(hits / (hits + misses), 4) if hits + misses else None
+    encode_calls = encoder.calls - encoder_before[0]
+
+    return {
+        'target': opts.target,
+        'concurrency': opts.concurrency,
+        'chunks': len(assistant.documents),
+        'requests': len(workload),
+        'errors': failures,
+        'wall_seconds': round(wall_seconds, 3),
+        'throughput_rps': round(len(workload) / wall_seconds, 2) if wall_seconds else None,
+        'stages': recorder.summary(),
+        'cache_hit_rates': hit_rates,
+        'mean_encode_batch': round((encoder.items - encoder_before[1]) / encode_calls, 2) if encode_calls else None,
+        'rss_mb': round(psutil.Process().memory_info().rss / 1024 / 1024, 1)
+    }
+
+
+def worker_main(argv: Optional[List[str]] = None) -> int:
+    """Entry point of the per-measurement process started by run_worker."""
+    parser = argparse.ArgumentParser(description='Query benchmark worker')
+    parser.add_argument('--result', required=True)
+    parser.add_argument('--mode', choices=['build', 'run'], required=True)
+    parser.add_argument('--chunks', type=int, default=1000)
+    parser.add_argument('--words', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--dimension', type=int, default=384)
+    parser.add_argument('--index-type', default='flat')
+    parser.add_argument('--target', choices=TARGETS, default='process_query')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--corpus')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--encode-batch-ms', type=float, default=0.0)
+    parser.add_argument('--encode-item-ms', type=float, default=0.0)
+    parser.add_argument('--llm-token-ms', type=float, default=0.0)
+    opts = parser.parse_args(argv)
+
+    if opts.mode == 'build':
+        result = build_fixture(opts.chunks, opts.words, opts.seed, opts.dimension, opts.index_type)
+    else:
+        result = run_queries(opts)
+    write_result(opts.result, result)
+    return 0
+
+
+def stage_value(result: Dict[str, Any], stage: str, field: str) -> Optional[float]:
+    return result['stages'].get(stage, {}).get(field)
+
+
+def report(results: List[Dict[str, Any]]) -> None:
+    """Print throughput and per-stage percentiles of every measurement."""
+    for revision in dict.fromkeys(result['revision'] for result in results):
+        runs = [result for result in results if result['revision'] == revision]
+        print(f"\n{revision}")
+        print_table(
+            ('target', 'chunks', 'conc', 'req/s', 'errors', 'p50 ms', 'p95 ms', 'p99 ms', 'resp hit', 'RSS MB'),
+            [(r['target'], r['chunks'], r['concurrency'], r['throughput_rps'], r['errors'],
+              stage_value(r, 'total', 'p50_ms'), stage_value(r, 'total', 'p95_ms'), stage_value(r, 'total', 'p99_ms'),
+              r['cache_hit_rates'].get('response_cache'), r['rss_mb']) for r in runs]
+        )
+        print()
+        print_table(
+            ('target', 'chunks', 'conc', 'stage', 'count', 'p50 ms', 'p95 ms', 'p99 ms'),
+            [(r['target'], r['chunks'], r['concurrency'], stage, r['stages'][stage]['count'],
+              r['stages'][stage]['p50_ms'], r['stages'][stage]['p95_ms'], r['stages'][stage]['p99_ms'])
+             for r in runs for stage in STAGES if r['stages'].get(stage, {}).get('count')]
+        )
+
+
+def compare(results: List[Dict[str, Any]], baseline: str, threshold: float) -> int:
+    """Print every other revision relative to the baseline; returns the number of regressed scenarios."""
+    metrics = [
+        ('req/s', lambda r: r['throughput_rps'], True),
+        ('p50', lambda r: stage_value(r, 'total', 'p50_ms'), False),
+        ('p95', lambda r: stage_value(r, 'total', 'p95_ms'), False),
+        ('p99', lambda r: stage_value(r, 'total', 'p99_ms'), False),
+    ]
+    base_runs = [result for result in results if result['revision'] == baseline]
+    regressions = 0
+    for revision in dict.fromkeys(result['revision'] for result in results):
+        if revision == baseline:
+            continue
+        rows, count = compare_results(base_runs, [r for r in results if r['revision'] == revision],
+                                      key=lambda r: (r['target'], r['chunks'], r['concurrency']),
+                                      metrics=metrics, threshold=threshold)
+        print(f"\n{revision} vs {baseline} (regression threshold {threshold:.0%})")
+        print_table(('target', 'chunks', 'conc') + tuple(name for name, _, _ in metrics) + ('verdict',), rows)
+        regressions += count
+    return regressions
+
+
+def main():
+    """Run the benchmark matrix and print (and optionally save) the results."""
+    parser = argparse.ArgumentParser(description='Offline query latency and throughput benchmark')
+    parser.add_argument('--revisions', nargs='+', default=[WORKING_TREE],
+                        help="git revisions to benchmark, '.' for the working tree; the first is the baseline")
+    parser.add_argument('--chunks', nargs='+', type=int, default=[1000, 10000], help='synthetic corpus sizes')
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4, 16])
+    parser.add_argument('--target', choices=TARGETS + ('both',), default='process_query')
+    parser.add_argument('--requests', type=int, default=200, help='requests per measurement')
+    parser.add_argument('--queries', type=int, default=100, help='distinct synthetic queries')
+    parser.add_argument('--corpus', help='recorded queries (JSON lines with query/duration, or plain text lines)')
+    parser.add_argument('--external-ratio', type=float, default=0.1,
+                        help='fraction of synthetic queries that take the LLM path')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--words', type=int, default=300, help='words per synthetic chunk')
+    parser.add_argument('--dimension', type=int, default=384)
+    parser.add_argument('--index-type', default='flat')
+    parser.add_argument('--encode-batch-ms', type=float, default=5.0, help='simulated cost of one encode call')
+    parser.add_argument('--encode-item-ms', type=float, default=0.5, help='simulated cost per encoded query')
+    parser.add_argument('--llm-token-ms', type=float, default=2.0, help='simulated cost per generated token')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                        help='environment for the app under test, e.g. RETRIEVAL_MODE=dense (repeatable)')
+    parser.add_argument('--workdir', default='benchmark_runs', help='where benchmark indexes are built')
+    parser.add_argument('--output', help='write all results to this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.10, help='relative worsening reported as a regression')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    parser.add_argument('--timeout', type=float, default=1800, help='seconds per measurement')
+    args = parser.parse_args()
+
+    env = dict(item.split('=', 1) for item in args.env)
+    workdir = os.path.abspath(args.workdir)
+    os.makedirs(workdir, exist_ok=True)
+
+    # Every revision replays exactly the same query sequence
+    queries = load_queries(args.corpus) if args.corpus else synthetic_queries(args.queries, seed=args.seed,
+                                                                               external_ratio=args.external_ratio)
+    corpus_path = os.path.join(workdir, 'queries.jsonl')
+    with open(corpus_path, 'w', encoding='utf-8') as f:
+        f.writelines(json.dumps(item) + '\n' for item in queries)
+
+    targets = TARGETS if args.target == 'both' else (args.target,)
+    model_args = ['--dimension', str(args.dimension), '--seed', str(args.seed)]
+    run_args = model_args + ['--requests', str(args.requests), '--corpus', corpus_path, '--warmup', str(args.warmup),
+                             '--encode-batch-ms', str(args.encode_batch_ms),
+                             '--encode-item-ms', str(args.encode_item_ms), '--llm-token-ms', str(args.llm_token_ms)]
+
+    results = []
+    for revision in args.revisions:
+        label = 'working tree' if revision == WORKING_TREE else revision
+        commit = None if revision == WORKING_TREE else resolve_revision(revision)
+        with checkout(revision) as tree:
+            for chunks in args.chunks:
+                fixture = os.path.join(workdir, re.sub(r'[^\w.-]', '_', label), str(chunks))
+                print(f"[{label}] building {chunks}-chunk index...", flush=True)
+                build = run_worker(MODULE, tree, fixture, model_args + [
+                    '--mode', 'build', '--chunks', str(chunks), '--words', str(args.words),
+                    '--index-type', args.index_type], env=env, timeout=args.timeout)
+
+                for target, concurrency in itertools.product(targets, args.concurrency):
+                    result = run_worker(MODULE, tree, fixture, run_args + [
+                        '--mode', 'run', '--target', target, '--concurrency', str(concurrency)],
+                        env=env, timeout=args.timeout)
+                    result.update(revision=label, commit=commit, build_seconds=build['build_seconds'])
+                    results.append(result)
+                    print(f"[{label}] {target} chunks={chunks} concurrency={concurrency}: "
+                          f"{result['throughput_rps']} req/s, p95 {stage_value(result, 'total', 'p95_ms')} ms, "
+                          f"{result['errors']} errors", flush=True)
+
+    report(results)
+    regressions = 0
+    if len(args.revisions) > 1:
+        baseline = 'working tree' if args.revisions[0] == WORKING_TREE else args.revisions[0]
+        regressions = compare(results, baseline, args.threshold)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'settings': vars(args), 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Educational Assistant - Benchmark Stubs
+Deterministic stand-ins for the sentence transformer, the LLM pipeline and the
+Google Drive service so benchmarks run offline and give the same results on
+every machine.
+
+Latency is simulated with time.sleep, which releases the GIL the way a native
+forward pass does, so concurrency behaves like the real models would.
+"""
+
+import os
+import re
+import time
+import hashlib
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+# Kept independent of the repo's modules so the stubs work against any git revision
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+class StubEncoder:
+    """Bag-of-words hashing encoder with the SentenceTransformer.encode interface."""
+
+    def __init__(self, dimension: int = 384, batch_ms: float = 0.0, item_ms: float = 0.0):
+        """
+        Initialize the encoder.
+
+        Args:
+            dimension: Embedding dimension (all-MiniLM-L6-v2 uses 384)
+            batch_ms: Simulated fixed cost of one encode call
+            item_ms: Simulated additional cost per encoded text
+        """
+        self.dimension = dimension
+        self.batch_ms = batch_ms
+        self.item_ms = item_ms
+        self.slots: Dict[str, Tuple[int, float]] = {}
+        self.calls = 0
+        self.items = 0
+        self.lock = threading.Lock()
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def slot(self, token: str) -> Tuple[int, float]:
+        """Dimension and sign a token hashes to (stable across processes, unlike hash())."""
+        slot = self.slots.get(token)
+        if slot is None:
+            digest = hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest()
+            value = int.from_bytes(digest, 'little')
+            slot = self.slots[token] = (value % self.dimension, 1.0 if value >> 63 else -1.0)
+        return slot
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, show_progress_bar: bool = False,
+               **kwargs: Any) -> np.ndarray:
+        """Encode texts to unit vectors; similar word sets give similar vectors."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in TOKEN_PATTERN.findall(text.lower()):
+                index, sign = self.slot(token)
+                vectors[row, index] += sign
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1.0, norms)
+
+        with self.lock:
+            self.calls += 1
+            self.items += len(texts)
+        delay = self.batch_ms + self.item_ms * len(texts)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+        return vectors[0] if single else vectors
+
+
+class StubTextGenerator:
+    """Callable with the transformers text-generation pipeline interface used by app.py."""
+
+    WORDS = ('students', 'explore', 'rhythm', 'practice', 'discuss', 'create', 'reflect', 'share',
+             'listen', 'model', 'group', 'partner', 'activity', 'review', 'extend', 'assess')
+
+    def __init__(self, token_ms: float = 0.0, new_tokens: int = 64):
+        """
+        Initialize the generator.
+
+        Args:
+            token_ms: Simulated cost per generated token
+            new_tokens: Tokens appended to every prompt
+        """
+        self.token_ms = token_ms
+        self.new_tokens = new_tokens
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, prompt: str, max_length: Optional[int] = None, num_return_sequences: int = 1,
+                 **kwargs: Any) -> List[Dict[str, str]]:
+        """Append deterministic words chosen by the prompt's hash."""
+        seed = int.from_bytes(hashlib.blake2b(prompt.encode('utf-8'), digest_size=8).digest(), 'little')
+        rng = np.random.default_rng(seed)
+        words = [self.WORDS[i] for i in rng.integers(0, len(self.WORDS), self.new_tokens)]
+
+        with self.lock:
+            self.calls += 1
+        if self.token_ms > 0:
+            time.sleep(self.token_ms * self.new_tokens / 1000.0)
+
+        return [{'generated_text': f"{prompt} {' '.join(words)}"} for _ in range(num_return_sequences)]
+
+
+class StubHttpResponse(dict):
+    """httplib2-style response: headers in the dict, plus a status code."""
+
+    def __init__(self, status: int, headers: Dict[str, str]):
+        super().__init__(headers)
+        self.status = status
+
+
+class StubDriveHttp:
+    """Serves get_media downloads from local files, honouring Range headers and simulated link speed."""
+
+    def __init__(self, drive: 'StubDriveService'):
+        self.drive = drive
+
+    def request(self, uri: str, method: str = 'GET', body: Any = None, headers: Optional[Dict[str, str]] = None,
+                **kwargs: Any) -> Tuple[StubHttpResponse, bytes]:
+        path = self.drive.paths.get(uri.rsplit('/', 1)[-1])
+        if path is None:
+            return StubHttpResponse(404, {}), b'File not found'
+        size = os.path.getsize(path)
+        first, last = 0, size - 1
+        status, response_headers = 200, {'content-length': str(size)}
+        match = re.match(r"bytes=(\d+)-(\d*)", (headers or {}).get('range', ''))
+        if match:
+            first = int(match.group(1))
+            last = min(int(match.group(2)) if match.group(2) else size - 1, size - 1)
+            status, response_headers = 206, {'content-range': f"bytes {first}-{last}/{size}"}
+        # Read only the requested range, like a server streaming it
+        with open(path, 'rb') as f:
+            f.seek(first)
+            content = f.read(last - first + 1)
+
+        self.drive.wait(len(content))
+        return StubHttpResponse(status, response_headers), content
+
+
+class StubMediaRequest:
+    """The parts of googleapiclient's HttpRequest that MediaIoBaseDownload uses."""
+
+    def __init__(self, http: StubDriveHttp, file_id: str):
+        self.http = http
+        self.uri = f"stub://drive/files/{file_id}"
+        self.headers: Dict[str, str] = {}
+
+    def execute(self) -> bytes:
+        response, content = self.http.request(self.uri)
+        return content
+
+
+class StubListRequest:
+    def __init__(self, result: Dict[str, Any]):
+        self.result = result
+
+    def execute(self) -> Dict[str, Any]:
+        return self.result
+
+
+class StubDriveService:
+    """
+    Google Drive v3 service over a local folder of PDFs, supporting the
+    files().list and files().get_media calls ingest.py makes.
+    """
+
+    def __init__(self, folder: str, latency_ms: float = 0.0, mbps: float = 0.0):
+        """
+        Initialize the service.
+
+        Args:
+            folder: Directory whose PDFs make up the Drive folder
+            latency_ms: Simulated round trip of every request
+            mbps: Simulated download bandwidth in megabytes per second (0 is unlimited)
+        """
+        self.latency_ms = latency_ms
+        self.mbps = mbps
+        self.paths: Dict[str, str] = {}
+        self.entries: List[Dict[str, str]] = []
+        for name in sorted(os.listdir(folder)):
+            path = os.path.join(folder, name)
+            if not name.lower().endswith('.pdf') or not os.path.isfile(path):
+                continue
+            file_id = os.path.splitext(name)[0]
+            modified = datetime.fromtimestamp(os.path.getmtime(path), timezone.utc)
+            self.paths[file_id] = path
+            self.entries.append({'id': file_id, 'name': name, 'size': str(os.path.getsize(path)),
+                                 'modifiedTime': modified.strftime('%Y-%m-%dT%H:%M:%S.000Z')})
+        self.http = StubDriveHttp(self)
+
+    def wait(self, nbytes: int = 0) -> None:
+        """Sleep for the simulated latency and transfer time."""
+        delay = self.latency_ms / 1000.0 + (nbytes / (self.mbps * 1024 * 1024) if self.mbps > 0 else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def files(self) -> 'StubDriveService':
+        return self
+
+    def list(self, q: Optional[str] = None, pageSize: int = 100, pageToken: Optional[str] = None,
+             fields: Optional[str] = None, **kwargs: Any) -> StubListRequest:
+        """One page of the folder listing; pageToken is the offset of the page."""
+        self.wait()
+        offset = int(pageToken or 0)
+        result: Dict[str, Any] = {'files': [dict(entry) for entry in self.entries[offset:offset + pageSize]]}
+        if offset + pageSize < len(self.entries):
+            result['nextPageToken'] = str(offset + pageSize)
+        return StubListRequest(result)
+
+    def get_media(self, fileId: str, **kwargs: Any) -> StubMediaRequest:
+        return StubMediaRequest(self.http, fileId)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Educational Assistant - BM25 Inverted Index
+Lexical index over the chunk store, written by ingest.py and searched by app.py
+alongside FAISS so exact terms and standards codes (e.g. "MU.2.S.3.1") are found.
+
+Layout of an index directory:
+    manifest.json     - document count, average length, BM25 parameters and the chunk store it matches
+    terms.txt         - one term per line; the line number is the term ID
+    offsets.npy       - int64 start of each term's postings (term count + 1 entries)
+    postings_doc.npy  - int32 chunk store rows, grouped by term and ascending within a term
+    postings_tf.npy   - uint16 term frequency of each posting
+    doc_lengths.npy   - int32 token count of each chunk
+"""
+
+import os
+import re
+import json
+import math
+import time
+import shutil
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from chunk_store import replace_directory
+
+BM25_VERSION = 1
+
+# Keeps dotted and hyphenated codes ("mu.2.s.3.1", "k-5") together as one token
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-/][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    'a an and are as at be by for from has have in is it its of on or that the this to was were will with'.split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens; compound codes also yield their parts."""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in re.split(r'[.\-/]', token) if len(part) > 1 and part not in STOPWORDS)
+    return tokens
+
+
+def write_bm25_index(path: str, texts: Iterable[str], k1: float = 1.2, b: float = 0.75,
+                     source: Optional[Dict[str, Any]] = None) -> int:
+    """
+    Build a BM25 index over chunk texts, replacing any existing index.
+
+    Args:
+        path: Index directory
+        texts: Chunk texts in chunk store row order
+        k1: BM25 term frequency saturation
+        b: BM25 length normalization
+        source: Identity of the chunk store the rows refer to (checked when loading)
+
+    Returns:
+        Number of documents indexed
+    """
+    vocabulary: Dict[str, int] = {}
+    term_ids = array('i')
+    doc_ids = array('i')
+    frequencies = array('H')
+    doc_lengths = array('i')
+
+    for doc_id, text in enumerate(texts):
+        tokens = tokenize(text)
+        doc_lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+            doc_ids.append(doc_id)
+            frequencies.append(min(tf, 65535))
+
+    term_ids = np.frombuffer(term_ids, dtype=np.int32) if term_ids else np.zeros(0, dtype=np.int32)
+    doc_ids = np.frombuffer(doc_ids, dtype=np.int32) if doc_ids else np.zeros(0, dtype=np.int32)
+    frequencies = np.frombuffer(frequencies, dtype=np.uint16) if frequencies else np.zeros(0, dtype=np.uint16)
+    lengths = np.asarray(doc_lengths, dtype=np.int32)
+
+    # Group postings by term; a stable sort keeps rows ascending within each term
+    order = np.argsort(term_ids, kind='stable')
+    offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(term_ids, minlength=len(vocabulary)), out=offsets[1:])
+
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    with open(os.path.join(tmp_path, 'terms.txt'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(vocabulary))
+    np.save(os.path.join(tmp_path, 'offsets.npy'), offsets)
+    np.save(os.path.join(tmp_path, 'postings_doc.npy'), doc_ids[order])
+    np.save(os.path.join(tmp_path, 'postings_tf.npy'), frequencies[order])
+    np.save(os.path.join(tmp_path, 'doc_lengths.npy'), lengths)
+
+    with open(os.path.join(tmp_path, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': BM25_VERSION,
+            'count': len(lengths),
+            'terms': len(vocabulary),
+            'postings': int(offsets[-1]),
+            'avg_length': float(lengths.mean()) if len(lengths) else 0.0,
+            'k1': k1,
+            'b': b,
+            'source': source or {}
+        }, f, indent=2)
+
+    replace_directory(tmp_path, path)
+    return len(lengths)
+
+
+class BM25Index:
+    """Read-only, memory-mapped BM25 index."""
+
+    def __init__(self, path: str):
+        """
+        Open a BM25 index.
+
+        Args:
+            path: Index directory written by write_bm25_index
+        """
+        self.path = path
+
+        with open(os.path.join(path, 'manifest.json'), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('version') != BM25_VERSION:
+            raise ValueError(f"Unsupported BM25 index version: {self.manifest.get('version')}")
+
+        self.count = self.manifest['count']
+        self.k1 = self.manifest['k1']
+        self.b = self.manifest['b']
+
+        with open(os.path.join(path, 'terms.txt'), 'r', encoding='utf-8') as f:
+            content = f.read()
+        self.terms = {term: term_id for term_id, term in enumerate(content.split('\n'))} if content else {}
+
+        self.offsets = np.load(os.path.join(path, 'offsets.npy'), mmap_mode='r')
+        self.postings_doc = np.load(os.path.join(path, 'postings_doc.npy'), mmap_mode='r')
+        self.postings_tf = np.load(os.path.join(path, 'postings_tf.npy'), mmap_mode='r')
+
+        # Per-document part of the BM25 denominator, computed once
+        lengths = np.load(os.path.join(path, 'doc_lengths.npy')).astype(np.float32)
+        avg_length = self.manifest['avg_length'] or 1.0
+        self.length_norm = self.k1 * (1 - self.b + self.b * lengths / avg_length)
+
+        self.truncated_searches = 0
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        """Check whether a BM25 index has been written at path."""
+        return os.path.exists(os.path.join(path, 'manifest.json'))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def matches(self, source: Dict[str, Any]) -> bool:
+        """Whether this index was built from the chunk store described by source."""
+        return self.manifest.get('source') == source
+
+    def search(self, query: str, k: int, budget_ms: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score chunks against a query with BM25.
+
+        Terms are scored rarest first; once budget_ms has passed the remaining
+        (most common, least informative) terms are skipped.
+
+        Returns:
+            Chunk store rows and their scores, best first (at most k)
+        """
+        term_ids = {self.terms[token] for token in tokenize(query) if token in self.terms}
+        if not term_ids or not self.count:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        weighted = []
+        for term_id in term_ids:
+            df = int(self.offsets[term_id + 1] - self.offsets[term_id])
+            weighted.append((math.log(1 + (self.count - df + 0.5) / (df + 0.5)), term_id))
+        weighted.sort(reverse=True)
+
+        deadline = time.perf_counter() + budget_ms / 1000 if budget_ms else None
+        scores = np.zeros(self.count, dtype=np.float32)
+        for i, (idf, term_id) in enumerate(weighted):
+            if deadline is not None and i and time.perf_counter() > deadline:
+                self.truncated_searches += 1
+                break
+            start, end = int(self.offsets[term_id]), int(self.offsets[term_id + 1])
+            docs = self.postings_doc[start:end]
+            tf = self.postings_tf[start:end].astype(np.float32)
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + self.length_norm[docs])
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return candidates.astype(np.int64), scores[candidates]
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """
+    Fuse ranked lists of chunk rows: each row scores sum(1 / (k + rank)).
+
+    Returns:
+        (row, fused score) pairs, best first; ties keep first-seen order
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
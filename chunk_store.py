@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Educational Assistant - Columnar Chunk Store
+Compact on-disk storage for document chunks, written by ingest.py and read by app.py.
+
+Layout of a store directory:
+    manifest.json   - store ID, row count, column names/types and string dictionaries
+    text.bin        - UTF-8 chunk texts concatenated into one blob (memory-mapped)
+    offsets.npy     - int64 byte offsets into text.bin (row count + 1 entries)
+    col_<name>.npy  - one array per metadata column (int64, float64 or int32 codes)
+
+A store path is a symbolic link to the current version of the directory
+(<path>.v<n>), switched atomically when a new store is written.
+"""
+
+import os
+import re
+import json
+import mmap
+import time
+import uuid
+import shutil
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+STORE_VERSION = 1
+
+# Missing values are stored as these sentinels and omitted again when a row is read
+MISSING_INT = -1
+MISSING_CODE = -1
+
+
+def write_chunk_store(path: str, documents: Iterable[Dict[str, Any]]) -> int:
+    """
+    Write document chunks to a chunk store directory, replacing any existing store.
+
+    Args:
+        path: Store directory
+        documents: Chunk dicts with a 'text' key plus scalar metadata
+
+    Returns:
+        Number of rows written
+    """
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    offsets = [0]
+    columns: Dict[str, List[Any]] = {}
+    count = 0
+
+    with open(os.path.join(tmp_path, 'text.bin'), 'wb') as text_file:
+        for doc in documents:
+            encoded = doc.get('text', '').encode('utf-8')
+            text_file.write(encoded)
+            offsets.append(offsets[-1] + len(encoded))
+
+            for key, value in doc.items():
+                if key == 'text':
+                    continue
+                if key not in columns:
+                    columns[key] = [None] * count
+                columns[key].append(value)
+            count += 1
+            for values in columns.values():
+                if len(values) < count:
+                    values.append(None)
+
+    np.save(os.path.join(tmp_path, 'offsets.npy'), np.asarray(offsets, dtype=np.int64))
+
+    column_specs = []
+    for name, values in columns.items():
+        present = [v for v in values if v is not None]
+        if present and all(isinstance(v, (int, np.integer)) and not isinstance(v, bool) for v in present):
+            kind = 'int'
+            array = np.asarray([MISSING_INT if v is None else v for v in values], dtype=np.int64)
+            spec = {'name': name, 'type': kind}
+        elif present and all(isinstance(v, (int, float, np.number)) and not isinstance(v, bool) for v in present):
+            kind = 'float'
+            array = np.asarray([np.nan if v is None else v for v in values], dtype=np.float64)
+            spec = {'name': name, 'type': kind}
+        else:
+            # Dictionary-encode strings; sources repeat for every chunk of a file
+            kind = 'str'
+            vocabulary: Dict[str, int] = {}
+            codes = np.empty(len(values), dtype=np.int32)
+            for i, value in enumerate(values):
+                if value is None:
+                    codes[i] = MISSING_CODE
+                else:
+                    codes[i] = vocabulary.setdefault(str(value), len(vocabulary))
+            array = codes
+            spec = {'name': name, 'type': kind, 'values': list(vocabulary)}
+        np.save(os.path.join(tmp_path, f"col_{name}.npy"), array)
+        column_specs.append(spec)
+
+    with open(os.path.join(tmp_path, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': STORE_VERSION,
+            # Lets derived indexes (bm25_index) check they were built from this store
+            'store_id': uuid.uuid4().hex,
+            'count': count,
+            'text_bytes': offsets[-1],
+            'columns': column_specs
+        }, f, indent=2, ensure_ascii=False)
+
+    replace_directory(tmp_path, path)
+    return count
+
+
+def replace_directory(tmp_path: str, path: str, keep_previous: bool = True) -> None:
+    """
+    Publish a freshly written directory at path in one atomic step.
+
+    The directory becomes a versioned sibling (<path>.v<n>) and path a symbolic
+    link to it, switched with os.replace, so a reader opening path always finds
+    a complete directory, never none. The previous version is kept for readers
+    that resolved the link just before the switch; older ones are removed.
+
+    Args:
+        tmp_path: Complete new directory
+        path: Path readers open
+        keep_previous: Keep the previous version (False when nothing reads it concurrently)
+    """
+    parent, name = os.path.split(os.path.abspath(path))
+    version = f"{name}.v{time.time_ns()}"
+    version_path = os.path.join(parent, version)
+    os.rename(tmp_path, version_path)
+
+    previous = os.readlink(path) if os.path.islink(path) else None
+    link_path = f"{path}.link"
+    try:
+        if os.path.lexists(link_path):
+            os.remove(link_path)
+        os.symlink(version, link_path)
+    except (OSError, NotImplementedError):
+        # No symlinks (e.g. Windows without the privilege): rename the directory into place
+        link_path = None
+
+    if os.path.isdir(path) and not os.path.islink(path):
+        # A plain directory (older ingest.py, or no symlinks): replaced with a brief gap
+        old_path = f"{path}.old"
+        if os.path.exists(old_path):
+            shutil.rmtree(old_path)
+        os.rename(path, old_path)
+        os.rename(link_path or version_path, path)
+        shutil.rmtree(old_path)
+    else:
+        os.replace(link_path or version_path, path)
+
+    keep = {version, previous} if keep_previous else {version}
+    pattern = re.compile(re.escape(name) + r'\.v\d+$')
+    for entry in os.listdir(parent):
+        if pattern.match(entry) and entry not in keep:
+            shutil.rmtree(os.path.join(parent, entry), ignore_errors=True)
+
+
+class ChunkStore:
+    """Read-only, memory-mapped view of a chunk store directory."""
+
+    def __init__(self, path: str):
+        """
+        Open a chunk store.
+
+        Args:
+            path: Store directory written by write_chunk_store
+        """
+        self.path = path
+
+        with open(os.path.join(path, 'manifest.json'), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('version') != STORE_VERSION:
+            raise ValueError(f"Unsupported chunk store version: {self.manifest.get('version')}")
+
+        self.count = self.manifest['count']
+        self.store_id = self.manifest.get('store_id')
+        self.offsets = np.load(os.path.join(path, 'offsets.npy'), mmap_mode='r')
+
+        self._text_file = None
+        self._text = b''
+        if self.manifest['text_bytes'] > 0:
+            self._text_file = open(os.path.join(path, 'text.bin'), 'rb')
+            self._text = mmap.mmap(self._text_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.columns = []
+        self._arrays = {}
+        self._values = {}
+        for spec in self.manifest['columns']:
+            name = spec['name']
+            self.columns.append(name)
+            self._arrays[name] = np.load(os.path.join(path, f"col_{name}.npy"), mmap_mode='r')
+            if spec['type'] == 'str':
+                self._values[name] = spec['values']
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        """Check whether a chunk store has been written at path."""
+        return os.path.exists(os.path.join(path, 'manifest.json'))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def text(self, idx: int) -> str:
+        """Get the text of one chunk."""
+        start, end = int(self.offsets[idx]), int(self.offsets[idx + 1])
+        return self._text[start:end].decode('utf-8')
+
+    def value(self, name: str, idx: int) -> Optional[Any]:
+        """Get one metadata value, or None if the row has no value for it."""
+        raw = self._arrays[name][idx]
+        if name in self._values:
+            return None if raw == MISSING_CODE else self._values[name][raw]
+        if raw.dtype.kind == 'f':
+            return None if np.isnan(raw) else float(raw)
+        return None if raw == MISSING_INT else int(raw)
+
+    def column(self, name: str) -> np.ndarray:
+        """Get a whole metadata column as a memory-mapped array (string columns as codes)."""
+        return self._arrays[name]
+
+    def lookup(self, vector_id: int) -> int:
+        """
+        Map a FAISS vector ID to a row index.
+
+        Stores written by incremental ingestion keep rows sorted by their 'vector_id'
+        column; older stores use the row index itself as the vector ID.
+
+        Returns:
+            Row index, or -1 if no row has this vector ID
+        """
+        if 'vector_id' not in self._arrays:
+            return vector_id if 0 <= vector_id < self.count else -1
+        vector_ids = self._arrays['vector_id']
+        row = int(np.searchsorted(vector_ids, vector_id))
+        if row < self.count and vector_ids[row] == vector_id:
+            return row
+        return -1
+
+    def __getitem__(self, idx: int) -> Dict[str, Any]:
+        """Materialize one row as a new dict."""
+        idx = int(idx)
+        if idx < 0 or idx >= self.count:
+            raise IndexError(f"Chunk index {idx} out of range")
+
+        row = {'text': self.text(idx)}
+        for name in self.columns:
+            value = self.value(name, idx)
+            if value is not None:
+                row[name] = value
+        return row
+
+    def __iter__(self):
+        for idx in range(self.count):
+            yield self[idx]
+
+    def close(self) -> None:
+        """Release the memory maps."""
+        if self._text_file is not None:
+            self._text.close()
+            self._text_file.close()
+            self._text_file = None
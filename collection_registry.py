@@ -0,0 +1,526 @@
+#!/usr/bin/env python3
+"""
+Educational Assistant - Collection Registry
+Serves several corpora (one per school or department) from one process, all
+sharing the embedding model and LLM.
+
+A collection is a directory of files written by ingest.py:
+    document.index      - FAISS index
+    index_config.json   - index type and search parameters
+    chunk_store/        - chunk texts and metadata
+    bm25_index/         - BM25 inverted index (optional)
+
+The working directory holds the 'default' collection, loaded at startup and
+never evicted. Named collections live in <root>/<name>/, load on first use and
+are evicted least recently used first to stay within a size budget and count.
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional, Tuple
+
+import faiss
+
+from chunk_store import ChunkStore, write_chunk_store
+from bm25_index import BM25Index
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COLLECTION = 'default'
+# Also keeps names from escaping the collections directory
+COLLECTION_NAME = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$')
+INDEX_FILES = ('document.index', 'index_config.json', os.path.join('chunk_store', 'manifest.json'),
+               os.path.join('bm25_index', 'manifest.json'))
+
+
+class UnknownCollectionError(LookupError):
+    """A query named a collection that does not exist."""
+
+
+class CollectionUnavailableError(RuntimeError):
+    """A collection exists but its index files could not be loaded (e.g. mid-ingest)."""
+
+
+def collection_path(root: str, name: str) -> str:
+    """
+    Directory of a named collection.
+
+    Raises:
+        ValueError: The name is not a valid collection name
+    """
+    if not COLLECTION_NAME.match(name or '') or name == DEFAULT_COLLECTION:
+        raise ValueError(f"Invalid collection name '{name}' (letters, digits, '-' and '_', "
+                         f"at most 64 characters, not '{DEFAULT_COLLECTION}')")
+    return os.path.join(root, name)
+
+
+def directory_bytes(path: str) -> int:
+    """Total size of the files in a directory (not recursive), or of a single file."""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    if os.path.isdir(path):
+        for entry in os.scandir(path):
+            if entry.is_file():
+                total += entry.stat().st_size
+    return total
+
+
+@dataclass(frozen=True)
+class CollectionState:
+    """
+    One consistent generation of a collection's index files. A reload builds a
+    new state and publishes it with a single assignment, so a query that reads
+    Collection.state once never pairs FAISS ids with another generation's chunk
+    store or BM25 index.
+    """
+
+    index: Optional[faiss.Index] = None
+    index_config: Dict[str, Any] = field(default_factory=dict)
+    documents: Any = field(default_factory=list)  # ChunkStore once loaded
+    bm25: Optional[BM25Index] = None
+    version: Optional[str] = None
+
+
+class Collection:
+    """The FAISS index, chunk store and BM25 index of one corpus."""
+
+    def __init__(self, name: str, path: str, index_load_mode: str = 'heap'):
+        """
+        Initialize an unloaded collection.
+
+        Args:
+            name: Collection name used in requests
+            path: Directory holding the index files
+            index_load_mode: 'heap' or 'mmap' (falls back to 'heap' when mapping fails)
+        """
+        self.name = name
+        self.path = path
+        self.index_load_mode = index_load_mode
+        self.state = CollectionState()
+        self.loaded_in_pid = None
+
+        # Reloading when ingest.py rewrites the files
+        self.checked_at = 0.0
+        self.reload_lock = threading.Lock()
+
+        self.loaded_at = None
+        self.last_used = time.time()
+        self.size_bytes = 0
+
+    # Views of the current state, for statistics and startup; queries read self.state once instead
+    @property
+    def index(self) -> Optional[faiss.Index]:
+        return self.state.index
+
+    @index.setter
+    def index(self, index: Optional[faiss.Index]) -> None:
+        self.publish(index=index)
+
+    @property
+    def index_config(self) -> Dict[str, Any]:
+        return self.state.index_config
+
+    @property
+    def documents(self):
+        return self.state.documents
+
+    @property
+    def bm25(self) -> Optional[BM25Index]:
+        return self.state.bm25
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.state.version
+
+    @version.setter
+    def version(self, version: Optional[str]) -> None:
+        self.publish(version=version)
+
+    def publish(self, **changes: Any) -> None:
+        """Replace parts of the current state (staged startup loading)."""
+        self.state = replace(self.state, **changes)
+
+    def file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def read_state(self, version: Optional[str] = None) -> CollectionState:
+        """Read every index file into a new state, without touching the current one."""
+        version = version or self.files_version()
+        index, index_config = self.read_faiss_index()
+        documents = self.read_documents()
+        bm25 = self.read_bm25_index(documents)
+        return CollectionState(index=index, index_config=index_config, documents=documents,
+                               bm25=bm25, version=version)
+
+    def load(self) -> bool:
+        """Load every index file; True when there is something to retrieve from."""
+        start = time.perf_counter()
+        self.checked_at = time.monotonic()
+        self.state = self.read_state()
+        self.loaded_at = time.time()
+        self.size_bytes = self.memory_bytes()
+        logger.info(f"✅ Loaded collection '{self.name}' in {time.perf_counter() - start:.2f}s "
+                    f"({self.size_bytes / 1024 / 1024:.1f} MB)")
+        return self.index is not None and len(self.documents) > 0
+
+    def memory_bytes(self) -> int:
+        """
+        Size of the loaded index files: what the collection occupies once all its
+        pages are resident (memory-mapped parts only count once they are touched).
+        """
+        state = self.state
+        total = 0
+        if state.index is not None:
+            total += directory_bytes(self.file('document.index'))
+        if len(state.documents) > 0:
+            total += directory_bytes(getattr(state.documents, 'path', self.file('chunk_store')))
+        if state.bm25 is not None:
+            total += directory_bytes(self.file('bm25_index'))
+        return total
+
+    def load_faiss_index(self) -> bool:
+        """Load the FAISS vector index into the current state."""
+        index, index_config = self.read_faiss_index()
+        self.publish(index=index, index_config=index_config)
+        return index is not None
+
+    def read_faiss_index(self) -> Tuple[Optional[faiss.Index], Dict[str, Any]]:
+        """Read the FAISS vector index and its config (None when missing or unreadable)."""
+        index_config = {}
+        try:
+            index_path = self.file('document.index')
+            if os.path.exists(index_path):
+                config_path = self.file('index_config.json')
+                if os.path.exists(config_path):
+                    with open(config_path, 'r', encoding='utf-8') as f:
+                        index_config = json.load(f)
+
+                index = None
+                if self.index_load_mode == 'mmap':
+                    index = self.mmap_faiss_index(index_path, index_config)
+                if index is None:
+                    index = faiss.read_index(index_path)
+                self.loaded_in_pid = os.getpid()
+                self.apply_search_parameters(index, index_config)
+                logger.info(f"✅ Loaded FAISS index with {index.ntotal} vectors ({self.index_load_mode})")
+                return index, index_config
+            else:
+                logger.warning(f"⚠️ {index_path} not found")
+                return None, index_config
+        except Exception as e:
+            logger.error(f"❌ Failed to load FAISS index: {e}")
+            return None, index_config
+
+    def mmap_faiss_index(self, path: str, index_config: Dict[str, Any]) -> Optional[faiss.Index]:
+        """Memory-map a FAISS index read-only so every worker shares the page cache copy."""
+        try:
+            if index_config.get('index_type', 'flat').startswith('ivf'):
+                # IVF inverted lists are mapped with IO_FLAG_MMAP
+                io_flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+            else:
+                # Flat and HNSW vector codes need IO_FLAG_MMAP_IFC (newer FAISS releases)
+                io_flags = getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+            return faiss.read_index(path, io_flags)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not memory-map {path}, loading onto the heap: {e}")
+            self.index_load_mode = 'heap'
+            return None
+
+    def apply_search_parameters(self, index: faiss.Index, index_config: Dict[str, Any]) -> None:
+        """Apply the search-time parameters saved by ingest.py (env vars take precedence)."""
+        index_type = index_config.get('index_type', 'flat')
+        params = {}
+        if index_type in ('ivf_flat', 'ivf_pq'):
+            params['nprobe'] = int(os.getenv('FAISS_NPROBE', index_config.get('nprobe', 8)))
+        elif index_type == 'hnsw':
+            params['efSearch'] = int(os.getenv('FAISS_EF_SEARCH', index_config.get('ef_search', 64)))
+
+        parameter_space = faiss.ParameterSpace()
+        for name, value in params.items():
+            parameter_space.set_index_parameter(index, name, value)
+
+        logger.info(f"Using {index_type} index" + (f" with {params}" if params else ""))
+
+    def load_documents(self) -> bool:
+        """Load document chunks into the current state."""
+        documents = self.read_documents()
+        self.publish(documents=documents)
+        return len(documents) > 0
+
+    def read_documents(self):
+        """Open the memory-mapped chunk store (an empty list when missing or unreadable)."""
+        try:
+            store_path = self.file('chunk_store')
+            json_path = self.file('documents.json')
+            if not ChunkStore.exists(store_path) and os.path.exists(json_path):
+                store_path = self.migrate_documents_json(json_path, store_path)
+
+            if ChunkStore.exists(store_path):
+                documents = ChunkStore(store_path)
+                logger.info(f"✅ Loaded {len(documents)} document chunks")
+                return documents
+            else:
+                logger.warning(f"⚠️ {store_path} not found")
+                return []
+        except Exception as e:
+            logger.error(f"❌ Failed to load documents: {e}")
+            return []
+
+    def migrate_documents_json(self, json_path: str, store_path: str) -> str:
+        """Convert a documents.json written by an older ingest.py into a chunk store."""
+        logger.info(f"Converting {json_path} to {store_path}/ (one-time migration)")
+        with open(json_path, 'r', encoding='utf-8') as f:
+            documents = json.load(f)
+        try:
+            write_chunk_store(store_path, documents)
+        except OSError as e:
+            # Read-only deployments still get a chunk store, just not a persistent one
+            store_path = os.path.join(tempfile.mkdtemp(prefix='chunk_store_'), 'chunk_store')
+            logger.warning(f"⚠️ Could not write chunk store next to {json_path} ({e}), using {store_path}")
+            write_chunk_store(store_path, documents)
+        return store_path
+
+    def load_bm25_index(self) -> bool:
+        """Load the BM25 inverted index built from the current state's chunk store."""
+        bm25 = self.read_bm25_index(self.state.documents)
+        self.publish(bm25=bm25)
+        return bm25 is not None
+
+    def read_bm25_index(self, documents) -> Optional[BM25Index]:
+        """Open the BM25 inverted index if it was built from the given chunk store."""
+        try:
+            bm25_path = self.file('bm25_index')
+            if not BM25Index.exists(bm25_path):
+                logger.warning(f"⚠️ {bm25_path} not found - using dense retrieval only")
+                return None
+            bm25 = BM25Index(bm25_path)
+            store_id = getattr(documents, 'store_id', None)
+            if not bm25.matches({'store_id': store_id}):
+                # ingest.py writes the chunk store first; the next reload picks up the new index
+                logger.warning("⚠️ bm25_index does not match chunk_store - using dense retrieval only")
+                return None
+            logger.info(f"✅ Loaded BM25 index ({bm25.manifest['terms']} terms, {len(bm25)} chunks)")
+            return bm25
+        except Exception as e:
+            logger.error(f"❌ Failed to load BM25 index: {e}")
+            return None
+
+    def files_version(self) -> str:
+        """Fingerprint the index files on disk (modification time and size)."""
+        parts = []
+        for name in INDEX_FILES:
+            try:
+                stat = os.stat(self.file(name))
+                parts.append(f"{stat.st_mtime_ns}:{stat.st_size}")
+            except OSError:
+                parts.append('-')
+        return '|'.join(parts)
+
+    def refresh_if_changed(self, interval: float) -> bool:
+        """Reload the index files if ingest.py rewrote them; checked at most every interval seconds."""
+        now = time.monotonic()
+        if now - self.checked_at < interval:
+            return False
+
+        with self.reload_lock:
+            if now - self.checked_at < interval:
+                return False
+            self.checked_at = now
+
+            version = self.files_version()
+            if version == self.version:
+                return False
+
+            logger.info(f"🔄 Index files of collection '{self.name}' changed on disk - reloading")
+            # Queries keep using the old state until the new one is complete
+            state = self.read_state(version)
+            if self.files_version() != version:
+                # ingest.py was still writing: the files read may not belong together
+                logger.warning(f"⚠️ Index files of collection '{self.name}' changed while reloading - retrying later")
+                return False
+            self.state = state
+            self.size_bytes = self.memory_bytes()
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state
+        return {
+            'vectors': state.index.ntotal if state.index is not None else 0,
+            'chunks': len(state.documents),
+            'bm25': state.bm25 is not None,
+            'size_mb': round(self.size_bytes / 1024 / 1024, 1),
+            'idle_seconds': round(time.time() - self.last_used, 1)
+        }
+
+
+class CollectionRegistry:
+    """Named collections loaded on first use, evicted least recently used first."""
+
+    def __init__(self, root: str = 'collections', default_path: str = '.', budget_mb: float = 0,
+                 max_loaded: int = 8, index_load_mode: str = 'heap'):
+        """
+        Initialize the registry.
+
+        Args:
+            root: Directory holding one subdirectory per named collection
+            default_path: Directory of the default collection
+            budget_mb: Total size of the loaded named collections (0 = no size limit)
+            max_loaded: Named collections kept loaded at once (0 = no limit)
+            index_load_mode: 'heap' or 'mmap' for the FAISS indexes
+        """
+        self.root = root
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.max_loaded = max(0, max_loaded)
+        self.index_load_mode = index_load_mode
+        self.default = Collection(DEFAULT_COLLECTION, default_path, index_load_mode)
+
+        self.lock = threading.Lock()
+        self.loaded: 'OrderedDict[str, Collection]' = OrderedDict()  # least recently used first
+        self.load_locks: Dict[str, threading.Lock] = {}
+
+        # Statistics
+        self.loads = 0
+        self.load_failures = 0
+        self.load_seconds = 0.0
+        self.evictions = 0
+
+    def available(self) -> List[str]:
+        """Names of the collections that can be queried."""
+        names = [DEFAULT_COLLECTION]
+        if os.path.isdir(self.root):
+            names.extend(sorted(name for name in os.listdir(self.root)
+                                if name != DEFAULT_COLLECTION and COLLECTION_NAME.match(name)
+                                and self.has_index(os.path.join(self.root, name))))
+        return names
+
+    def has_index(self, path: str) -> bool:
+        return os.path.exists(os.path.join(path, 'document.index')) or ChunkStore.exists(os.path.join(path, 'chunk_store'))
+
+    def get(self, name: Optional[str] = None) -> Collection:
+        """
+        A loaded collection, loading it (and evicting others) on first use.
+
+        Args:
+            name: Collection name (None or 'default' for the working directory's index)
+
+        Raises:
+            UnknownCollectionError: No collection of that name exists
+            CollectionUnavailableError: The collection's index files could not be loaded
+        """
+        if not name or name == DEFAULT_COLLECTION:
+            self.default.last_used = time.time()
+            return self.default
+
+        with self.lock:
+            collection = self.touch(name)
+            if collection is not None:
+                return collection
+
+        try:
+            path = collection_path(self.root, name)
+        except ValueError as e:
+            raise UnknownCollectionError(str(e))
+        if not self.has_index(path):
+            raise UnknownCollectionError(f"Unknown collection '{name}'")
+
+        with self.lock:
+            load_lock = self.load_locks.setdefault(name, threading.Lock())
+        # One thread loads a collection; others asking for it wait, other collections are not blocked
+        with load_lock:
+            with self.lock:
+                collection = self.touch(name)
+                if collection is not None:
+                    return collection
+
+            start = time.perf_counter()
+            collection = Collection(name, path, self.index_load_mode)
+            loaded = collection.load()
+            with self.lock:
+                self.load_seconds += time.perf_counter() - start
+                if not loaded:
+                    # Not registered, so the next request tries to load it again
+                    self.load_failures += 1
+                    raise CollectionUnavailableError(f"Collection '{name}' could not be loaded")
+                self.loads += 1
+                self.loaded[name] = collection
+                self.evict(keep=name)
+        return collection
+
+    def loaded_collections(self) -> List[Collection]:
+        """The default collection and every loaded named collection."""
+        with self.lock:
+            return [self.default] + list(self.loaded.values())
+
+    def touch(self, name: str) -> Optional[Collection]:
+        """Mark a loaded collection as most recently used (caller holds the lock)."""
+        collection = self.loaded.get(name)
+        if collection is not None:
+            self.loaded.move_to_end(name)
+            collection.last_used = time.time()
+        return collection
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """
+        Unload least recently used collections until the rest fit the budget and
+        count (caller holds the lock). Nothing is closed: queries still running on
+        an evicted collection keep its index and memory maps alive until they finish.
+        """
+        def over() -> bool:
+            if self.max_loaded and len(self.loaded) > self.max_loaded:
+                return True
+            return bool(self.budget_bytes) and sum(c.size_bytes for c in self.loaded.values()) > self.budget_bytes
+
+        for name in list(self.loaded):
+            if not over():
+                break
+            if name == keep:
+                continue
+            self.unload(name, 'budget')
+
+    def evict_one(self, idle_seconds: float = 0.0) -> bool:
+        """
+        Unload the least recently used collection, e.g. under memory pressure.
+
+        Args:
+            idle_seconds: Keep every collection used within this many seconds
+
+        Returns:
+            Whether a collection was unloaded
+        """
+        with self.lock:
+            if not self.loaded:
+                return False
+            name, collection = next(iter(self.loaded.items()))
+            if time.time() - collection.last_used < idle_seconds:
+                return False
+            self.unload(name, 'memory pressure')
+            return True
+
+    def unload(self, name: str, reason: str) -> None:
+        collection = self.loaded.pop(name)
+        self.evictions += 1
+        logger.info(f"Evicted collection '{name}' ({collection.size_bytes / 1024 / 1024:.1f} MB, {reason})")
+
+    def stats(self) -> Dict[str, Any]:
+        """Loaded collections and load/eviction counts for /health."""
+        with self.lock:
+            loaded = {name: collection.stats() for name, collection in self.loaded.items()}
+        return {
+            'default': self.default.stats(),
+            'loaded': loaded,
+            'loaded_mb': round(sum(c['size_mb'] for c in loaded.values()), 1),
+            'budget_mb': round(self.budget_bytes / 1024 / 1024, 1) if self.budget_bytes else None,
+            'max_loaded': self.max_loaded or None,
+            'loads': self.loads,
+            'load_failures': self.load_failures,
+            'load_seconds': round(self.load_seconds, 3),
+            'evictions': self.evictions
+        }
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Educational Assistant - Inference Backend Comparison
+Loads the embedding model and/or LLM under each backend in a fresh process and
+reports load time, resident memory, p50/p95 latency and parity with float32.
+
+Usage:
+    python compare_backends.py --component both --backends torch int8 onnx --runs 20
+"""
+
+import os
+import time
+import argparse
+import multiprocessing
+from typing import Any, Dict, List
+
+import numpy as np
+import psutil
+
+MB = 1024 * 1024
+
+
+def measure(component: str, model_name: str, backend: str, runs: int, export_dir: str) -> Dict[str, Any]:
+    """Load one model with one backend and time it (runs in a child process)."""
+    import torch
+    from inference_backends import (PARITY_SAMPLES, load_sentence_encoder, load_causal_lm,
+                                    next_token_logits)
+
+    torch.set_num_threads(int(os.getenv('TORCH_THREADS', torch.get_num_threads())))
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+    start = time.perf_counter()
+
+    if component == 'embedding':
+        model, used = load_sentence_encoder(model_name, backend, export_dir)
+        load_seconds = time.perf_counter() - start
+        model.encode(PARITY_SAMPLES[:1])  # warm-up
+
+        latencies = []
+        for i in range(runs):
+            query = PARITY_SAMPLES[i % len(PARITY_SAMPLES)]
+            t = time.perf_counter()
+            model.encode([query])
+            latencies.append(time.perf_counter() - t)
+        outputs = np.asarray(model.encode(PARITY_SAMPLES), dtype=np.float32)
+    else:
+        tokenizer, model, used = load_causal_lm(model_name, backend, export_dir)
+        load_seconds = time.perf_counter() - start
+        inputs = tokenizer(PARITY_SAMPLES[0], return_tensors='pt')
+        model.generate(**inputs, max_new_tokens=4, do_sample=False,
+                       pad_token_id=tokenizer.eos_token_id)  # warm-up
+
+        latencies = []
+        for i in range(runs):
+            inputs = tokenizer(PARITY_SAMPLES[i % len(PARITY_SAMPLES)], return_tensors='pt')
+            t = time.perf_counter()
+            model.generate(**inputs, max_new_tokens=32, do_sample=False,
+                           pad_token_id=tokenizer.eos_token_id)
+            latencies.append(time.perf_counter() - t)
+        outputs = next_token_logits(model, tokenizer, PARITY_SAMPLES)
+
+    return {
+        'backend': used,
+        'load_seconds': load_seconds,
+        'rss_mb': process.memory_info().rss / MB,
+        'model_rss_mb': (process.memory_info().rss - rss_before) / MB,
+        'p50_ms': float(np.percentile(latencies, 50)) * 1000,
+        'p95_ms': float(np.percentile(latencies, 95)) * 1000,
+        'outputs': outputs
+    }
+
+
+def run_isolated(component: str, model_name: str, backend: str, runs: int, export_dir: str) -> Dict[str, Any]:
+    """Run measure() in a fresh process so RSS reflects a single model."""
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1) as pool:
+        return pool.apply(measure, (component, model_name, backend, runs, export_dir))
+
+
+def compare(component: str, model_name: str, backends: List[str], runs: int, export_dir: str) -> None:
+    """Measure every backend and print a table relative to float32 torch."""
+    from inference_backends import embedding_parity, generation_parity
+
+    print(f"\n{component}: {model_name} ({runs} runs)")
+    results = {}
+    for backend in ['torch'] + [b for b in backends if b != 'torch']:
+        print(f"  measuring {backend}...", flush=True)
+        results[backend] = run_isolated(component, model_name, backend, runs, export_dir)
+
+    reference = results['torch']
+    print(f"  {'backend':<8} {'load s':>7} {'RSS MB':>8} {'model MB':>9} {'p50 ms':>8} {'p95 ms':>8}  parity")
+    for backend, result in results.items():
+        if backend == 'torch':
+            parity = 'reference'
+        elif component == 'embedding':
+            report = embedding_parity(reference['outputs'], result['outputs'])
+            parity = f"min cosine {report['min_cosine']}, {'ok' if report['passed'] else 'FAILED'}"
+        else:
+            report = generation_parity(reference['outputs'], result['outputs'])
+            parity = (f"top-1 {report['top1_agreement']:.1%}, max logit diff {report['max_logit_diff']}, "
+                      f"{'ok' if report['passed'] else 'FAILED'}")
+        if result['backend'] != backend:
+            parity = f"fell back to {result['backend']}"
+        speedup = reference['p50_ms'] / result['p50_ms'] if result['p50_ms'] else 0.0
+        print(f"  {backend:<8} {result['load_seconds']:>7.1f} {result['rss_mb']:>8.0f} "
+              f"{result['model_rss_mb']:>9.0f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f}  "
+              f"{parity} (p50 x{speedup:.2f})")
+
+
+def main():
+    """Compare inference backends for the configured models."""
+    parser = argparse.ArgumentParser(description='Compare CPU inference backends')
+    parser.add_argument('--component', choices=['embedding', 'llm', 'both'], default='both')
+    parser.add_argument('--backends', nargs='+', default=['torch', 'int8', 'onnx'])
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    export_dir = os.getenv('ONNX_EXPORT_DIR', 'onnx_models')
+    if args.component in ('embedding', 'both'):
+        compare('embedding', os.getenv('EMBEDDING_MODEL', 'all-MiniLM-L6-v2'), args.backends, args.runs, export_dir)
+    if args.component in ('llm', 'both'):
+        compare('llm', os.getenv('LLM_MODEL', 'microsoft/DialoGPT-medium'), args.backends, args.runs, export_dir)
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Educational Assistant - Embedding Cache
+Content-addressed on-disk cache of chunk embeddings used by ingest.py.
+
+Layout of a cache directory:
+    meta.json      - vector dimension, dtype and row count
+    keys.npy       - SHA-256 digest (32 x uint8) of (namespace, chunk text) per row
+    last_used.npy  - run counter of the last run that used each row (for eviction)
+    vectors.bin    - row-major vectors, memory-mapped for lookups
+
+Every save writes a complete new generation of these files and publishes it
+with one atomic switch, so an interrupted save leaves the previous generation.
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from chunk_store import replace_directory
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """Persistent embedding cache keyed by hash(namespace, text)."""
+
+    def __init__(self, path: str, namespace: str, dtype: str = 'float16', max_mb: int = 1024):
+        """
+        Open (or create) an embedding cache.
+
+        Args:
+            path: Cache directory
+            namespace: Embedding model and chunking settings; part of every key
+            dtype: Storage dtype for vectors ('float16' or 'float32')
+            max_mb: Size budget for vectors; least recently used rows are evicted on save
+        """
+        self.path = path
+        self.namespace = namespace
+        self.dtype = np.dtype(dtype)
+        self.max_bytes = max_mb * 1024 * 1024
+        self.run_id = int(time.time())
+
+        self.dim = None
+        self.count = 0
+        self.slots: Dict[bytes, int] = {}
+        self.last_used = np.zeros(0, dtype=np.int64)
+        self.vectors = None
+        self.pending: Dict[bytes, np.ndarray] = {}
+
+        self.hits = 0
+        self.misses = 0
+
+        self.load()
+
+    def load(self) -> None:
+        """Load the key table and memory-map the stored vectors; an inconsistent cache is discarded."""
+        meta_path = os.path.join(self.path, 'meta.json')
+        if not os.path.exists(meta_path):
+            return
+
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if np.dtype(meta['dtype']) != self.dtype:
+                logger.warning(f"⚠️ Embedding cache dtype changed ({meta['dtype']} -> {self.dtype}), starting empty")
+                return
+
+            dim, count = meta['dim'], meta['count']
+            keys = np.load(os.path.join(self.path, 'keys.npy'))
+            last_used = np.load(os.path.join(self.path, 'last_used.npy'))
+            vectors_path = os.path.join(self.path, 'vectors.bin')
+            vector_bytes = os.path.getsize(vectors_path) if os.path.exists(vectors_path) else 0
+            if len(keys) != count or len(last_used) != count or vector_bytes != count * dim * self.dtype.itemsize:
+                raise ValueError(f"{count} rows in meta.json, {len(keys)} keys, {len(last_used)} last-used "
+                                 f"entries and {vector_bytes} bytes of vectors")
+            vectors = np.memmap(vectors_path, dtype=self.dtype, mode='r', shape=(count, dim)) if count else None
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding cache at {self.path} is unreadable, starting empty: {e}")
+            return
+
+        self.dim = dim
+        self.count = count
+        self.slots = {key.tobytes(): slot for slot, key in enumerate(keys)}
+        self.last_used = last_used
+        self.vectors = vectors
+
+    def key(self, text: str) -> bytes:
+        """Content address of a chunk text under this cache's namespace."""
+        digest = hashlib.sha256(self.namespace.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(text.encode('utf-8'))
+        return digest.digest()
+
+    def get_many(self, texts: List[str]) -> Tuple[List[Optional[np.ndarray]], List[int]]:
+        """
+        Look up embeddings for a batch of texts.
+
+        Returns:
+            Cached vectors (None where missing) and the indices of the missing texts
+        """
+        found: List[Optional[np.ndarray]] = []
+        missing = []
+        for i, text in enumerate(texts):
+            key = self.key(text)
+            vector = self.pending.get(key)
+            if vector is None:
+                slot = self.slots.get(key)
+                if slot is not None:
+                    vector = np.asarray(self.vectors[slot], dtype=np.float32)
+                    self.last_used[slot] = self.run_id
+            if vector is None:
+                missing.append(i)
+                self.misses += 1
+            else:
+                self.hits += 1
+            found.append(vector)
+        return found, missing
+
+    def put_many(self, texts: List[str], vectors: np.ndarray) -> None:
+        """Add freshly computed embeddings; they are written to disk on save()."""
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        for text, vector in zip(texts, vectors):
+            key = self.key(text)
+            if key not in self.slots:
+                self.pending[key] = np.asarray(vector, dtype=self.dtype)
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def save(self) -> None:
+        """Persist new vectors, evicting least recently used rows beyond the size budget."""
+        if self.dim is None:
+            return
+
+        keys = [None] * self.count
+        for key, slot in self.slots.items():
+            keys[slot] = key
+        keys.extend(self.pending)
+        last_used = np.concatenate([self.last_used, np.full(len(self.pending), self.run_id, dtype=np.int64)])
+        total = len(keys)
+
+        row_bytes = self.dim * self.dtype.itemsize
+        max_rows = max(0, self.max_bytes // row_bytes)
+        if total > max_rows:
+            # Keep the most recently used rows, in their original order
+            keep = np.sort(np.argsort(-last_used, kind='stable')[:max_rows])
+            logger.info(f"Evicting {total - len(keep)} embeddings from cache (budget {self.max_bytes // 1024 // 1024} MB)")
+        else:
+            keep = None
+
+        # Write the next generation next to the current one, then switch to it in one step
+        tmp_path = f"{self.path}.tmp"
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+
+        vectors_path = os.path.join(tmp_path, 'vectors.bin')
+        if keep is None:
+            # Nothing evicted: copy the stored rows as they are and append the new ones
+            if self.count:
+                shutil.copyfile(os.path.join(self.path, 'vectors.bin'), vectors_path)
+            with open(vectors_path, 'ab') as f:
+                for vector in self.pending.values():
+                    f.write(vector.tobytes())
+        else:
+            with open(vectors_path, 'wb') as f:
+                for row in keep:
+                    if row < self.count:
+                        f.write(np.asarray(self.vectors[row], dtype=self.dtype).tobytes())
+                    else:
+                        f.write(self.pending[keys[row]].tobytes())
+            keys = [keys[row] for row in keep]
+            last_used = last_used[keep]
+
+        key_array = np.frombuffer(b''.join(keys), dtype=np.uint8).reshape(len(keys), 32)
+        np.save(os.path.join(tmp_path, 'keys.npy'), key_array)
+        np.save(os.path.join(tmp_path, 'last_used.npy'), last_used)
+        with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'dim': self.dim, 'dtype': self.dtype.name, 'count': len(keys)}, f)
+
+        # Only ingest.py uses the cache, so no reader needs the previous generation
+        self.vectors = None
+        replace_directory(tmp_path, self.path, keep_previous=False)
+
+        self.pending = {}
+        self.load()
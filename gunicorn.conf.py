@@ -0,0 +1,44 @@
+# Educational Assistant - Gunicorn configuration
+# Workers load the retrieval components after fork and accept requests only
+# once loaded, so a worker recycled by max_requests never answers 503.
+# The FAISS index is memory-mapped by default (INDEX_LOAD_MODE=mmap), so its
+# pages are shared through the page cache, but every worker holds its own
+# embedding model and LLM; one worker (with THREADS) is the default.
+# PRELOAD_COMPONENTS=true instead loads the index and models in the master
+# before forking, so workers share those pages and two workers are the
+# default, but nothing is served until loading has finished.
+import os
+
+preload_app = os.getenv('PRELOAD_APP', 'true').lower() == 'true'
+preload_components = preload_app and os.getenv('PRELOAD_COMPONENTS', 'false').lower() == 'true'
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WORKERS', 2 if preload_components else 1))
+# Threads let concurrent /ask requests share batched query embeddings (gthread worker)
+threads = int(os.getenv('THREADS', 4))
+timeout = int(os.getenv('TIMEOUT', 120))
+max_requests = int(os.getenv('MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+
+if preload_app and not preload_components:
+    # Read by EducationalAssistant when the master imports app.py: each worker loads after fork
+    os.environ['STARTUP_LOAD_AFTER_FORK'] = 'true'
+
+
+def pre_fork(server, worker):
+    """With PRELOAD_COMPONENTS, finish loading in the master so workers share the components."""
+    if preload_components:
+        from app import assistant
+        assistant.wait_until_loaded()
+
+
+def post_worker_init(worker):
+    """Otherwise load in the worker, before it accepts its first request."""
+    if preload_components:
+        return
+    from app import assistant
+    if preload_app:
+        assistant.start_loading()
+    # Heartbeat while loading so the arbiter does not kill the worker after `timeout`
+    while assistant.startup_mode != 'off' and not assistant.wait_until_loaded(timeout=1):
+        worker.notify()
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Educational Assistant - CPU Inference Backends
+Loads the embedding model and the LLM as float32 PyTorch ('torch'), dynamically
+int8-quantized PyTorch ('int8') or ONNX Runtime ('onnx').
+
+ONNX models are exported once into ONNX_EXPORT_DIR and reused on later starts.
+The ONNX backend needs `optimum[onnxruntime]`; without it the loaders fall back to torch.
+"""
+
+import os
+import json
+import shutil
+import logging
+import tempfile
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer, models
+from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('torch', 'int8', 'onnx')
+
+# Parity thresholds against the float32 model
+EMBEDDING_MIN_COSINE = 0.98
+LLM_MIN_TOP1_AGREEMENT = 0.9
+
+PARITY_SAMPLES = [
+    "Create a lesson plan about photosynthesis for 5th grade",
+    "Elementary music activity on rhythm and steady beat, 30 minutes",
+    "Fractions review for 4th graders using visual models",
+    "Introduce the water cycle with a hands-on experiment",
+    "Persuasive writing mini-lesson for middle school",
+]
+
+
+def export_path(export_dir: str, model_name: str, task: str) -> str:
+    """Directory an exported ONNX model is stored in."""
+    return os.path.join(export_dir, f"{model_name.replace('/', '--')}-{task}")
+
+
+def quantize_int8(model: torch.nn.Module) -> torch.nn.Module:
+    """Dynamically quantize every Linear layer of a model to int8 (in place)."""
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def conv1d_to_linear(model: torch.nn.Module) -> torch.nn.Module:
+    """
+    Replace GPT-2 style Conv1D layers with equivalent Linear layers (in place).
+
+    DialoGPT and other GPT-2 models implement their projections as transformers'
+    Conv1D, which quantize_dynamic does not recognize.
+    """
+    from transformers.pytorch_utils import Conv1D
+
+    for module in list(model.modules()):
+        for child_name, child in list(module.named_children()):
+            if isinstance(child, Conv1D):
+                in_features, out_features = child.weight.shape
+                linear = torch.nn.Linear(in_features, out_features)
+                linear.weight.data = child.weight.data.t().contiguous()
+                linear.bias.data = child.bias.data
+                setattr(module, child_name, linear)
+    return model
+
+
+class OnnxSentenceEncoder:
+    """ONNX Runtime replacement for SentenceTransformer.encode (transformer + pooling + normalize)."""
+
+    def __init__(self, path: str):
+        """
+        Load an encoder exported by export_sentence_encoder.
+
+        Args:
+            path: Export directory
+        """
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+
+        with open(os.path.join(path, 'pooling.json'), 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        self.pooling_mode = config['pooling_mode']
+        self.normalize = config['normalize']
+        self.max_seq_length = config['max_seq_length']
+        self.tokenizer = AutoTokenizer.from_pretrained(path)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(path)
+
+    def encode(self, sentences, batch_size: int = 32, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        """Encode one sentence or a list of sentences to float32 vectors."""
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        vectors = []
+        for start in range(0, len(sentences), batch_size):
+            batch = self.tokenizer(sentences[start:start + batch_size], padding=True, truncation=True,
+                                   max_length=self.max_seq_length, return_tensors='np')
+            hidden = np.asarray(self.model(**batch).last_hidden_state, dtype=np.float32)
+            mask = batch['attention_mask'][..., None].astype(np.float32)
+
+            if self.pooling_mode == 'cls':
+                pooled = hidden[:, 0]
+            elif self.pooling_mode == 'max':
+                pooled = np.where(mask > 0, hidden, -1e9).max(axis=1)
+            else:
+                pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+            if self.normalize:
+                pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            vectors.append(pooled)
+
+        result = np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+        return result[0] if single else result
+
+
+def export_sentence_encoder(model_name: str, path: str) -> None:
+    """Export a sentence transformer's transformer module to ONNX, with its pooling settings."""
+    from optimum.onnxruntime import ORTModelForFeatureExtraction
+
+    logger.info(f"Exporting {model_name} to ONNX: {path}")
+    reference = SentenceTransformer(model_name)
+    transformer = reference[0]
+    pooling = next((m for m in reference if isinstance(m, models.Pooling)), None)
+
+    staging = tempfile.mkdtemp(prefix='onnx-export-')
+    try:
+        transformer.auto_model.save_pretrained(staging)
+        transformer.tokenizer.save_pretrained(staging)
+        model = ORTModelForFeatureExtraction.from_pretrained(staging, export=True)
+        model.save_pretrained(path)
+        transformer.tokenizer.save_pretrained(path)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    with open(os.path.join(path, 'pooling.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'pooling_mode': pooling.get_pooling_mode_str() if pooling else 'mean',
+            'normalize': any(isinstance(m, models.Normalize) for m in reference),
+            'max_seq_length': transformer.max_seq_length
+        }, f, indent=2)
+
+
+def load_sentence_encoder(model_name: str, backend: str = 'torch',
+                          export_dir: str = 'onnx_models') -> Tuple[Any, str]:
+    """
+    Load the embedding model with the requested backend.
+
+    Args:
+        model_name: Sentence transformer model name
+        backend: 'torch', 'int8' or 'onnx'
+        export_dir: Directory holding exported ONNX models
+
+    Returns:
+        The encoder (anything with SentenceTransformer's encode()) and the backend actually used
+    """
+    if backend not in BACKENDS:
+        logger.warning(f"⚠️ Unknown inference backend '{backend}', using torch")
+        backend = 'torch'
+
+    if backend == 'onnx':
+        try:
+            path = export_path(export_dir, model_name, 'feature-extraction')
+            if not os.path.exists(os.path.join(path, 'pooling.json')):
+                export_sentence_encoder(model_name, path)
+            return OnnxSentenceEncoder(path), 'onnx'
+        except ImportError:
+            logger.warning("⚠️ optimum[onnxruntime] not installed, using torch for the embedding model")
+            backend = 'torch'
+        except Exception as e:
+            logger.warning(f"⚠️ ONNX embedding model failed to load ({e}), using torch")
+            backend = 'torch'
+
+    model = SentenceTransformer(model_name, device='cpu')
+    if backend == 'int8':
+        quantize_int8(model)
+    return model, backend
+
+
+def load_causal_lm(model_name: str, backend: str = 'torch',
+                   export_dir: str = 'onnx_models') -> Tuple[Any, Any, str]:
+    """
+    Load the LLM and its tokenizer with the requested backend.
+
+    Args:
+        model_name: Causal language model name
+        backend: 'torch', 'int8' or 'onnx'
+        export_dir: Directory holding exported ONNX models
+
+    Returns:
+        Tokenizer, model and the backend actually used
+    """
+    if backend not in BACKENDS:
+        logger.warning(f"⚠️ Unknown inference backend '{backend}', using torch")
+        backend = 'torch'
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    if backend == 'onnx':
+        try:
+            from optimum.onnxruntime import ORTModelForCausalLM
+
+            path = export_path(export_dir, model_name, 'text-generation')
+            if os.path.exists(os.path.join(path, 'config.json')):
+                model = ORTModelForCausalLM.from_pretrained(path)
+            else:
+                logger.info(f"Exporting {model_name} to ONNX: {path}")
+                model = ORTModelForCausalLM.from_pretrained(model_name, export=True)
+                model.save_pretrained(path)
+            return tokenizer, model, 'onnx'
+        except ImportError:
+            logger.warning("⚠️ optimum[onnxruntime] not installed, using torch for the LLM")
+            backend = 'torch'
+        except Exception as e:
+            logger.warning(f"⚠️ ONNX LLM failed to load ({e}), using torch")
+            backend = 'torch'
+
+    model = AutoModelForCausalLM.from_pretrained(
+        model_name,
+        torch_dtype=torch.float32,
+        device_map='cpu',
+        low_cpu_mem_usage=True
+    )
+    if backend == 'int8':
+        quantize_int8(conv1d_to_linear(model))
+    model.eval()
+    return tokenizer, model, backend
+
+
+def text_generation_pipeline(model: Any, tokenizer: Any, backend: str, **kwargs):
+    """Build a text-generation pipeline; ONNX models need optimum's pipeline factory."""
+    if backend == 'onnx':
+        from optimum.pipelines import pipeline as ort_pipeline
+        return ort_pipeline('text-generation', model=model, tokenizer=tokenizer, accelerator='ort', **kwargs)
+    return pipeline('text-generation', model=model, tokenizer=tokenizer, **kwargs)
+
+
+def embedding_parity(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, Any]:
+    """Compare embeddings of the same texts by per-row cosine similarity."""
+    reference = np.asarray(reference, dtype=np.float32)
+    candidate = np.asarray(candidate, dtype=np.float32)
+    cosine = (reference * candidate).sum(axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1) + 1e-12
+    )
+    return {
+        'min_cosine': round(float(cosine.min()), 5),
+        'mean_cosine': round(float(cosine.mean()), 5),
+        'passed': bool(cosine.min() >= EMBEDDING_MIN_COSINE)
+    }
+
+
+def next_token_logits(model: Any, tokenizer: Any, prompts: List[str]) -> List[np.ndarray]:
+    """Logits for every position of each prompt (one forward pass per prompt)."""
+    logits = []
+    with torch.no_grad():
+        for prompt in prompts:
+            inputs = tokenizer(prompt, return_tensors='pt')
+            output = model(**inputs)
+            logits.append(np.asarray(output.logits[0].detach().float().numpy(), dtype=np.float32))
+    return logits
+
+
+def generation_parity(reference: List[np.ndarray], candidate: List[np.ndarray]) -> Dict[str, Any]:
+    """Compare LLM logits by top-1 next-token agreement and the largest absolute difference."""
+    agree = total = 0
+    max_diff = 0.0
+    for ref, cand in zip(reference, candidate):
+        agree += int((ref.argmax(axis=-1) == cand.argmax(axis=-1)).sum())
+        total += ref.shape[0]
+        max_diff = max(max_diff, float(np.abs(ref - cand).max()))
+    agreement = agree / total if total else 0.0
+    return {
+        'top1_agreement': round(agreement, 4),
+        'max_logit_diff': round(max_diff, 4),
+        'passed': agreement >= LLM_MIN_TOP1_AGREEMENT
+    }
+
+
+def check_embedding_parity(model_name: str, encoder: Any) -> Tuple[Dict[str, Any], SentenceTransformer]:
+    """
+    Compare the candidate encoder with the float32 model on the parity samples.
+
+    Returns:
+        Parity report and the float32 reference model (so a caller can fall back to it)
+    """
+    reference = SentenceTransformer(model_name, device='cpu')
+    report = embedding_parity(reference.encode(PARITY_SAMPLES), encoder.encode(PARITY_SAMPLES))
+    return report, reference
+
+
+def check_llm_parity(model_name: str, tokenizer: Any, model: Any) -> Tuple[Dict[str, Any], Any]:
+    """
+    Compare the candidate LLM with the float32 model on the parity samples.
+
+    Returns:
+        Parity report and the float32 reference model (so a caller can fall back to it)
+    """
+    _, reference, _ = load_causal_lm(model_name, 'torch')
+    report = generation_parity(next_token_logits(reference, tokenizer, PARITY_SAMPLES),
+                               next_token_logits(model, tokenizer, PARITY_SAMPLES))
+    return report, reference
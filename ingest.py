@@ -8,44 +8,79 @@ import os
 import json
 import logging
 import pickle
-from typing import List, Dict, Any, Optional
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Callable, Iterable, Iterator, Tuple, Union
 from pathlib import Path
 import re
+import time
+import shutil
+import tempfile
+import random
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 
 # Core libraries
-import fitz  # PyMuPDF
 import numpy as np
-from sentence_transformers import SentenceTransformer
-import faiss
-
-# Google Drive API
-from googleapiclient.discovery import build
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from googleapiclient.http import MediaIoBaseDownload
+
+from chunk_store import ChunkStore, write_chunk_store
+from bm25_index import write_bm25_index
+from embedding_cache import EmbeddingCache
+from metrics import IngestStats
+from pdf_processing import PdfProcessor, configure_logging, extract_and_chunk, read_spooled_chunks, timed_process_pdf
+from token_chunking import chunk_window
 import io
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('ingestion.log'),
-        logging.StreamHandler()
-    ]
-)
+# Extraction worker processes are spawned, and spawn imports the main script
+# again: when this module runs as `python ingest.py` every worker imports it.
+# FAISS, the Google Drive client and the embedding model stack are therefore
+# imported by the methods that use them, and logging is configured in main().
+if TYPE_CHECKING:
+    import faiss
+
 logger = logging.getLogger(__name__)
 
-class DocumentIngester:
+class DocumentIngester(PdfProcessor):
     """Handles document ingestion from Google Drive to FAISS index."""
 
+    INDEX_TYPES = ('flat', 'hnsw', 'ivf_flat', 'ivf_pq')
+    # Vectors normalized and added to the index at a time (~24 MB of 384-dim float32)
+    INDEX_ADD_BATCH = 16384
+
     def __init__(self, 
                  credentials_path: str = 'credentials.json',
                  token_path: str = 'token.json',
                  chunk_size: int = 300,
                  chunk_overlap: int = 50,
-                 embedding_model: str = 'all-MiniLM-L6-v2'):
+                 chunk_mode: str = 'words',
+                 chunk_tokens: int = 0,
+                 chunk_overlap_tokens: int = 32,
+                 embedding_model: str = 'all-MiniLM-L6-v2',
+                 embedding_backend: str = 'torch',
+                 onnx_export_dir: str = 'onnx_models',
+                 index_type: str = 'flat',
+                 nlist: Optional[int] = None,
+                 nprobe: int = 8,
+                 hnsw_m: int = 32,
+                 ef_construction: int = 40,
+                 ef_search: int = 64,
+                 pq_m: int = 16,
+                 pq_bits: int = 8,
+                 incremental: bool = True,
+                 download_workers: int = 4,
+                 download_retries: int = 5,
+                 download_cache_dir: Optional[str] = None,
+                 spool_downloads: bool = True,
+                 download_chunk_mb: int = 16,
+                 extract_workers: Optional[int] = None,
+                 embed_batch_size: int = 256,
+                 pipeline_queue_size: int = 2048,
+                 embedding_cache_dir: Optional[str] = 'embedding_cache',
+                 embedding_cache_dtype: str = 'float16',
+                 embedding_cache_max_mb: int = 1024,
+                 build_bm25: bool = True,
+                 stats_path: Optional[str] = 'ingest_stats.json',
+                 service_factory: Optional[Callable[[], Any]] = None):
         """
         Initialize the document ingester.
 
@@ -53,19 +88,90 @@ class DocumentIngester:
             credentials_path: Path to Google API credentials
             token_path: Path to store OAuth token
             chunk_size: Size of text chunks in words
-            chunk_overlap: Overlap between chunks in words
+            chunk_overlap: Overlap between chunks in words (smaller than chunk_size)
+            chunk_mode: 'words' (chunk_size words) or 'tokens' (sentences packed into the
+                embedding model's token window, measured with its tokenizer)
+            chunk_tokens: Tokens per chunk in 'tokens' mode (0 fills the model's max sequence length)
+            chunk_overlap_tokens: Tokens of trailing sentences repeated in the next chunk in 'tokens' mode
             embedding_model: Sentence transformer model name
+            embedding_backend: Inference backend for the embedding model ('torch', 'int8' or 'onnx')
+            onnx_export_dir: Directory holding exported ONNX models
+            index_type: FAISS index type ('flat', 'hnsw', 'ivf_flat' or 'ivf_pq')
+            nlist: Number of IVF clusters (defaults to ~4 * sqrt(vector count))
+            nprobe: Number of IVF clusters scanned per query
+            hnsw_m: Number of HNSW graph neighbours per node
+            ef_construction: HNSW candidate list size while building
+            ef_search: HNSW candidate list size while searching
+            pq_m: Number of PQ sub-quantizers (must divide the embedding dimension)
+            pq_bits: Bits per PQ sub-quantizer code
+            incremental: Only process files added or changed since the last run
+            download_workers: Maximum number of concurrent Drive downloads
+            download_retries: Attempts per file before a download is given up
+            download_cache_dir: Directory keeping downloaded PDFs by file ID and modifiedTime,
+                so unchanged files are never downloaded again (None disables it)
+            spool_downloads: Stream downloads into temporary files, deleted once extracted,
+                instead of memory when there is no download cache
+            download_chunk_mb: Size of each ranged request when downloading to disk
+            extract_workers: Processes extracting and chunking PDFs
+                (defaults to CPU count - 1; 0 extracts in the main process)
+            embed_batch_size: Chunks per embedding batch
+            pipeline_queue_size: Maximum chunks waiting to be embedded
+            embedding_cache_dir: Directory of the on-disk embedding cache (None disables it)
+            embedding_cache_dtype: Storage dtype of cached vectors ('float16' or 'float32')
+            embedding_cache_max_mb: Size budget of the embedding cache
+            build_bm25: Also build the BM25 inverted index used for hybrid retrieval
+            stats_path: Where each run's counters and stage timings are saved for the app's
+                /metrics (None disables saving)
+            service_factory: Builds a Drive service per download thread
+                (defaults to one built from the authenticated credentials)
         """
         self.credentials_path = credentials_path
         self.token_path = token_path
-        self.chunk_size = chunk_size
-        self.chunk_overlap = chunk_overlap
+        super().__init__(chunk_size=chunk_size, chunk_overlap=chunk_overlap, chunk_mode=chunk_mode,
+                         chunk_tokens=chunk_tokens, chunk_overlap_tokens=chunk_overlap_tokens)
         self.embedding_model_name = embedding_model
+        self.embedding_backend = embedding_backend
+        self.onnx_export_dir = onnx_export_dir
+
+        # FAISS index configuration
+        index_type = index_type.lower().replace('-', '_')
+        if index_type not in self.INDEX_TYPES:
+            raise ValueError(f"Unknown index type '{index_type}', expected one of {self.INDEX_TYPES}")
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.pq_m = pq_m
+        self.pq_bits = pq_bits
+        self.index_config = {}
+        self.incremental = incremental
 
         # Google Drive API setup
         self.SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
         self.service = None
+        self.credentials = None
+        self.service_factory = service_factory
+        self.download_workers = max(1, download_workers)
+        self.download_retries = max(1, download_retries)
+        self.download_cache_dir = download_cache_dir
+        self.spool_downloads = spool_downloads
+        self.download_chunk_mb = max(1, download_chunk_mb)
+        self._thread_local = threading.local()
+        if extract_workers is None:
+            extract_workers = max(1, (os.cpu_count() or 2) - 1)
+        self.extract_workers = max(0, extract_workers)
+        self.embed_batch_size = max(1, embed_batch_size)
+        self.pipeline_queue_size = max(self.embed_batch_size, pipeline_queue_size)
+        self.embedding_cache_dir = embedding_cache_dir
+        self.embedding_cache_dtype = embedding_cache_dtype
+        self.embedding_cache_max_mb = embedding_cache_max_mb
+        self.embedding_cache = None
         self.embedding_model = None
+        self.build_bm25 = build_bm25
+        self.stats_path = stats_path
+        self.stats = IngestStats()
 
         # Storage
         self.documents = []
@@ -74,6 +180,11 @@ class DocumentIngester:
     def authenticate_google_drive(self) -> bool:
         """Authenticate with Google Drive API."""
         try:
+            from googleapiclient.discovery import build
+            from google_auth_oauthlib.flow import InstalledAppFlow
+            from google.auth.transport.requests import Request
+            from google.oauth2.credentials import Credentials
+
             creds = None
 
             # Load existing token
@@ -98,6 +209,7 @@ class DocumentIngester:
                 with open(self.token_path, 'w') as token:
                     token.write(creds.to_json())
 
+            self.credentials = creds
             self.service = build('drive', 'v3', credentials=creds)
             logger.info("✅ Google Drive authentication successful")
             return True
@@ -109,24 +221,47 @@ class DocumentIngester:
     def load_embedding_model(self) -> bool:
         """Load the sentence transformer model."""
         try:
-            logger.info(f"Loading embedding model: {self.embedding_model_name}")
-            self.embedding_model = SentenceTransformer(self.embedding_model_name)
+            # Imported here: torch and sentence_transformers are only needed for embedding
+            from inference_backends import load_sentence_encoder
+
+            logger.info(f"Loading embedding model: {self.embedding_model_name} ({self.embedding_backend})")
+            self.embedding_model, self.embedding_backend = load_sentence_encoder(
+                self.embedding_model_name, self.embedding_backend, self.onnx_export_dir
+            )
             logger.info("✅ Embedding model loaded successfully")
             return True
         except Exception as e:
             logger.error(f"❌ Failed to load embedding model: {e}")
             return False
 
+    def use_model_tokenizer(self) -> None:
+        """Chunk with the embedding model's tokenizer, sized to its max sequence length by default."""
+        self.chunk_tokenizer = self.embedding_model.tokenizer
+        window = chunk_window(self.chunk_tokenizer, self.embedding_model.max_seq_length)
+        if self.chunk_tokens <= 0 or self.chunk_tokens > window:
+            self.chunk_tokens = window
+        logger.info(f"Chunking by tokens: {self.chunk_tokens} per chunk, {self.chunk_overlap_tokens} overlap")
+
     def get_pdf_files_from_folder(self, folder_id: str) -> List[Dict[str, str]]:
-        """Get all PDF files from a Google Drive folder."""
+        """Get all PDF files from a Google Drive folder, following every result page."""
         try:
             query = f"'{folder_id}' in parents and mimeType='application/pdf' and trashed=false"
-            results = self.service.files().list(
-                q=query,
-                fields="files(id, name, size, modifiedTime)"
-            ).execute()
+            files = []
+            page_token = None
+
+            while True:
+                results = self.service.files().list(
+                    q=query,
+                    pageSize=1000,
+                    pageToken=page_token,
+                    fields="nextPageToken, files(id, name, size, modifiedTime)"
+                ).execute()
+
+                files.extend(results.get('files', []))
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    break
 
-            files = results.get('files', [])
             logger.info(f"Found {len(files)} PDF files in folder")
 
             return files
@@ -135,92 +270,253 @@ class DocumentIngester:
             logger.error(f"❌ Failed to get files from folder: {e}")
             return []
 
-    def download_pdf(self, file_id: str, file_name: str) -> Optional[bytes]:
-        """Download a PDF file from Google Drive."""
-        try:
-            request = self.service.files().get_media(fileId=file_id)
-            file_io = io.BytesIO()
-            downloader = MediaIoBaseDownload(file_io, request)
-
-            done = False
-            while done is False:
-                status, done = downloader.next_chunk()
-                if status:
-                    logger.info(f"Download progress: {int(status.progress() * 100)}% - {file_name}")
-
-            file_io.seek(0)
-            return file_io.read()
-
-        except Exception as e:
-            logger.error(f"❌ Failed to download {file_name}: {e}")
+    def get_thread_service(self) -> Any:
+        """Get a Drive service for the current thread (httplib2 connections are not thread-safe)."""
+        service = getattr(self._thread_local, 'service', None)
+        if service is None:
+            if self.service_factory is not None:
+                service = self.service_factory()
+            elif self.credentials is not None:
+                from googleapiclient.discovery import build
+                service = build('drive', 'v3', credentials=self.credentials)
+            else:
+                service = self.service
+            self._thread_local.service = service
+        return service
+
+    def is_retryable_error(self, error: Exception) -> bool:
+        """Check whether a download error is worth retrying (rate limits, server and network errors)."""
+        from googleapiclient.errors import HttpError
+        if isinstance(error, HttpError):
+            status = getattr(error, 'status_code', None) or getattr(getattr(error, 'resp', None), 'status', None)
+            return int(status or 0) in (403, 429, 500, 502, 503, 504)
+        return isinstance(error, (OSError, TimeoutError))
+
+    def download_cache_path(self, file_info: Dict[str, str]) -> Optional[str]:
+        """Download cache file of this version of a Drive file (None when not cacheable)."""
+        if not self.download_cache_dir or not file_info.get('modifiedTime'):
             return None
+        version = re.sub(r'[^0-9A-Za-z]', '', file_info['modifiedTime'])
+        return os.path.join(self.download_cache_dir, f"{file_info['id']}_{version}.pdf")
+
+    def prune_download_cache(self, pdf_files: List[Dict[str, str]]) -> None:
+        """Delete cached PDFs of files that were changed, deleted or only partially downloaded."""
+        if not self.download_cache_dir or not os.path.isdir(self.download_cache_dir):
+            return
+        current = {os.path.basename(path) for path in map(self.download_cache_path, pdf_files) if path}
+        removed = 0
+        for name in os.listdir(self.download_cache_dir):
+            if name not in current:
+                try:
+                    os.remove(os.path.join(self.download_cache_dir, name))
+                    removed += 1
+                except OSError as e:
+                    logger.warning(f"⚠️ Could not remove stale cached PDF {name}: {e}")
+        if removed:
+            logger.info(f"Removed {removed} stale PDFs from the download cache")
+
+    def download_pdf(self, file_id: str, file_name: str, path: Optional[str] = None) -> Optional[Union[bytes, str]]:
+        """
+        Download a PDF file from Google Drive, retrying transient errors with backoff.
 
-    def extract_text_from_pdf(self, pdf_bytes: bytes, file_name: str) -> str:
-        """Extract text from PDF bytes."""
-        try:
-            doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-            text = ""
-
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                text += page.get_text()
-
-            doc.close()
+        Args:
+            file_id: Drive file ID
+            file_name: Name used in log messages
+            path: File to stream the download into, in download_chunk_mb ranged
+                requests (None downloads into memory)
 
-            # Clean the text
-            text = self.clean_text(text)
-            logger.info(f"Extracted {len(text)} characters from {file_name}")
+        Returns:
+            The PDF bytes, or path once the file is complete; None on failure
+        """
+        from googleapiclient.http import MediaIoBaseDownload
+
+        part_path = f"{path}.part" if path else None
+        for attempt in range(1, self.download_retries + 1):
+            start = time.perf_counter()
+            try:
+                request = self.get_thread_service().files().get_media(fileId=file_id)
+
+                def receive(file_io: Any, **options: Any) -> None:
+                    downloader = MediaIoBaseDownload(file_io, request, **options)
+                    done = False
+                    while done is False:
+                        status, done = downloader.next_chunk()
+                        if status:
+                            logger.info(f"Download progress: {int(status.progress() * 100)}% - {file_name}")
+
+                if path:
+                    # Only one ranged chunk is in memory at a time
+                    with open(part_path, 'wb') as file_io:
+                        receive(file_io, chunksize=self.download_chunk_mb * 1024 * 1024)
+                    os.replace(part_path, path)
+                    self.stats.add_time('download', time.perf_counter() - start)
+                    return path
+
+                file_io = io.BytesIO()
+                receive(file_io)
+                file_io.seek(0)
+                self.stats.add_time('download', time.perf_counter() - start)
+                return file_io.read()
+
+            except Exception as e:
+                self.stats.add_time('download', time.perf_counter() - start)
+                self.stats.inc('download_errors')
+                if attempt == self.download_retries or not self.is_retryable_error(e):
+                    logger.error(f"❌ Failed to download {file_name}: {e}")
+                    if part_path and os.path.exists(part_path):
+                        os.remove(part_path)
+                    return None
+
+                # Exponential backoff with jitter, capped at 32 seconds
+                delay = min(2 ** (attempt - 1), 32) + random.uniform(0, 1)
+                logger.warning(f"⚠️ Download of {file_name} failed (attempt {attempt}), retrying in {delay:.1f}s: {e}")
+                time.sleep(delay)
+
+        return None
+
+    def download_pdfs(self, pdf_files: List[Dict[str, str]],
+                      spool_dir: Optional[str] = None) -> Iterator[Tuple[Dict[str, str], Optional[Union[bytes, str]]]]:
+        """
+        Download PDFs on a bounded thread pool.
 
-            return text
+        Yields (file_info, pdf) pairs in completion order, where pdf is the path of
+        the downloaded file (download cache or spool_dir) or its bytes when neither
+        is used. Files already in the download cache are yielded without
+        downloading. At most twice download_workers files are in flight or waiting
+        to be consumed.
+        """
+        start_time = time.time()
+        total_bytes = 0
+        downloaded = 0
 
+        cached = []
+        to_download = []
+        for file_info in pdf_files:
+            path = self.download_cache_path(file_info)
+            if path and os.path.exists(path):
+                cached.append((file_info, path))
+            else:
+                to_download.append(file_info)
+        if cached:
+            logger.info(f"📦 {len(cached)} PDFs found in the download cache")
+            self.stats.inc('files_cached', len(cached))
+        if self.download_cache_dir and to_download:
+            os.makedirs(self.download_cache_dir, exist_ok=True)
+
+        def target(file_info: Dict[str, str]) -> Optional[str]:
+            path = self.download_cache_path(file_info)
+            if path is None and spool_dir:
+                path = os.path.join(spool_dir, f"{file_info['id']}.pdf")
+            return path
+
+        with ThreadPoolExecutor(max_workers=self.download_workers, thread_name_prefix='drive-download') as executor:
+            pending = {}
+            remaining = iter(to_download)
+
+            def submit_next() -> bool:
+                file_info = next(remaining, None)
+                if file_info is None:
+                    return False
+                future = executor.submit(self.download_pdf, file_info['id'], file_info['name'], target(file_info))
+                pending[future] = file_info
+                return True
+
+            for _ in range(self.download_workers * 2):
+                if not submit_next():
+                    break
+
+            # Cached files are processed while the first downloads run
+            yield from cached
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_info = pending.pop(future)
+                    pdf = future.result()
+                    if pdf:
+                        size = os.path.getsize(pdf) if isinstance(pdf, str) else len(pdf)
+                        downloaded += 1
+                        total_bytes += size
+                        self.stats.inc('files_downloaded')
+                        self.stats.inc('bytes_downloaded', size)
+                    else:
+                        self.stats.inc('files_failed')
+                    submit_next()
+                    yield file_info, pdf
+
+        elapsed = max(time.time() - start_time, 1e-9)
+        logger.info(f"📥 Downloaded {downloaded}/{len(to_download)} files, {total_bytes / 1024 / 1024:.1f} MB "
+                    f"in {elapsed:.1f}s ({total_bytes / 1024 / 1024 / elapsed:.2f} MB/s, "
+                    f"{downloaded / elapsed:.2f} files/s, {self.download_workers} workers)")
+
+    def chunking_settings(self) -> Dict[str, Any]:
+        """
+        Chunking parameters that change which texts get embedded. Word mode keeps
+        its original keys so existing manifests and embedding caches stay valid.
+        """
+        if self.chunk_mode == 'tokens':
+            return {
+                'chunk_mode': 'tokens',
+                'chunk_tokens': self.chunk_tokens,
+                'chunk_overlap_tokens': self.chunk_overlap_tokens
+            }
+        return {'chunk_size': self.chunk_size, 'chunk_overlap': self.chunk_overlap}
+
+    def open_embedding_cache(self) -> None:
+        """Open the on-disk embedding cache for this model and chunking configuration."""
+        if not self.embedding_cache_dir or self.embedding_cache is not None:
+            return
+        try:
+            namespace = json.dumps({
+                'embedding_model': self.embedding_model_name,
+                'embedding_backend': self.embedding_backend,
+                **self.chunking_settings()
+            }, sort_keys=True)
+            self.embedding_cache = EmbeddingCache(self.embedding_cache_dir, namespace,
+                                                  dtype=self.embedding_cache_dtype,
+                                                  max_mb=self.embedding_cache_max_mb)
+            logger.info(f"Opened embedding cache with {self.embedding_cache.count} vectors")
         except Exception as e:
-            logger.error(f"❌ Failed to extract text from {file_name}: {e}")
-            return ""
-
-    def clean_text(self, text: str) -> str:
-        """Clean and normalize extracted text."""
-        # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text)
-
-        # Remove special characters but keep basic punctuation
-        text = re.sub(r'[^\w\s.,!?;:()-]', '', text)
-
-        # Remove very short lines (likely artifacts)
-        lines = text.split('\n')
-        lines = [line.strip() for line in lines if len(line.strip()) > 10]
-
-        return '\n'.join(lines)
-
-    def chunk_text(self, text: str, source: str) -> List[Dict[str, Any]]:
-        """Split text into overlapping chunks."""
-        words = text.split()
-        chunks = []
-
-        for i in range(0, len(words), self.chunk_size - self.chunk_overlap):
-            chunk_words = words[i:i + self.chunk_size]
-            chunk_text = ' '.join(chunk_words)
-
-            if len(chunk_text.strip()) > 50:  # Skip very short chunks
-                chunks.append({
-                    'text': chunk_text,
-                    'source': source,
-                    'chunk_id': len(chunks),
-                    'word_count': len(chunk_words),
-                    'start_word': i,
-                    'end_word': min(i + self.chunk_size, len(words))
-                })
+            logger.warning(f"⚠️ Embedding cache unavailable, encoding every chunk: {e}")
 
-        return chunks
+    def close_embedding_cache(self) -> None:
+        """Persist new cache entries and report the hit rate."""
+        if self.embedding_cache is None:
+            return
+        try:
+            cache = self.embedding_cache
+            cache.save()
+            logger.info(f"💾 Embedding cache: {cache.hits} hits, {cache.misses} misses "
+                        f"({cache.hit_rate:.1%} hit rate), {cache.count} vectors stored")
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to save embedding cache: {e}")
+        self.embedding_cache = None
 
     def create_embeddings(self, texts: List[str]) -> np.ndarray:
-        """Create embeddings for text chunks."""
+        """Create embeddings for text chunks, encoding only those not in the embedding cache."""
         try:
-            logger.info(f"Creating embeddings for {len(texts)} text chunks...")
-            embeddings = self.embedding_model.encode(
-                texts,
-                show_progress_bar=True,
-                batch_size=32
-            )
+            cached, missing = [None] * len(texts), list(range(len(texts)))
+            if self.embedding_cache is not None:
+                cached, missing = self.embedding_cache.get_many(texts)
+
+            logger.info(f"Creating embeddings for {len(missing)} of {len(texts)} text chunks...")
+            self.stats.inc('chunks_embedded', len(texts))
+            self.stats.inc('embeddings_cached', len(texts) - len(missing))
+            self.stats.inc('embeddings_encoded', len(missing))
+            if missing:
+                missing_texts = [texts[i] for i in missing]
+                with self.stats.stage('embed'):
+                    encoded = self.embedding_model.encode(
+                        missing_texts,
+                        show_progress_bar=True,
+                        batch_size=32
+                    )
+                if self.embedding_cache is not None:
+                    self.embedding_cache.put_many(missing_texts, encoded)
+                for i, vector in zip(missing, encoded):
+                    cached[i] = vector
+
+            embeddings = np.vstack(cached).astype('float32') if texts else np.array([])
             logger.info(f"✅ Created embeddings with shape: {embeddings.shape}")
             return embeddings
 
@@ -228,101 +524,504 @@ class DocumentIngester:
             logger.error(f"❌ Failed to create embeddings: {e}")
             return np.array([])
 
-    def build_faiss_index(self, embeddings: np.ndarray) -> faiss.Index:
-        """Build FAISS index from embeddings."""
-        try:
-            dimension = embeddings.shape[1]
+    def add_vectors(self, index: 'faiss.Index', embeddings: np.ndarray, ids: np.ndarray) -> None:
+        """Normalize and add embeddings (e.g. a memory map) to an ID-mapped index one batch at a time."""
+        import faiss
 
-            # Use IndexFlatIP for cosine similarity
-            index = faiss.IndexFlatIP(dimension)
+        ids = np.asarray(ids, dtype='int64')
+        for start in range(0, len(ids), self.INDEX_ADD_BATCH):
+            # A copy: the caller's array (or the file behind it) is never normalized in place
+            batch = np.array(embeddings[start:start + self.INDEX_ADD_BATCH], dtype='float32')
+            faiss.normalize_L2(batch)
+            index.add_with_ids(batch, ids[start:start + self.INDEX_ADD_BATCH])
 
-            # Normalize embeddings for cosine similarity
-            faiss.normalize_L2(embeddings)
+    def build_faiss_index(self, embeddings: np.ndarray, ids: Optional[np.ndarray] = None) -> 'faiss.Index':
+        """
+        Build FAISS index from embeddings, keyed by chunk vector IDs.
 
-            # Add embeddings to index
-            index.add(embeddings.astype('float32'))
+        Embeddings are read in batches, so they may be a memory map of vectors
+        spooled to disk; only the IVF training sample is loaded as a whole.
+        """
+        import faiss
 
-            logger.info(f"✅ Built FAISS index with {index.ntotal} vectors")
+        try:
+            num_vectors, dimension = embeddings.shape
+
+            index_type = self.index_type
+            nlist = self.nlist or int(4 * np.sqrt(num_vectors))
+            # IVF training wants ~39 points per cluster; PQ needs 2^bits points per codebook
+            nlist = max(1, min(nlist, num_vectors // 39))
+            if index_type == 'ivf_pq' and (dimension % self.pq_m or num_vectors < 2 ** self.pq_bits):
+                logger.warning(f"⚠️ IVF-PQ not usable for {num_vectors} x {dimension} vectors "
+                               f"(pq_m={self.pq_m}, pq_bits={self.pq_bits}) - using ivf_flat")
+                index_type = 'ivf_flat'
+            if index_type in ('ivf_flat', 'ivf_pq') and num_vectors < 39:
+                logger.warning(f"⚠️ Too few vectors ({num_vectors}) to train an IVF index - using flat")
+                index_type = 'flat'
+
+            if index_type == 'hnsw':
+                index = faiss.IndexHNSWFlat(dimension, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+                index.hnsw.efConstruction = self.ef_construction
+                index.hnsw.efSearch = self.ef_search
+            elif index_type == 'ivf_flat':
+                quantizer = faiss.IndexFlatIP(dimension)
+                index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+            elif index_type == 'ivf_pq':
+                quantizer = faiss.IndexFlatIP(dimension)
+                index = faiss.IndexIVFPQ(quantizer, dimension, nlist, self.pq_m, self.pq_bits,
+                                         faiss.METRIC_INNER_PRODUCT)
+            else:
+                # Use IndexFlatIP for exact cosine similarity
+                index = faiss.IndexFlatIP(dimension)
+
+            if not index.is_trained:
+                # FAISS's k-means uses at most 256 points per centroid, so a larger corpus
+                # is sampled here instead of being loaded (and normalized) whole
+                sample_size = min(num_vectors, 256 * max(nlist, 2 ** self.pq_bits))
+                rows = np.arange(num_vectors)
+                if sample_size < num_vectors:
+                    rows = np.sort(np.random.default_rng(1234).choice(num_vectors, sample_size, replace=False))
+                sample = np.array(embeddings[rows], dtype='float32')
+                faiss.normalize_L2(sample)
+                logger.info(f"Training {index_type} index with nlist={nlist} on {sample_size} of {num_vectors} vectors...")
+                index.train(sample)
+                del sample
+            if index_type in ('ivf_flat', 'ivf_pq'):
+                index.nprobe = min(self.nprobe, nlist)
+
+            # Wrap in an ID map so chunks can later be removed or added per file
+            if ids is None:
+                ids = np.arange(num_vectors)
+            index = faiss.IndexIDMap2(index)
+            self.add_vectors(index, embeddings, ids)
+
+            # Record the parameters app.py needs to search this index the same way
+            self.index_config = {
+                'index_type': index_type,
+                'metric': 'inner_product',
+                'dimension': dimension,
+                'ntotal': int(index.ntotal),
+                'embedding_model': self.embedding_model_name
+            }
+            if index_type == 'hnsw':
+                self.index_config.update({
+                    'hnsw_m': self.hnsw_m,
+                    'ef_construction': self.ef_construction,
+                    'ef_search': self.ef_search
+                })
+            elif index_type in ('ivf_flat', 'ivf_pq'):
+                self.index_config.update({'nlist': nlist, 'nprobe': min(self.nprobe, nlist)})
+                if index_type == 'ivf_pq':
+                    self.index_config.update({'pq_m': self.pq_m, 'pq_bits': self.pq_bits})
+
+            logger.info(f"✅ Built {index_type} FAISS index with {index.ntotal} vectors")
             return index
 
         except Exception as e:
             logger.error(f"❌ Failed to build FAISS index: {e}")
             return None
 
-    def save_index_and_documents(self, index: faiss.Index, documents: List[Dict]) -> bool:
-        """Save FAISS index and document metadata."""
+    def update_faiss_index(self, index: 'faiss.Index', remove_ids: List[int],
+                           embeddings: np.ndarray, ids: List[int]) -> 'faiss.Index':
+        """Remove the vectors of changed/deleted files and add new ones to an existing index."""
+        import faiss
+
         try:
-            # Save FAISS index
-            faiss.write_index(index, 'document.index')
-            logger.info("✅ Saved FAISS index to document.index")
+            if remove_ids:
+                try:
+                    index.remove_ids(np.asarray(remove_ids, dtype='int64'))
+                except RuntimeError:
+                    # HNSW graphs cannot delete nodes; rebuild from the vectors we keep
+                    logger.info(f"Rebuilding {self.index_config.get('index_type')} index to remove vectors")
+                    all_ids = faiss.vector_to_array(index.id_map)
+                    keep = ~np.isin(all_ids, remove_ids)
+                    vectors = index.index.reconstruct_n(0, index.index.ntotal)[keep]
+                    index = self.build_faiss_index(vectors, all_ids[keep])
+                    if index is None:
+                        return None
+                logger.info(f"Removed {len(remove_ids)} vectors from changed or deleted files")
+
+            if len(ids):
+                self.add_vectors(index, embeddings, ids)
+                logger.info(f"Added {len(ids)} new vectors")
+
+            self.index_config['ntotal'] = int(index.ntotal)
+            return index
+
+        except Exception as e:
+            logger.error(f"❌ Failed to update FAISS index: {e}")
+            return None
+
+    def ingestion_settings(self) -> Dict[str, Any]:
+        """Settings that invalidate every stored vector when they change."""
+        return {
+            'embedding_model': self.embedding_model_name,
+            # torch, int8 and onnx embeddings differ slightly; never mix them in one index
+            'embedding_backend': self.embedding_backend,
+            **self.chunking_settings(),
+            # Bumped when extraction or cleaning changes the chunk texts or metadata
+            'text_extraction': self.TEXT_EXTRACTION_VERSION,
+            'index_type': self.index_type
+        }
+
+    def load_previous_state(self) -> Optional[Dict[str, Any]]:
+        """Load the manifest, index and chunks of the last run if they can be updated in place."""
+        try:
+            if not os.path.exists('ingest_manifest.json'):
+                return None
+
+            with open('ingest_manifest.json', 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('settings') != self.ingestion_settings():
+                logger.info("Ingestion settings changed since the last run - rebuilding everything")
+                return None
+
+            if not os.path.exists('document.index') or not ChunkStore.exists('chunk_store'):
+                return None
+            import faiss
+            index = faiss.read_index('document.index')
+            store = ChunkStore('chunk_store')
+            if not isinstance(index, faiss.IndexIDMap2) or 'vector_id' not in store.columns:
+                logger.info("Previous index is not ID-mapped - rebuilding everything")
+                return None
 
-            # Save document metadata
-            with open('documents.json', 'w', encoding='utf-8') as f:
-                json.dump(documents, f, indent=2, ensure_ascii=False)
-            logger.info(f"✅ Saved {len(documents)} document chunks to documents.json")
+            with open('index_config.json', 'r', encoding='utf-8') as f:
+                self.index_config = json.load(f)
 
+            return {'manifest': manifest, 'index': index, 'store': store}
+
+        except Exception as e:
+            logger.warning(f"⚠️ Could not load previous ingestion state, rebuilding everything: {e}")
+            return None
+
+    def save_manifest(self, files: Dict[str, Dict[str, Any]], next_id: int) -> bool:
+        """Save the per-file ingestion manifest used by incremental runs."""
+        try:
+            with open('ingest_manifest.json', 'w', encoding='utf-8') as f:
+                json.dump({
+                    'settings': self.ingestion_settings(),
+                    'next_id': next_id,
+                    'files': files
+                }, f, indent=2, ensure_ascii=False)
+            logger.info(f"✅ Saved ingestion manifest for {len(files)} files to ingest_manifest.json")
             return True
 
         except Exception as e:
-            logger.error(f"❌ Failed to save index and documents: {e}")
+            logger.error(f"❌ Failed to save ingestion manifest: {e}")
             return False
 
-    def process_folder(self, folder_id: str) -> bool:
-        """Process all PDFs in a Google Drive folder."""
-        logger.info(f"Starting document ingestion from folder: {folder_id}")
+    def save_index_and_documents(self, index: 'faiss.Index', documents: Iterable[Dict]) -> bool:
+        """Save FAISS index and document metadata (documents may be a generator, read once)."""
+        import faiss
 
-        # Get PDF files
-        pdf_files = self.get_pdf_files_from_folder(folder_id)
-        if not pdf_files:
-            logger.error("No PDF files found in folder")
-            return False
+        try:
+            # Save FAISS index
+            # Write to a temporary file first so a running app never reads a partial index
+            faiss.write_index(index, 'document.index.tmp')
+            os.replace('document.index.tmp', 'document.index')
+            logger.info("✅ Saved FAISS index to document.index")
 
-        all_chunks = []
+            # Save index build and search parameters next to the index
+            with open('index_config.json.tmp', 'w', encoding='utf-8') as f:
+                json.dump(self.index_config, f, indent=2)
+            os.replace('index_config.json.tmp', 'index_config.json')
+            logger.info(f"✅ Saved index parameters to index_config.json ({self.index_config.get('index_type')})")
+
+            # Save document chunks to the columnar chunk store
+            count = write_chunk_store('chunk_store', documents)
+            logger.info(f"✅ Saved {count} document chunks to chunk_store/")
+
+            # Build the BM25 inverted index over the same rows
+            if self.build_bm25:
+                store = ChunkStore('chunk_store')
+                try:
+                    write_bm25_index('bm25_index', (store.text(row) for row in range(len(store))),
+                                     source={'store_id': store.store_id})
+                finally:
+                    store.close()
+                logger.info("✅ Saved BM25 index to bm25_index/")
 
-        # Process each PDF
-        for file_info in pdf_files:
-            file_id = file_info['id']
-            file_name = file_info['name']
+            return True
 
-            logger.info(f"Processing: {file_name}")
+        except Exception as e:
+            logger.error(f"❌ Failed to save index and documents: {e}")
+            return False
 
-            # Download PDF
-            pdf_bytes = self.download_pdf(file_id, file_name)
-            if not pdf_bytes:
-                continue
+    def run_pipeline(self, pdf_files: List[Dict[str, str]], first_id: int,
+                     work_dir: str) -> Tuple[List[Tuple[Dict[str, str], List[int]]], Optional[np.ndarray]]:
+        """
+        Download, extract, chunk and embed PDFs as an overlapping producer/consumer pipeline.
 
-            # Extract text
-            text = self.extract_text_from_pdf(pdf_bytes, file_name)
-            if not text:
-                continue
+        Downloads run on the download thread pool, extraction and chunking on a
+        process pool, and an embedding thread encodes chunks in fixed-size batches
+        from a bounded queue while later files are still being extracted. With
+        downloads on disk, worker processes receive file paths rather than PDF bytes.
 
-            # Create chunks
-            chunks = self.chunk_text(text, file_name)
-            all_chunks.extend(chunks)
+        Nothing grows with the corpus in memory: each file's chunks are spooled to
+        disk as its pages are chunked, then numbered and queued for embedding, and
+        the chunks and their embeddings are appended to work_dir/chunks.jsonl and
+        work_dir/embeddings.f32 in vector ID order.
 
-            logger.info(f"Created {len(chunks)} chunks from {file_name}")
+        Args:
+            pdf_files: Drive file infos to process
+            first_id: Vector ID assigned to the first new chunk
+            work_dir: Directory for the spool files
+
+        Returns:
+            (file_info, vector_ids) pairs for every file that was extracted (no IDs
+            for a scanned or empty PDF), and a read-only memory map of the spooled
+            embeddings of all those chunks in the same order (None on failure)
+        """
+        processed = []
+        next_id = first_id
+        chunk_queue = queue.Queue(maxsize=self.pipeline_queue_size)
+        embed_errors = []
+        shape = [0, 0]  # Rows and dimension of the spooled embeddings
+        chunks_path = os.path.join(work_dir, 'chunks.jsonl')
+        vectors_path = os.path.join(work_dir, 'embeddings.f32')
+
+        def embed_worker() -> None:
+            batch = []
+            with open(vectors_path, 'wb') as vectors_file:
+                while True:
+                    text = chunk_queue.get()
+                    if text is not None:
+                        batch.append(text)
+                    if batch and (text is None or len(batch) >= self.embed_batch_size):
+                        if not embed_errors:
+                            embeddings = self.create_embeddings(batch)
+                            if embeddings.size == 0:
+                                embed_errors.append(len(batch))
+                            else:
+                                vectors_file.write(embeddings.tobytes())
+                                shape[0] += embeddings.shape[0]
+                                shape[1] = embeddings.shape[1]
+                        batch = []
+                    if text is None:
+                        return
+
+        def collect(file_info: Dict[str, str], spool_path: str, count: Optional[int], seconds: float) -> None:
+            nonlocal next_id
+            self.stats.add_time('extract', seconds)
+            try:
+                if count is None:
+                    # Extraction failed: left out of the manifest, so the next run tries again
+                    return
+                self.stats.inc('files_extracted')
+                if not count:
+                    # Scanned or empty PDF: still recorded, so it is not downloaded again until it changes
+                    self.stats.inc('files_without_text')
+                self.stats.inc('chunks_created', count)
+                first = next_id
+                for chunk in read_spooled_chunks(spool_path):
+                    chunk['file_id'] = file_info['id']
+                    chunk['vector_id'] = next_id
+                    next_id += 1
+                    chunks_file.write(json.dumps(chunk, ensure_ascii=False) + '\n')
+                    # Blocks when the embedder falls behind, which in turn pauses extraction
+                    chunk_queue.put(chunk['text'])
+                processed.append((file_info, list(range(first, next_id))))
+            finally:
+                if os.path.exists(spool_path):
+                    os.remove(spool_path)
+
+        # Spool next to the index rather than in /tmp, which is often RAM-backed (tmpfs)
+        spool_dir = tempfile.mkdtemp(prefix='.pdf-spool-', dir=os.getcwd()) if self.spool_downloads else None
+
+        def release(pdf: Union[bytes, str]) -> None:
+            # Spooled PDFs are deleted once extracted; cached ones are kept for later runs
+            if spool_dir and isinstance(pdf, str) and os.path.dirname(pdf) == spool_dir:
+                os.remove(pdf)
+
+        self.open_embedding_cache()
+        chunks_file = open(chunks_path, 'w', encoding='utf-8')
+        embed_thread = threading.Thread(target=embed_worker, name='embed-worker', daemon=True)
+        embed_thread.start()
+        tokenizer_dir = None
 
-        if not all_chunks:
-            logger.error("No text chunks created from any documents")
-            return False
+        try:
+            downloads = enumerate(self.download_pdfs(pdf_files, spool_dir))
+            if self.extract_workers == 0:
+                for number, (file_info, pdf) in downloads:
+                    if pdf:
+                        spool_path = os.path.join(work_dir, f"file-{number}.jsonl")
+                        collect(file_info, spool_path, *timed_process_pdf(self, file_info, pdf, spool_path))
+                        release(pdf)
+            else:
+                if self.chunk_mode == 'tokens':
+                    # Workers load the tokenizer from disk once instead of receiving it with every file
+                    tokenizer_dir = tempfile.mkdtemp(prefix='chunk-tokenizer-')
+                    self.chunk_tokenizer.save_pretrained(tokenizer_dir)
+                chunking = {**self.chunker_options(), 'tokenizer_path': tokenizer_dir}
+
+                # spawn: the parent already runs download and embedding threads. Workers
+                # import only pdf_processing and log like this process
+                context = multiprocessing.get_context('spawn')
+                root = logging.getLogger()
+                log_file = next((handler.baseFilename for handler in root.handlers
+                                 if isinstance(handler, logging.FileHandler)), None)
+                with ProcessPoolExecutor(max_workers=self.extract_workers, mp_context=context,
+                                         initializer=configure_logging,
+                                         initargs=(root.getEffectiveLevel(), log_file)) as executor:
+                    pending = {}
+
+                    def harvest(block: bool) -> None:
+                        done, _ = wait(pending, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            file_info, pdf, spool_path = pending.pop(future)
+                            try:
+                                result = future.result()
+                            except Exception as e:
+                                logger.error(f"❌ Failed to process {file_info['name']}: {e}")
+                                result = (None, 0.0)
+                            collect(file_info, spool_path, *result)
+                            release(pdf)
+
+                    for number, (file_info, pdf) in downloads:
+                        if pdf:
+                            # Workers write chunks to the spool file; only the count comes back
+                            spool_path = os.path.join(work_dir, f"file-{number}.jsonl")
+                            future = executor.submit(extract_and_chunk, file_info, pdf, chunking, spool_path)
+                            pending[future] = (file_info, pdf, spool_path)
+                        # Bound the PDFs held in memory or spooled while waiting for a free process
+                        while len(pending) >= self.extract_workers * 2:
+                            harvest(block=True)
+                        if pending:
+                            harvest(block=False)
+
+                    while pending:
+                        harvest(block=True)
+        finally:
+            chunk_queue.put(None)
+            embed_thread.join()
+            chunks_file.close()
+            self.close_embedding_cache()
+            if tokenizer_dir:
+                shutil.rmtree(tokenizer_dir, ignore_errors=True)
+            if spool_dir:
+                shutil.rmtree(spool_dir, ignore_errors=True)
+
+        if embed_errors:
+            return processed, None
+        rows, dimension = shape
+        if not rows:
+            return processed, np.zeros((0, 0), dtype='float32')
+        return processed, np.memmap(vectors_path, dtype='float32', mode='r', shape=(rows, dimension))
 
-        logger.info(f"Total chunks created: {len(all_chunks)}")
+    def process_folder(self, folder_id: str) -> bool:
+        """Process the PDFs in a Google Drive folder that were added or changed since the last run."""
+        self.stats = IngestStats()
+        success = self.update_from_folder(folder_id)
+        self.save_stats(success)
+        return success
 
-        # Create embeddings
-        chunk_texts = [chunk['text'] for chunk in all_chunks]
-        embeddings = self.create_embeddings(chunk_texts)
+    def save_stats(self, success: bool) -> None:
+        """Log this run's throughput and save its statistics for the app's /metrics."""
+        snapshot = self.stats.snapshot(success)
+        if self.stats_path:
+            try:
+                snapshot = self.stats.save(self.stats_path, success)
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to save ingestion stats: {e}")
+        logger.info(f"📊 Ingestion stats: {snapshot['counters']}, stage seconds {snapshot['stage_seconds']}, "
+                    f"throughput {snapshot['throughput']}")
+
+    def update_from_folder(self, folder_id: str) -> bool:
+        """Bring the index up to date with a Drive folder (one ingestion run)."""
+        logger.info(f"Starting document ingestion from folder: {folder_id}")
 
-        if embeddings.size == 0:
-            logger.error("Failed to create embeddings")
-            return False
+        # Token chunk sizes come from the embedding model, and are part of the ingestion settings
+        if self.chunk_mode == 'tokens' and self.chunk_tokenizer is None:
+            self.use_model_tokenizer()
 
-        # Build FAISS index
-        index = self.build_faiss_index(embeddings)
-        if index is None:
+        # Get PDF files
+        pdf_files = self.get_pdf_files_from_folder(folder_id)
+        if not pdf_files:
+            logger.error("No PDF files found in folder")
             return False
+        self.prune_download_cache(pdf_files)
+
+        previous = self.load_previous_state() if self.incremental else None
+        known_files = previous['manifest']['files'] if previous else {}
+        next_id = previous['manifest']['next_id'] if previous else 0
+
+        # Compare Drive's listing with the manifest of the last run
+        current_ids = {file_info['id'] for file_info in pdf_files}
+        deleted = [file_id for file_id in known_files if file_id not in current_ids]
+        to_process = [
+            file_info for file_info in pdf_files
+            if known_files.get(file_info['id'], {}).get('modifiedTime') != file_info.get('modifiedTime')
+        ]
+        logger.info(f"{len(to_process)} new or changed files, {len(deleted)} deleted, "
+                    f"{len(pdf_files) - len(to_process)} unchanged")
+
+        if previous and not to_process and not deleted:
+            logger.info("✅ Index is already up to date")
+            return True
 
-        # Save everything
-        return self.save_index_and_documents(index, all_chunks)
+        files = {file_id: entry for file_id, entry in known_files.items() if file_id in current_ids}
+        remove_ids = [vector_id for file_id in deleted for vector_id in known_files[file_id]['vector_ids']]
+        # Spool chunks and embeddings next to the index rather than in /tmp (often RAM-backed)
+        work_dir = tempfile.mkdtemp(prefix='.ingest-', dir=os.getcwd())
+        try:
+            # Download, extract and embed new or changed PDFs as one overlapping pipeline
+            processed, embeddings = self.run_pipeline(to_process, next_id, work_dir)
+            if embeddings is None:
+                logger.error("Failed to create embeddings")
+                return False
+
+            new_ids = []
+            for file_info, vector_ids in processed:
+                file_id = file_info['id']
+                if file_id in known_files:
+                    # Only drop the old vectors once the new version processed successfully,
+                    # even when it no longer yields any chunks
+                    remove_ids.extend(known_files[file_id]['vector_ids'])
+
+                if vector_ids:
+                    next_id = max(next_id, vector_ids[-1] + 1)
+                new_ids.extend(vector_ids)
+
+                files[file_id] = {
+                    'name': file_info['name'],
+                    'modifiedTime': file_info.get('modifiedTime'),
+                    'vector_ids': vector_ids
+                }
+
+            # Keep the chunks of unchanged files from the previous chunk store
+            kept_rows = np.zeros(0, dtype=np.int64)
+            if previous:
+                kept_rows = np.flatnonzero(~np.isin(previous['store'].column('vector_id'), remove_ids))
+
+            if not len(kept_rows) and not new_ids:
+                logger.error("No text chunks created from any documents")
+                return False
+
+            logger.info(f"Total chunks: {len(kept_rows) + len(new_ids)} "
+                        f"({len(new_ids)} new, {len(kept_rows)} unchanged)")
+
+            def all_chunks() -> Iterator[Dict[str, Any]]:
+                # Unchanged chunks first, then the new ones: rows stay sorted by vector ID
+                for row in kept_rows:
+                    yield previous['store'][int(row)]
+                yield from read_spooled_chunks(os.path.join(work_dir, 'chunks.jsonl'))
+
+            # Update the previous FAISS index in place, or build a new one
+            with self.stats.stage('index'):
+                if previous:
+                    index = self.update_faiss_index(previous['index'], remove_ids, embeddings, new_ids)
+                else:
+                    index = self.build_faiss_index(embeddings, np.asarray(new_ids))
+            if index is None:
+                return False
+
+            # Save everything, streaming the chunks into the new chunk store
+            with self.stats.stage('save'):
+                if not self.save_index_and_documents(index, all_chunks()):
+                    return False
+                return self.save_manifest(files, next_id)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
 
     def run(self) -> bool:
         """Run the complete ingestion process."""
@@ -349,8 +1048,13 @@ class DocumentIngester:
             logger.info("🎉 Document ingestion completed successfully!")
             logger.info("Files created:")
             logger.info("  - document.index (FAISS vector index)")
-            logger.info("  - documents.json (document chunks metadata)")
-            logger.info("\nYou can now run the Flask application with: python app.py")
+            logger.info("  - index_config.json (FAISS index parameters)")
+            logger.info("  - chunk_store/ (document chunks and metadata)")
+            logger.info("  - ingest_manifest.json (per-file state for incremental runs)")
+            logger.info("  - ingest_stats.json (throughput of this run, served at /metrics)")
+            logger.info("\nYou can now run the Flask application with: python app.py"
+                        + (f" and query it with \"collection\": \"{os.getenv('COLLECTION')}\""
+                           if os.getenv('COLLECTION') else ""))
         else:
             logger.error("❌ Document ingestion failed")
 
@@ -358,16 +1062,68 @@ class DocumentIngester:
 
 def main():
     """Main function to run document ingestion."""
+    configure_logging()
+
     # Load configuration from environment variables
     chunk_size = int(os.getenv('CHUNK_SIZE', 300))
     chunk_overlap = int(os.getenv('CHUNK_OVERLAP', 50))
+    chunk_mode = os.getenv('CHUNK_MODE', 'words')
     embedding_model = os.getenv('EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+    incremental = os.getenv('INCREMENTAL', 'true').lower() == 'true'
+    extract_workers = os.getenv('EXTRACT_WORKERS')
+    nlist = os.getenv('IVF_NLIST')
+    credentials_path = os.path.abspath('credentials.json')
+    token_path = os.path.abspath('token.json')
+    onnx_export_dir = os.path.abspath(os.getenv('ONNX_EXPORT_DIR', 'onnx_models'))
+
+    # Build a named collection for app.py in COLLECTIONS_DIR/<COLLECTION> instead of the working directory;
+    # relative cache and stats paths then resolve inside it
+    collection = os.getenv('COLLECTION')
+    if collection:
+        from collection_registry import collection_path
+        try:
+            path = collection_path(os.getenv('COLLECTIONS_DIR', 'collections'), collection)
+        except ValueError as e:
+            logger.error(f"❌ {e}")
+            return 1
+        os.makedirs(path, exist_ok=True)
+        os.chdir(path)
+        logger.info(f"Ingesting into collection '{collection}' ({path})")
 
     # Create ingester
     ingester = DocumentIngester(
+        credentials_path=credentials_path,
+        token_path=token_path,
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
-        embedding_model=embedding_model
+        chunk_mode=chunk_mode,
+        chunk_tokens=int(os.getenv('CHUNK_TOKENS', 0)),
+        chunk_overlap_tokens=int(os.getenv('CHUNK_OVERLAP_TOKENS', 32)),
+        embedding_model=embedding_model,
+        embedding_backend=os.getenv('EMBEDDING_BACKEND', 'torch').lower(),
+        onnx_export_dir=onnx_export_dir,
+        index_type=os.getenv('INDEX_TYPE', 'flat'),
+        nlist=int(nlist) if nlist else None,
+        nprobe=int(os.getenv('IVF_NPROBE', 8)),
+        hnsw_m=int(os.getenv('HNSW_M', 32)),
+        ef_construction=int(os.getenv('HNSW_EF_CONSTRUCTION', 40)),
+        ef_search=int(os.getenv('HNSW_EF_SEARCH', 64)),
+        pq_m=int(os.getenv('PQ_M', 16)),
+        pq_bits=int(os.getenv('PQ_BITS', 8)),
+        incremental=incremental,
+        download_workers=int(os.getenv('DOWNLOAD_WORKERS', 4)),
+        download_retries=int(os.getenv('DOWNLOAD_RETRIES', 5)),
+        download_cache_dir=os.getenv('DOWNLOAD_CACHE_DIR') or None,
+        spool_downloads=os.getenv('SPOOL_DOWNLOADS', 'true').lower() == 'true',
+        download_chunk_mb=int(os.getenv('DOWNLOAD_CHUNK_MB', 16)),
+        extract_workers=int(extract_workers) if extract_workers else None,
+        embed_batch_size=int(os.getenv('EMBED_BATCH_SIZE', 256)),
+        pipeline_queue_size=int(os.getenv('PIPELINE_QUEUE_SIZE', 2048)),
+        embedding_cache_dir=os.getenv('EMBEDDING_CACHE_DIR', 'embedding_cache') or None,
+        embedding_cache_dtype=os.getenv('EMBEDDING_CACHE_DTYPE', 'float16'),
+        embedding_cache_max_mb=int(os.getenv('EMBEDDING_CACHE_MAX_MB', 1024)),
+        build_bm25=os.getenv('BUILD_BM25', 'true').lower() == 'true',
+        stats_path=os.getenv('INGEST_STATS_PATH', 'ingest_stats.json') or None
     )
 
     # Run ingestion
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Educational Assistant - Memory Governor
+Tracks process RSS against a memory budget and decides when garbage collection
+runs and whether expensive LLM generations are admitted, queued or shed. Without
+a budget (MEMORY_BUDGET_MB unset) it only reports memory and never sheds.
+
+Pressure levels, as a fraction of the budget:
+    ok    - below gc_ratio: no collection, every generation admitted
+    high  - at or above gc_ratio: a full collection at most every gc_interval seconds
+    shed  - at or above shed_ratio: generations wait up to queue_timeout for memory
+            to drop, then are rejected with MemoryPressureError
+"""
+
+import gc
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+PRESSURE_LEVELS = ('ok', 'high', 'shed')
+CGROUP_LIMIT_FILES = ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes')
+
+
+class MemoryPressureError(RuntimeError):
+    """An LLM generation was shed because the process is over its memory budget."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def container_memory_limit() -> Optional[int]:
+    """Memory limit of the container (cgroup v2 or v1) in bytes, or None when unlimited."""
+    for path in CGROUP_LIMIT_FILES:
+        try:
+            with open(path, 'r') as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < 1 << 60:  # v1 reports "unlimited" as a huge number
+            return int(value)
+    return None
+
+
+class MemoryGovernor:
+    """Per-process memory budget enforcement for app.py."""
+
+    def __init__(self, budget_mb: float = 0, gc_ratio: float = 0.8, shed_ratio: float = 0.95,
+                 gc_interval: float = 10.0, queue_timeout: float = 10.0, poll_interval: float = 0.25):
+        """
+        Initialize the governor.
+
+        Args:
+            budget_mb: Resident memory budget of this process (0 disables the budget:
+                no collections or shedding, only statistics)
+            gc_ratio: Fraction of the budget above which collections run
+            shed_ratio: Fraction of the budget above which LLM generations are queued, then shed
+            gc_interval: Minimum seconds between collections
+            queue_timeout: Seconds a generation waits for memory before it is shed
+            poll_interval: Seconds between memory checks while a generation waits
+        """
+        # RSS counts pages shared with the gunicorn master and mapped index files, and a
+        # lazily loaded LLM alone can exceed a share of a small container, so no budget is
+        # guessed: an operator sets one that fits the deployment
+        self.budget_bytes = int(max(0.0, budget_mb) * 1024 * 1024)
+        self.gc_ratio = gc_ratio
+        self.shed_ratio = max(shed_ratio, gc_ratio)
+        self.gc_interval = gc_interval
+        self.queue_timeout = max(0.0, queue_timeout)
+        self.poll_interval = poll_interval
+
+        self.container_limit = container_memory_limit()
+        self.process = psutil.Process()
+        self.lock = threading.Lock()
+        self.last_collection = 0.0
+        self.decisions = deque(maxlen=20)
+        self.release_hooks: List[Callable[[], bool]] = []
+
+        # Statistics
+        self.collections = 0
+        self.collection_seconds = 0.0
+        self.freed_bytes = 0
+        self.llm_admitted = 0
+        self.llm_queued = 0
+        self.llm_shed = 0
+        self.frozen_objects = 0
+
+    def rss(self) -> int:
+        """Resident bytes of this process."""
+        return self.process.memory_info().rss
+
+    def pressure(self, rss: Optional[int] = None) -> str:
+        """Pressure level ('ok', 'high' or 'shed') at the given or current RSS."""
+        if not self.budget_bytes:
+            return 'ok'
+        ratio = (self.rss() if rss is None else rss) / self.budget_bytes
+        if ratio >= self.shed_ratio:
+            return 'shed'
+        if ratio >= self.gc_ratio:
+            return 'high'
+        return 'ok'
+
+    def record(self, action: str, rss: int, **details: Any) -> None:
+        """Keep a decision for /health."""
+        self.decisions.append(dict(time=datetime.now().isoformat(), action=action,
+                                   rss_mb=round(rss / 1024 / 1024, 1), **details))
+
+    def add_release_hook(self, hook: Callable[[], bool]) -> None:
+        """Register a callable that drops a cache (e.g. an idle collection) before each collection."""
+        self.release_hooks.append(hook)
+
+    def collect(self, rss: int, reason: str) -> int:
+        """
+        Run the release hooks and a full collection, unless they ran within gc_interval.
+
+        Returns:
+            RSS after the collection (or the given RSS if it was skipped)
+        """
+        with self.lock:
+            now = time.monotonic()
+            if now - self.last_collection < self.gc_interval:
+                return rss
+            self.last_collection = now
+
+            start = time.perf_counter()
+            for hook in self.release_hooks:
+                try:
+                    hook()
+                except Exception as e:
+                    logger.warning(f"⚠️ Memory release hook failed: {e}")
+            gc.collect()
+            seconds = time.perf_counter() - start
+            after = self.rss()
+            self.collections += 1
+            self.collection_seconds += seconds
+            self.freed_bytes += max(0, rss - after)
+            self.record('collect', after, reason=reason, freed_mb=round((rss - after) / 1024 / 1024, 1),
+                        seconds=round(seconds, 3))
+        logger.info(f"🧹 Garbage collection ({reason}): {rss / 1024 / 1024:.0f} -> {after / 1024 / 1024:.0f} MB "
+                    f"in {seconds * 1000:.0f} ms")
+        return after
+
+    def after_request(self) -> None:
+        """Called when a query finishes: collect only when memory is above gc_ratio."""
+        if not self.budget_bytes:
+            return
+        rss = self.rss()
+        if self.pressure(rss) != 'ok':
+            self.collect(rss, 'after request')
+
+    def admit_llm(self) -> None:
+        """
+        Admit an LLM generation, waiting while the process is over shed_ratio.
+
+        Raises:
+            MemoryPressureError: Memory stayed above shed_ratio for queue_timeout seconds
+        """
+        if not self.budget_bytes:
+            with self.lock:
+                self.llm_admitted += 1
+            return
+        rss = self.rss()
+        if self.pressure(rss) == 'shed':
+            rss = self.collect(rss, 'before generation')
+
+        if self.pressure(rss) == 'shed':
+            with self.lock:
+                self.llm_queued += 1
+                self.record('queue', rss)
+            logger.warning(f"⚠️ Memory at {rss / 1024 / 1024:.0f} MB of {self.budget_bytes / 1024 / 1024:.0f} MB, "
+                           f"queueing LLM generation")
+            deadline = time.monotonic() + self.queue_timeout
+            while self.pressure(rss) == 'shed':
+                if time.monotonic() >= deadline:
+                    with self.lock:
+                        self.llm_shed += 1
+                        self.record('shed', rss)
+                    logger.warning(f"⚠️ Shedding LLM generation: memory at {rss / 1024 / 1024:.0f} MB "
+                                   f"after waiting {self.queue_timeout:.0f}s")
+                    raise MemoryPressureError('Server is low on memory, please retry shortly',
+                                              retry_after=max(1, int(round(self.queue_timeout))))
+                time.sleep(self.poll_interval)
+                rss = self.collect(self.rss(), 'queued generation')
+
+        with self.lock:
+            self.llm_admitted += 1
+
+    def freeze(self) -> None:
+        """
+        Move every object that exists now (models, index, chunk store) out of the
+        collector's reach, so later collections only scan per-request garbage and
+        never touch pages gunicorn workers share with the master.
+        """
+        if not hasattr(gc, 'freeze'):
+            return
+        gc.collect()
+        gc.freeze()
+        self.frozen_objects = gc.get_freeze_count()
+        self.record('freeze', self.rss(), objects=self.frozen_objects)
+        logger.info(f"🧊 Froze {self.frozen_objects} startup objects out of garbage collection")
+
+    def stats(self) -> Dict[str, Any]:
+        """Budget, current pressure and the governor's decisions for /health."""
+        rss = self.rss()
+        mb = 1024 * 1024
+        return {
+            'budget_mb': round(self.budget_bytes / mb, 1) if self.budget_bytes else None,
+            'rss_mb': round(rss / mb, 1),
+            'container_limit_mb': round(self.container_limit / mb, 1) if self.container_limit else None,
+            'usage_ratio': round(rss / self.budget_bytes, 3) if self.budget_bytes else None,
+            'pressure': self.pressure(rss),
+            'gc_ratio': self.gc_ratio,
+            'shed_ratio': self.shed_ratio,
+            'collections': self.collections,
+            'collection_seconds': round(self.collection_seconds, 3),
+            'freed_mb': round(self.freed_bytes / mb, 1),
+            'frozen_objects': self.frozen_objects,
+            'llm_admitted': self.llm_admitted,
+            'llm_queued': self.llm_queued,
+            'llm_shed': self.llm_shed,
+            'recent_decisions': list(self.decisions)
+        }
+
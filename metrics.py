@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Educational Assistant - Metrics
+In-process latency histograms and counters rendered in the Prometheus text
+exposition format, plus the per-run ingestion statistics written by ingest.py.
+
+Metrics are kept per process: with several Gunicorn workers each scrape of
+/metrics reports the worker that served it (the `pid` sample identifies it).
+"""
+
+import os
+import json
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Seconds; spans a cached embedding lookup (~1 ms) up to a CPU LLM generation (~1 min)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, Dict[str, Any], float]
+
+
+def escape_label_value(value: Any) -> str:
+    """Escape a label value as the text format requires (backslash, quote, newline)."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels: Labels) -> str:
+    """Render a label set as {name="value",...}."""
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label_value(value)}"' for name, value in labels) + '}'
+
+
+def format_value(value: float) -> str:
+    """Render a sample value; integers without a trailing .0."""
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count of observed values."""
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        # Buckets are upper bounds (le), so a value equal to a bound falls in that bucket
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name: str, labels: Labels) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{format_labels(labels + (('le', format_value(bound)),))} {cumulative}")
+        lines.append(f"{name}_sum{format_labels(labels)} {format_value(self.sum)}")
+        lines.append(f"{name}_count{format_labels(labels)} {self.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Thread-safe histograms, counters and gauges, rendered for Prometheus."""
+
+    def __init__(self, namespace: str = 'assistant'):
+        """
+        Initialize the registry.
+
+        Args:
+            namespace: Prefix of every metric name
+        """
+        self.namespace = namespace
+        self.lock = threading.Lock()
+        self.descriptions: Dict[str, Tuple[str, str]] = {}
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self.values: Dict[str, Dict[Labels, float]] = {}
+        self.collectors: List[Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]] = []
+
+    def describe(self, name: str, kind: str, help_text: str) -> None:
+        """Declare a metric ('histogram', 'counter' or 'gauge') so it is rendered even before its first sample."""
+        self.descriptions[name] = (kind, help_text)
+        if kind == 'histogram':
+            self.histograms.setdefault(name, {})
+        else:
+            self.values.setdefault(name, {})
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        """Record a value in a histogram."""
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name: str, amount: float = 1.0, **labels: Any) -> None:
+        """Add to a counter, or to a gauge (a negative amount decrements it)."""
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self.lock:
+            series = self.values.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + amount
+
+    @contextmanager
+    def timer(self, name: str, **labels: Any) -> Iterator[None]:
+        """Observe the duration of the with-block in a histogram, even if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def register_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]) -> None:
+        """
+        Add a callback evaluated at scrape time.
+
+        Args:
+            collector: Returns (name, kind, help, [(name suffix, labels, value), ...]) tuples
+        """
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self.lock:
+            for name, (kind, help_text) in self.descriptions.items():
+                full_name = f"{self.namespace}_{name}"
+                lines.append(f"# HELP {full_name} {help_text}")
+                lines.append(f"# TYPE {full_name} {kind}")
+                if kind == 'histogram':
+                    for labels, histogram in sorted(self.histograms.get(name, {}).items()):
+                        lines.extend(histogram.samples(full_name, labels))
+                else:
+                    for labels, value in sorted(self.values.get(name, {}).items()):
+                        lines.append(f"{full_name}{format_labels(labels)} {format_value(value)}")
+
+        for collector in self.collectors:
+            for name, kind, help_text, samples in collector():
+                full_name = f"{self.namespace}_{name}"
+                lines.append(f"# HELP {full_name} {help_text}")
+                lines.append(f"# TYPE {full_name} {kind}")
+                for suffix, labels, value in samples:
+                    if value is None:
+                        continue
+                    label_set = tuple(sorted((k, str(v)) for k, v in labels.items()))
+                    lines.append(f"{full_name}{suffix}{format_labels(label_set)} {format_value(value)}")
+
+        return '\n'.join(lines) + '\n'
+
+
+class IngestStats:
+    """Counters and busy time of one ingestion run, saved to JSON for the app's /metrics."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.counters: Dict[str, float] = {}
+        self.stage_seconds: Dict[str, float] = {}
+
+    def inc(self, name: str, amount: float = 1) -> None:
+        """Add to a counter (files_downloaded, bytes_downloaded, chunks_created, ...)."""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        """Add busy time to a stage; concurrent workers add up, so this can exceed wall time."""
+        with self.lock:
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the with-block as busy time of a stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def snapshot(self, success: Optional[bool] = None) -> Dict[str, Any]:
+        """Counters, stage times and derived throughput as a JSON-serializable dict."""
+        with self.lock:
+            counters = dict(self.counters)
+            stage_seconds = dict(self.stage_seconds)
+        finished_at = time.time()
+        wall_seconds = finished_at - self.started_at
+
+        def rate(counter: str, stage: str) -> Optional[float]:
+            seconds = stage_seconds.get(stage)
+            return round(counters.get(counter, 0) / seconds, 3) if seconds else None
+
+        return {
+            'success': success,
+            'started_at': self.started_at,
+            'finished_at': finished_at,
+            'wall_seconds': round(wall_seconds, 3),
+            'counters': counters,
+            'stage_seconds': {stage: round(seconds, 3) for stage, seconds in stage_seconds.items()},
+            'throughput': {
+                'download_bytes_per_second': rate('bytes_downloaded', 'download'),
+                'extract_files_per_second': rate('files_extracted', 'extract'),
+                'embed_chunks_per_second': rate('embeddings_encoded', 'embed'),
+                'chunks_per_wall_second': round(counters.get('chunks_created', 0) / wall_seconds, 3)
+                if wall_seconds else None
+            }
+        }
+
+    def save(self, path: str, success: Optional[bool] = None) -> Dict[str, Any]:
+        """Write the snapshot atomically and return it."""
+        snapshot = self.snapshot(success)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, indent=2)
+        os.replace(tmp_path, path)
+        return snapshot
+
+
+def load_ingest_stats(path: str) -> Optional[Dict[str, Any]]:
+    """Statistics of the last ingestion run, or None if none were saved."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
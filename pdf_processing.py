@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Educational Assistant - PDF Processing
+Page-by-page text extraction and chunking of downloaded PDFs, used by ingest.py
+in its own process and in its extraction worker processes.
+
+Only PyMuPDF and the chunkers are imported here (plus the tokenizer in 'tokens'
+mode): worker processes import this module instead of ingest.py, so they start
+without the embedding model stack, FAISS or the Google Drive client.
+"""
+
+import re
+import json
+import time
+import logging
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import fitz  # PyMuPDF
+
+from token_chunking import chunk_pages_by_tokens
+
+logger = logging.getLogger(__name__)
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+def configure_logging(level: int = logging.INFO, log_file: Optional[str] = 'ingestion.log') -> None:
+    """
+    Log to the console and, if given, a log file; ingest.py's main() and its
+    extraction worker processes share this configuration.
+
+    Args:
+        level: Root logging level
+        log_file: File records are appended to (None logs to the console only)
+    """
+    handlers = [logging.FileHandler(log_file)] if log_file else []
+    handlers.append(logging.StreamHandler())
+    logging.basicConfig(level=level, format=LOG_FORMAT, handlers=handlers)
+
+
+class PdfProcessor:
+    """Extracts PDF text page by page and splits it into overlapping chunks."""
+
+    # Page-by-page extraction with line-preserving cleaning and page metadata
+    TEXT_EXTRACTION_VERSION = 2
+
+    def __init__(self,
+                 chunk_size: int = 300,
+                 chunk_overlap: int = 50,
+                 chunk_mode: str = 'words',
+                 chunk_tokens: int = 0,
+                 chunk_overlap_tokens: int = 32):
+        """
+        Initialize the processor.
+
+        Args:
+            chunk_size: Size of text chunks in words
+            chunk_overlap: Overlap between chunks in words (smaller than chunk_size)
+            chunk_mode: 'words' (chunk_size words) or 'tokens' (sentences packed into the
+                embedding model's token window, measured with chunk_tokenizer)
+            chunk_tokens: Tokens per chunk in 'tokens' mode
+            chunk_overlap_tokens: Tokens of trailing sentences repeated in the next chunk in 'tokens' mode
+        """
+        if chunk_overlap < 0 or chunk_overlap >= chunk_size:
+            raise ValueError(f"Chunk overlap ({chunk_overlap} words) must be at least 0 and smaller "
+                             f"than the chunk size ({chunk_size} words)")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        chunk_mode = chunk_mode.lower()
+        if chunk_mode not in ('words', 'tokens'):
+            raise ValueError(f"Unknown chunk mode '{chunk_mode}', expected 'words' or 'tokens'")
+        self.chunk_mode = chunk_mode
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap_tokens = chunk_overlap_tokens
+        self.chunk_tokenizer = None
+
+    def chunker_options(self) -> Dict[str, Any]:
+        """Constructor arguments that recreate this processor in a worker process."""
+        return {
+            'chunk_size': self.chunk_size,
+            'chunk_overlap': self.chunk_overlap,
+            'chunk_mode': self.chunk_mode,
+            'chunk_tokens': self.chunk_tokens,
+            'chunk_overlap_tokens': self.chunk_overlap_tokens
+        }
+
+    def extract_pages(self, pdf: Union[bytes, str], file_name: str) -> Iterator[Tuple[int, str]]:
+        """
+        Extract a PDF page by page, so only one page's text is held at a time.
+
+        Args:
+            pdf: Path of the downloaded PDF (read by PyMuPDF from disk as pages
+                are loaded) or its bytes
+            file_name: Name used in log messages
+
+        Yields:
+            (page_number, cleaned_text) for every page with text left after cleaning,
+            page numbers starting at 1
+        """
+        doc = fitz.open(pdf) if isinstance(pdf, str) else fitz.open(stream=pdf, filetype="pdf")
+        characters = 0
+        try:
+            for page_num in range(len(doc)):
+                text = self.clean_text(doc.load_page(page_num).get_text())
+                if text:
+                    characters += len(text)
+                    yield page_num + 1, text
+            logger.info(f"Extracted {characters} characters from {len(doc)} pages of {file_name}")
+        finally:
+            doc.close()
+
+    def extract_text_from_pdf(self, pdf: Union[bytes, str], file_name: str) -> str:
+        """Extract the cleaned text of a whole PDF (path or bytes), pages separated by newlines."""
+        try:
+            return '\n'.join(text for _, text in self.extract_pages(pdf, file_name))
+        except Exception as e:
+            logger.error(f"❌ Failed to extract text from {file_name}: {e}")
+            return ""
+
+    def clean_text(self, text: str) -> str:
+        """Clean and normalize extracted text, keeping one line per line of the page."""
+        # Remove special characters but keep basic punctuation
+        text = re.sub(r'[^\w\s.,!?;:()-]', '', text)
+
+        # Remove excessive whitespace within lines
+        text = re.sub(r'[^\S\n]+', ' ', text)
+
+        # Remove very short lines (likely artifacts)
+        lines = [line.strip() for line in text.split('\n')]
+        lines = [line for line in lines if len(line) > 10]
+
+        return '\n'.join(lines)
+
+    def chunk_text(self, text: str, source: str) -> List[Dict[str, Any]]:
+        """Split text into overlapping chunks, treating it as a single page."""
+        return list(self.chunk_pages([(1, text)], source))
+
+    def chunk_pages(self, pages: Iterable[Tuple[int, str]], source: str) -> Iterator[Dict[str, Any]]:
+        """
+        Split a document into overlapping chunks as its pages arrive.
+
+        Args:
+            pages: (page_number, text) pairs, e.g. from extract_pages
+            source: File name recorded with each chunk
+
+        Yields:
+            Chunks with their text, source, chunk_id, position in the document
+            and the first and last page they cover
+        """
+        if self.chunk_mode == 'tokens':
+            chunks = chunk_pages_by_tokens(pages, self.chunk_tokenizer, self.chunk_tokens, self.chunk_overlap_tokens)
+        else:
+            chunks = self.chunk_pages_by_words(pages)
+
+        chunk_id = 0
+        for chunk in chunks:
+            if len(chunk['text'].strip()) > 50:  # Skip very short chunks
+                if 'word_count' not in chunk:
+                    chunk['word_count'] = len(chunk['text'].split())
+                yield {'source': source, 'chunk_id': chunk_id, **chunk}
+                chunk_id += 1
+
+    def chunk_pages_by_words(self, pages: Iterable[Tuple[int, str]]) -> Iterator[Dict[str, Any]]:
+        """
+        Split pages into chunks of chunk_size words overlapping by chunk_overlap,
+        holding only the words of the chunk being filled.
+        """
+        step = self.chunk_size - self.chunk_overlap
+        words: List[str] = []
+        word_pages: List[int] = []
+        first = 0  # position of words[0] in the document
+
+        def make_chunk() -> Dict[str, Any]:
+            count = min(len(words), self.chunk_size)
+            return {
+                'text': ' '.join(words[:count]),
+                'word_count': count,
+                'start_word': first,
+                'end_word': first + count,
+                'page_start': word_pages[0],
+                'page_end': word_pages[count - 1]
+            }
+
+        for page_number, text in pages:
+            page_words = text.split()
+            words.extend(page_words)
+            word_pages.extend([page_number] * len(page_words))
+            while len(words) >= self.chunk_size:
+                yield make_chunk()
+                del words[:step], word_pages[:step]
+                first += step
+
+        # Every remaining start position gets a (shorter) chunk, as for a single text
+        while words:
+            yield make_chunk()
+            del words[:step], word_pages[:step]
+            first += step
+
+    def process_pdf(self, file_info: Dict[str, str], pdf: Union[bytes, str],
+                    sink: Callable[[Dict[str, Any]], Any]) -> Optional[int]:
+        """
+        Extract and chunk one downloaded PDF, handing every chunk to sink as soon as
+        its page has been chunked.
+
+        Returns:
+            Number of chunks created, or None if extraction failed (sink may already
+            have received some of the file's chunks)
+        """
+        file_name = file_info['name']
+
+        logger.info(f"Processing: {file_name}")
+
+        # Extract and chunk page by page, never holding the whole document or its chunks
+        count = 0
+        try:
+            for chunk in self.chunk_pages(self.extract_pages(pdf, file_name), file_name):
+                sink(chunk)
+                count += 1
+        except Exception as e:
+            logger.error(f"❌ Failed to extract text from {file_name}: {e}")
+            return None
+        logger.info(f"Created {count} chunks from {file_name}")
+
+        return count
+
+
+_worker_processor = None
+
+
+def timed_process_pdf(processor: PdfProcessor, file_info: Dict[str, str], pdf: Union[bytes, str],
+                      spool_path: str) -> Tuple[Optional[int], float]:
+    """
+    Extract and chunk one PDF into a spool file, one JSON line per chunk.
+
+    Returns:
+        The chunk count (None if extraction failed) and the seconds it took
+    """
+    start = time.perf_counter()
+    with open(spool_path, 'w', encoding='utf-8') as spool:
+        count = processor.process_pdf(
+            file_info, pdf, lambda chunk: spool.write(json.dumps(chunk, ensure_ascii=False) + '\n'))
+    return count, time.perf_counter() - start
+
+
+def read_spooled_chunks(spool_path: str) -> Iterator[Dict[str, Any]]:
+    """Read back the chunks of a spool file one at a time."""
+    with open(spool_path, 'r', encoding='utf-8') as spool:
+        for line in spool:
+            yield json.loads(line)
+
+
+def extract_and_chunk(file_info: Dict[str, str], pdf: Union[bytes, str], chunking: Dict[str, Any],
+                      spool_path: str) -> Tuple[Optional[int], float]:
+    """
+    Extract and chunk one PDF in a pipeline worker process.
+
+    Args:
+        file_info: Drive file info
+        pdf: Path of the downloaded PDF (only the path crosses the process boundary) or its bytes
+        chunking: PdfProcessor.chunker_options() of the parent ingester, plus 'tokenizer_path'
+            (the saved embedding tokenizer in 'tokens' mode)
+        spool_path: File the chunks are written to; only their count is sent back
+
+    Returns:
+        The chunk count (None if extraction failed) and the seconds it took
+    """
+    global _worker_processor
+    if _worker_processor is None:
+        settings = dict(chunking)
+        tokenizer_path = settings.pop('tokenizer_path', None)
+        _worker_processor = PdfProcessor(**settings)
+        if tokenizer_path:
+            from transformers import AutoTokenizer
+            _worker_processor.chunk_tokenizer = AutoTokenizer.from_pretrained(tokenizer_path)
+    return timed_process_pdf(_worker_processor, file_info, pdf, spool_path)
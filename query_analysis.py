@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Educational Assistant - Query Analysis
+Single-pass keyword and duration detection for incoming queries.
+
+All keyword tables are compiled into one regular expression when the analyzer
+is created; analyze() scans the lowercased query once and returns an immutable
+QueryAnalysis shared by retrieval, caching and lesson formatting.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, Optional
+
+from query_cache import normalize_query
+
+MUSIC_KEYWORDS = (
+    'music', 'musical', 'song', 'singing', 'rhythm', 'melody', 'beat',
+    'instrument', 'piano', 'guitar', 'drum', 'orchestra', 'choir',
+    'note', 'scale', 'tempo', 'dynamics', 'pitch'
+)
+
+ELEMENTARY_KEYWORDS = (
+    'elementary', 'primary', 'kindergarten', 'k-5', 'grade 1', 'grade 2',
+    'grade 3', 'grade 4', 'grade 5', 'young', 'children'
+)
+
+EXTERNAL_TRIGGERS = (
+    'search the web', 'best practices', 'include external ideas',
+    'go beyond the documents', 'latest research', 'current trends',
+    'what else', 'additional ideas', 'more information',
+    'external sources', 'beyond curriculum'
+)
+
+# Minutes per unit, in priority order: an explicit minute count wins over hours, hours over periods
+DURATION_UNITS = (
+    ('minutes', 'minute|min', 1),
+    ('hours', 'hour|hr', 60),
+    ('periods', 'period|class', 45),  # Assume class periods are 45 minutes
+)
+
+
+def trie_pattern(words: Iterable[str]) -> str:
+    """Regex alternation of words factored by common prefix, so each position tries one branch per character."""
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if '' in node:
+            body = f"(?:{body})?"
+        return body
+
+    return build(trie)
+
+
+@dataclass(frozen=True)
+class QueryAnalysis:
+    """Everything downstream code needs to know about one query."""
+
+    text: str
+    normalized: str
+    duration: Optional[int]
+    is_elementary_music: bool
+    external_knowledge: bool
+
+    @property
+    def query_type(self) -> str:
+        return 'elementary_music' if self.is_elementary_music else 'general'
+
+
+class QueryAnalyzer:
+    """Detects lesson type, external-knowledge requests and duration in one regex scan."""
+
+    def __init__(self, music_keywords: Iterable[str] = MUSIC_KEYWORDS,
+                 elementary_keywords: Iterable[str] = ELEMENTARY_KEYWORDS,
+                 external_triggers: Iterable[str] = EXTERNAL_TRIGGERS):
+        """
+        Compile the keyword tables.
+
+        Args:
+            music_keywords: Substrings marking a music query
+            elementary_keywords: Substrings marking an elementary grade level
+            external_triggers: Phrases asking for knowledge beyond the documents
+        """
+        tables = {'music': music_keywords, 'elementary': elementary_keywords, 'external': external_triggers}
+        categories: Dict[str, set] = {}
+        for category, keywords in tables.items():
+            for keyword in keywords:
+                if not keyword or keyword[0].isdigit():
+                    # A digit would be ambiguous with the start of a duration
+                    raise ValueError(f"Keyword must not be empty or start with a digit: {keyword!r}")
+                categories.setdefault(keyword.lower(), set()).add(category)
+
+        # The longest keyword starting at a position wins the alternation, so it also
+        # carries the categories of every keyword that is a prefix of it
+        self.categories: Dict[str, FrozenSet[str]] = {
+            keyword: frozenset().union(*(cats for other, cats in categories.items() if keyword.startswith(other)))
+            for keyword in categories
+        }
+        units = '|'.join(f"(?P<{name}>{unit})" for name, unit, _ in DURATION_UNITS)
+
+        # Zero-width lookaheads so overlapping keywords are all seen; a position matches
+        # if a keyword (greedy, so the longest) or a duration starts there
+        self.pattern = re.compile(
+            f"(?=(?P<keyword>{trie_pattern(self.categories)}))|(?=(?P<number>\\d+)\\s*(?:{units}))"
+        )
+
+    def analyze(self, query: str) -> QueryAnalysis:
+        """Analyze a query (including any appended "Duration: ..." text)."""
+        found = set()
+        durations: Dict[str, int] = {}
+        for match in self.pattern.finditer(query.lower()):
+            keyword = match.group('keyword')
+            if keyword is not None:
+                found |= self.categories[keyword]
+            elif match.lastgroup not in durations:
+                durations[match.lastgroup] = int(match.group('number'))
+
+        duration = None
+        for name, _, minutes in DURATION_UNITS:
+            if name in durations:
+                duration = durations[name] * minutes
+                break
+
+        return QueryAnalysis(
+            text=query,
+            normalized=normalize_query(query),
+            duration=duration,
+            is_elementary_music='music' in found and 'elementary' in found,
+            external_knowledge='external' in found
+        )
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Educational Assistant - Query Caches
+Bounded caches for per-query work in app.py, keyed on normalized query text.
+"""
+
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# process_query appends the form's duration as " Duration: <value>"
+DURATION_SUFFIX = re.compile(r'\s+duration:\s*[^\n]*$')
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query for cache keys and embedding: case, whitespace and the appended duration."""
+    text = query.lower()
+    text = DURATION_SUFFIX.sub('', text)
+    text = WHITESPACE.sub(' ', text).strip()
+    return text.strip(' .,!?;:')
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU cache of query embeddings with TTL and byte limits.
+
+    With the 'sqlite' backend, entries are also written to a local SQLite file
+    shared by every gunicorn worker; the in-process LRU stays in front of it.
+    """
+
+    def __init__(self, max_items: int = 10000, max_mb: float = 64, ttl_seconds: float = 3600,
+                 backend: str = 'memory', sqlite_path: str = 'query_cache.sqlite'):
+        """
+        Initialize the cache.
+
+        Args:
+            max_items: Maximum entries held in memory (and in SQLite)
+            max_mb: Maximum bytes of vectors and keys held in memory
+            ttl_seconds: Entry lifetime (0 keeps entries until evicted)
+            backend: 'memory' or 'sqlite'
+            sqlite_path: SQLite file shared across workers
+        """
+        self.max_items = max(1, max_items)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl = ttl_seconds
+        self.backend = backend
+        self.sqlite_path = sqlite_path
+
+        self.entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.shared_writes = 0
+
+        if backend == 'sqlite':
+            self.sqlite_connection()
+
+    def sqlite_connection(self) -> sqlite3.Connection:
+        """Get this thread's SQLite connection, creating the table on first use."""
+        connection = getattr(self.local, 'connection', None)
+        if connection is None or getattr(self.local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.sqlite_path, timeout=1.0, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS query_embeddings ('
+                'key TEXT PRIMARY KEY, vector BLOB NOT NULL, dim INTEGER NOT NULL, '
+                'created REAL NOT NULL)'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS query_embeddings_created ON query_embeddings (created)')
+            self.local.connection = connection
+            self.local.pid = os.getpid()
+        return connection
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Look up a cached embedding."""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                vector, created = entry
+                if self.ttl and now - created > self.ttl:
+                    self.remove(key)
+                    self.expirations += 1
+                else:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return vector
+
+        if self.backend == 'sqlite':
+            vector = self.get_shared(key, now)
+            if vector is not None:
+                with self.lock:
+                    self.hits += 1
+                    self.shared_hits += 1
+                    self.insert(key, vector, now)
+                return vector
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, vector: np.ndarray) -> None:
+        """Store an embedding."""
+        vector = np.asarray(vector, dtype=np.float32)
+        vector.setflags(write=False)
+        now = time.time()
+        with self.lock:
+            self.insert(key, vector, now)
+
+        if self.backend == 'sqlite':
+            self.put_shared(key, vector, now)
+
+    def insert(self, key: str, vector: np.ndarray, created: float) -> None:
+        """Insert into the in-process LRU, evicting down to the item and byte limits (lock held)."""
+        if key in self.entries:
+            self.remove(key)
+        self.entries[key] = (vector, created)
+        self.bytes += vector.nbytes + len(key)
+        while self.entries and (len(self.entries) > self.max_items or self.bytes > self.max_bytes):
+            oldest = next(iter(self.entries))
+            self.remove(oldest)
+            self.evictions += 1
+
+    def remove(self, key: str) -> None:
+        """Drop one in-process entry (lock held)."""
+        vector, _ = self.entries.pop(key)
+        self.bytes -= vector.nbytes + len(key)
+
+    def get_shared(self, key: str, now: float) -> Optional[np.ndarray]:
+        """Look up the SQLite tier."""
+        try:
+            row = self.sqlite_connection().execute(
+                'SELECT vector, created FROM query_embeddings WHERE key = ?', (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Query cache lookup failed: {e}")
+            return None
+        if row is None or (self.ttl and now - row[1] > self.ttl):
+            return None
+        vector = np.frombuffer(row[0], dtype=np.float32)
+        return vector
+
+    def put_shared(self, key: str, vector: np.ndarray, now: float) -> None:
+        """Write to the SQLite tier, trimming the oldest rows beyond max_items."""
+        try:
+            connection = self.sqlite_connection()
+            connection.execute(
+                'INSERT OR REPLACE INTO query_embeddings (key, vector, dim, created) VALUES (?, ?, ?, ?)',
+                (key, vector.tobytes(), vector.shape[0], now)
+            )
+            self.shared_writes += 1
+            if self.shared_writes % 64 == 0:
+                # Trim periodically rather than on every write
+                if self.ttl:
+                    connection.execute('DELETE FROM query_embeddings WHERE created < ?', (now - self.ttl,))
+                connection.execute(
+                    'DELETE FROM query_embeddings WHERE key IN (SELECT key FROM query_embeddings '
+                    'ORDER BY created DESC LIMIT -1 OFFSET ?)', (self.max_items,)
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Query cache write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache statistics for /health."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': self.backend,
+                'entries': len(self.entries),
+                'memory_kb': round(self.bytes / 1024, 1),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'shared_hits': self.shared_hits,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+
+class ResponseCache:
+    """Bounded LRU cache of complete process_query results."""
+
+    def __init__(self, capacity: int = 1000):
+        """
+        Initialize the cache.
+
+        Args:
+            capacity: Maximum cached results (0 disables the cache)
+        """
+        self.capacity = max(0, capacity)
+        self.entries: 'OrderedDict[Hashable, Dict[str, Any]]' = OrderedDict()
+        self.lock = threading.Lock()
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """Look up a cached result; the caller gets its own shallow copy."""
+        with self.lock:
+            result = self.entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return dict(result)
+
+    def put(self, key: Hashable, result: Dict[str, Any]) -> None:
+        """Store a result, evicting the least recently used beyond capacity."""
+        if not self.capacity:
+            return
+        with self.lock:
+            self.entries[key] = dict(result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every entry, e.g. after the index was reloaded."""
+        with self.lock:
+            self.entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache statistics for /health."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'capacity': self.capacity,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'invalidations': self.invalidations
+            }
@@ -118,7 +118,7 @@ print_success "Directories created"
 
 # Check for document index
 print_status "Checking document index..."
-if [ ! -f "document.index" ] || [ ! -f "documents.json" ]; then
+if [ ! -f "document.index" ] || [ ! -d "chunk_store" ]; then
     print_warning "Document index not found"
     print_status "Run 'python ingest.py' to process your documents"
 fi
@@ -0,0 +1,76 @@
+"""
+Educational Assistant - Test Fixtures
+Ingesters wired to the benchmark stubs (a Google Drive service over a local
+folder of PDFs and a deterministic encoder), so ingestion runs offline.
+"""
+
+import os
+import sys
+from typing import Any, Callable, List
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.stubs import StubDriveService, StubEncoder  # noqa: E402
+
+# Long enough lines that clean_text keeps them and chunks pass the minimum length
+LESSON_LINE = "Students practice {topic} with partners and explain their reasoning to the class"
+
+
+def lesson_pages(topic: str, pages: int = 2, lines: int = 12) -> List[str]:
+    """Page texts of a lesson document about one topic."""
+    return ['\n'.join(f"{LESSON_LINE.format(topic=topic)} on page {page} line {line}." for line in range(lines))
+            for page in range(1, pages + 1)]
+
+
+def write_pdf(path: str, pages: List[str], mtime: float = None) -> str:
+    """Write a PDF with one page per text (an empty text makes a page without text)."""
+    import fitz  # PyMuPDF
+
+    doc = fitz.open()
+    for text in pages:
+        page = doc.new_page(width=612, height=792)
+        if text:
+            page.insert_textbox(fitz.Rect(72, 72, 540, 720), text, fontsize=9)
+    doc.save(path)
+    doc.close()
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.fixture
+def drive_folder(tmp_path) -> str:
+    """Empty directory standing in for the Drive folder."""
+    folder = tmp_path / 'drive'
+    folder.mkdir()
+    return str(folder)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch) -> str:
+    """Working directory where ingest.py writes the index files."""
+    path = tmp_path / 'work'
+    path.mkdir()
+    monkeypatch.chdir(path)
+    return str(path)
+
+
+@pytest.fixture
+def make_ingester(workdir) -> Callable[..., Any]:
+    """Build a DocumentIngester that downloads from a StubDriveService and embeds with StubEncoder."""
+    import ingest
+
+    def make(drive: StubDriveService, **options: Any) -> Any:
+        settings = dict(chunk_size=60, chunk_overlap=10, extract_workers=0, embedding_cache_dir=None,
+                        stats_path=None, download_workers=2, service_factory=lambda: drive)
+        settings.update(options)
+        ingester = ingest.DocumentIngester(**settings)
+        ingester.service = drive
+        ingester.embedding_model = StubEncoder(64)
+        return ingester
+
+    return make
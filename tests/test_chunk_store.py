@@ -0,0 +1,84 @@
+"""
+Tests for writing, replacing and reading the columnar chunk store.
+"""
+
+import os
+
+from chunk_store import ChunkStore, replace_directory, write_chunk_store
+
+
+def chunks(version, count=20):
+    return [{'text': f"Chunk {row} of version {version}", 'source': f"lesson{row % 3}.pdf",
+             'vector_id': version * 1000 + row} for row in range(count)]
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'chunk_store')
+    write_chunk_store(path, chunks(1) + [{'text': 'No metadata'}])
+
+    store = ChunkStore(path)
+    assert len(store) == 21
+    assert store[3] == chunks(1)[3]
+    assert store[20] == {'text': 'No metadata'}
+    assert list(store.column('vector_id')[:2]) == [1000, 1001]
+
+
+def test_rewrite_switches_link_and_keeps_one_previous_version(tmp_path):
+    path = str(tmp_path / 'chunk_store')
+    write_chunk_store(path, chunks(1))
+    reader = ChunkStore(path)
+    for version in (2, 3, 4):
+        write_chunk_store(path, chunks(version))
+
+    assert os.path.islink(path)
+    versions = sorted(entry for entry in os.listdir(tmp_path) if entry.startswith('chunk_store.v'))
+    assert len(versions) == 2
+    assert os.readlink(path) == versions[-1]
+    assert ChunkStore(path)[0]['vector_id'] == 4000
+    # A store opened before the rewrites still reads its own mapped files
+    assert reader.text(5) == 'Chunk 5 of version 1'
+
+
+def test_plain_directory_is_replaced(tmp_path):
+    path = str(tmp_path / 'chunk_store')
+    old = str(tmp_path / 'written_before')
+    write_chunk_store(old, chunks(1))
+    os.rename(os.path.realpath(old), path)
+
+    write_chunk_store(path, chunks(2))
+
+    assert os.path.islink(path)
+    assert not os.path.exists(f"{path}.old")
+    assert ChunkStore(path)[0]['vector_id'] == 2000
+
+
+def test_store_exists_after_every_rename(tmp_path, monkeypatch):
+    path = str(tmp_path / 'chunk_store')
+    write_chunk_store(path, chunks(0))
+    seen = []
+
+    def checked(rename):
+        def wrapper(source, target):
+            rename(source, target)
+            seen.append(ChunkStore.exists(path))
+        return wrapper
+
+    monkeypatch.setattr(os, 'rename', checked(os.rename))
+    monkeypatch.setattr(os, 'replace', checked(os.replace))
+    for version in (1, 2):
+        write_chunk_store(path, chunks(version))
+
+    assert seen and all(seen)
+    assert ChunkStore(path)[0]['vector_id'] == 2000
+
+
+def test_replace_directory_can_drop_previous_version(tmp_path):
+    path = str(tmp_path / 'cache')
+    for generation in range(3):
+        tmp = tmp_path / 'cache.tmp'
+        tmp.mkdir()
+        (tmp / 'generation.txt').write_text(str(generation))
+        replace_directory(str(tmp), path, keep_previous=False)
+
+    assert [entry for entry in os.listdir(tmp_path) if entry.startswith('cache.v')] == [os.readlink(path)]
+    assert (tmp_path / 'cache' / 'generation.txt').read_text() == '2'
@@ -0,0 +1,59 @@
+"""
+Tests for loading named collections on first use.
+"""
+
+import os
+
+import faiss
+import numpy as np
+import pytest
+
+from chunk_store import write_chunk_store
+from collection_registry import CollectionRegistry, CollectionUnavailableError, UnknownCollectionError
+
+
+def write_collection(path, count=3, dim=8):
+    os.makedirs(path, exist_ok=True)
+    index = faiss.IndexIDMap(faiss.IndexFlatIP(dim))
+    index.add_with_ids(np.eye(count, dim, dtype=np.float32), np.arange(count, dtype=np.int64))
+    faiss.write_index(index, os.path.join(path, 'document.index'))
+    write_chunk_store(os.path.join(path, 'chunk_store'),
+                      [{'text': f"Chunk {row}", 'source': 'lesson.pdf', 'vector_id': row} for row in range(count)])
+
+
+def test_collection_is_loaded_once(tmp_path):
+    write_collection(str(tmp_path / 'science'))
+    registry = CollectionRegistry(root=str(tmp_path))
+
+    collection = registry.get('science')
+
+    assert registry.get('science') is collection
+    assert collection.index.ntotal == 3 and len(collection.documents) == 3
+    assert (registry.loads, registry.load_failures) == (1, 0)
+
+
+def test_unknown_collection_raises(tmp_path):
+    registry = CollectionRegistry(root=str(tmp_path))
+
+    with pytest.raises(UnknownCollectionError):
+        registry.get('missing')
+    with pytest.raises(UnknownCollectionError):
+        registry.get('../escape')
+
+
+def test_unloadable_collection_is_not_registered(tmp_path):
+    path = str(tmp_path / 'science')
+    os.makedirs(path)
+    with open(os.path.join(path, 'document.index'), 'wb') as f:
+        f.write(b'partially written')
+    registry = CollectionRegistry(root=str(tmp_path))
+
+    with pytest.raises(CollectionUnavailableError):
+        registry.get('science')
+    assert not registry.loaded
+    assert (registry.loads, registry.load_failures) == (0, 1)
+
+    # Once ingestion has finished writing it, the next request loads it
+    write_collection(path)
+    assert len(registry.get('science').documents) == 3
+    assert list(registry.loaded) == ['science']
@@ -0,0 +1,155 @@
+"""
+Tests for listing and downloading the PDFs of a Google Drive folder.
+"""
+
+import os
+
+import pytest
+
+import ingest
+from benchmarks.stubs import StubDriveHttp, StubDriveService, StubHttpResponse
+from conftest import lesson_pages, write_pdf
+
+
+class SmallPageDriveService(StubDriveService):
+    """Drive service that returns at most two files per listing page."""
+
+    def __init__(self, folder: str):
+        super().__init__(folder)
+        self.list_calls = 0
+
+    def list(self, pageSize: int = 100, **kwargs):
+        self.list_calls += 1
+        return super().list(pageSize=2, **kwargs)
+
+
+class FlakyDriveHttp(StubDriveHttp):
+    """Answers the first `failures` requests with a 503."""
+
+    def __init__(self, drive: StubDriveService, failures: int):
+        super().__init__(drive)
+        self.failures = failures
+        self.requests = 0
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        self.requests += 1
+        if self.requests <= self.failures:
+            response = StubHttpResponse(503, {})
+            response.reason = 'Service Unavailable'
+            return response, b'Backend Error'
+        return super().request(uri, method, body, headers, **kwargs)
+
+
+@pytest.fixture
+def folder_of_pdfs(drive_folder):
+    for number in range(5):
+        write_pdf(os.path.join(drive_folder, f"lesson{number}.pdf"), lesson_pages(f"fractions {number}"))
+    return drive_folder
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record backoff delays instead of sleeping (jitter fixed at 0)."""
+    delays = []
+    monkeypatch.setattr(ingest.time, 'sleep', delays.append)
+    monkeypatch.setattr(ingest.random, 'uniform', lambda low, high: 0.0)
+    return delays
+
+
+def flaky_drive(folder: str, failures: int) -> StubDriveService:
+    drive = StubDriveService(folder)
+    drive.http = FlakyDriveHttp(drive, failures)
+    return drive
+
+
+def test_listing_follows_every_page(folder_of_pdfs, make_ingester):
+    drive = SmallPageDriveService(folder_of_pdfs)
+    ingester = make_ingester(drive)
+
+    files = ingester.get_pdf_files_from_folder('folder')
+
+    assert sorted(f['id'] for f in files) == [f"lesson{n}" for n in range(5)]
+    assert drive.list_calls == 3
+
+
+def test_listing_error_returns_no_files(folder_of_pdfs, make_ingester):
+    drive = StubDriveService(folder_of_pdfs)
+    ingester = make_ingester(drive)
+    ingester.service = None
+
+    assert ingester.get_pdf_files_from_folder('folder') == []
+
+
+def test_transient_errors_are_retried_with_backoff(folder_of_pdfs, make_ingester, sleeps):
+    drive = flaky_drive(folder_of_pdfs, failures=2)
+    ingester = make_ingester(drive)
+
+    pdf = ingester.download_pdf('lesson0', 'lesson0.pdf')
+
+    with open(os.path.join(folder_of_pdfs, 'lesson0.pdf'), 'rb') as f:
+        assert pdf == f.read()
+    assert sleeps == [1, 2]
+    assert ingester.stats.counters['download_errors'] == 2
+
+
+def test_backoff_is_capped(folder_of_pdfs, make_ingester, sleeps):
+    drive = flaky_drive(folder_of_pdfs, failures=7)
+    ingester = make_ingester(drive, download_retries=8)
+
+    assert ingester.download_pdf('lesson0', 'lesson0.pdf') is not None
+    assert sleeps == [1, 2, 4, 8, 16, 32, 32]
+
+
+def test_missing_file_is_not_retried(folder_of_pdfs, make_ingester, sleeps):
+    ingester = make_ingester(StubDriveService(folder_of_pdfs))
+
+    assert ingester.download_pdf('missing', 'missing.pdf') is None
+    assert sleeps == []
+    assert ingester.stats.counters['download_errors'] == 1
+
+
+def test_exhausted_retries_remove_partial_file(folder_of_pdfs, make_ingester, sleeps, tmp_path):
+    drive = flaky_drive(folder_of_pdfs, failures=10)
+    ingester = make_ingester(drive, download_retries=3)
+    path = str(tmp_path / 'lesson0.pdf')
+
+    assert ingester.download_pdf('lesson0', 'lesson0.pdf', path) is None
+    assert len(sleeps) == 2
+    assert drive.http.requests == 3
+    assert not os.path.exists(path)
+    assert not os.path.exists(f"{path}.part")
+
+
+def test_streamed_download_replaces_partial_file(folder_of_pdfs, make_ingester, tmp_path):
+    ingester = make_ingester(StubDriveService(folder_of_pdfs))
+    path = str(tmp_path / 'lesson0.pdf')
+
+    assert ingester.download_pdf('lesson0', 'lesson0.pdf', path) == path
+    with open(path, 'rb') as downloaded, open(os.path.join(folder_of_pdfs, 'lesson0.pdf'), 'rb') as original:
+        assert downloaded.read() == original.read()
+    assert not os.path.exists(f"{path}.part")
+
+
+@pytest.mark.parametrize('spool', [False, True])
+def test_concurrent_downloads_survive_a_failed_file(folder_of_pdfs, make_ingester, sleeps, tmp_path, spool):
+    drive = StubDriveService(folder_of_pdfs)
+    ingester = make_ingester(drive, download_workers=2)
+    files = ingester.get_pdf_files_from_folder('folder')
+    files.insert(2, {'id': 'missing', 'name': 'missing.pdf', 'size': '10', 'modifiedTime': files[0]['modifiedTime']})
+    spool_dir = str(tmp_path / 'spool') if spool else None
+    if spool_dir:
+        os.makedirs(spool_dir)
+
+    results = {info['id']: pdf for info, pdf in ingester.download_pdfs(files, spool_dir)}
+
+    assert set(results) == {f['id'] for f in files}
+    assert results['missing'] is None
+    for number in range(5):
+        pdf = results[f"lesson{number}"]
+        if spool:
+            assert pdf == os.path.join(spool_dir, f"lesson{number}.pdf")
+            assert os.path.exists(pdf)
+        else:
+            assert isinstance(pdf, bytes) and pdf.startswith(b'%PDF')
+    assert ingester.stats.counters['files_downloaded'] == 5
+    assert ingester.stats.counters['files_failed'] == 1
@@ -0,0 +1,117 @@
+"""
+Tests for the on-disk embedding cache used by ingest.py.
+"""
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+import embedding_cache
+from embedding_cache import EmbeddingCache
+
+NAMESPACE = '{"embedding_model": "stub"}'
+
+
+def vectors(start, count, dim=8):
+    return np.arange(start * dim, (start + count) * dim, dtype=np.float32).reshape(count, dim)
+
+
+def texts(start, count):
+    return [f"chunk {i}" for i in range(start, start + count)]
+
+
+def fill(path, start, count, **options):
+    cache = EmbeddingCache(path, NAMESPACE, **options)
+    cache.put_many(texts(start, count), vectors(start, count))
+    cache.save()
+    return cache
+
+
+def test_saved_vectors_are_found_by_a_new_cache(tmp_path):
+    path = str(tmp_path / 'embedding_cache')
+    fill(path, 0, 5)
+    fill(path, 5, 5)
+
+    cache = EmbeddingCache(path, NAMESPACE)
+    found, missing = cache.get_many(texts(0, 10) + ['new chunk'])
+
+    assert cache.count == 10
+    assert missing == [10]
+    np.testing.assert_array_equal(np.vstack(found[:10]), vectors(0, 10))
+
+
+def test_namespace_is_part_of_the_key(tmp_path):
+    path = str(tmp_path / 'embedding_cache')
+    fill(path, 0, 3)
+
+    _, missing = EmbeddingCache(path, '{"embedding_model": "other"}').get_many(texts(0, 3))
+
+    assert missing == [0, 1, 2]
+
+
+def test_least_recently_used_rows_are_evicted(tmp_path):
+    path = str(tmp_path / 'embedding_cache')
+    fill(path, 0, 4)
+
+    cache = EmbeddingCache(path, NAMESPACE)
+    cache.max_bytes = 6 * 8 * 2  # Six float16 rows
+    cache.run_id += 1
+    cache.get_many(texts(2, 2))  # Rows 2 and 3 are used again
+    cache.put_many(texts(4, 4), vectors(4, 4))
+    cache.save()
+
+    cache = EmbeddingCache(path, NAMESPACE)
+    found, missing = cache.get_many(texts(0, 8))
+    assert cache.count == 6
+    assert missing == [0, 1]
+    np.testing.assert_array_equal(np.vstack(found[2:]), vectors(2, 6))
+
+
+def test_interrupted_save_keeps_the_previous_generation(tmp_path, monkeypatch):
+    path = str(tmp_path / 'embedding_cache')
+    fill(path, 0, 5)
+    cache = EmbeddingCache(path, NAMESPACE)
+    cache.put_many(texts(5, 5), vectors(5, 5))
+
+    def crash(*args, **kwargs):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(embedding_cache, 'replace_directory', crash)
+    with pytest.raises(OSError):
+        cache.save()
+    monkeypatch.undo()
+
+    cache = EmbeddingCache(path, NAMESPACE)
+    found, missing = cache.get_many(texts(0, 10))
+    assert cache.count == 5
+    assert missing == [5, 6, 7, 8, 9]
+    np.testing.assert_array_equal(np.vstack(found[:5]), vectors(0, 5))
+
+
+@pytest.mark.parametrize('damage', ['short vectors', 'extra keys', 'bad meta'])
+def test_inconsistent_cache_is_discarded(tmp_path, damage):
+    path = str(tmp_path / 'embedding_cache')
+    fill(path, 0, 5)
+    if damage == 'short vectors':
+        with open(os.path.join(path, 'vectors.bin'), 'r+b') as f:
+            f.truncate(3 * 8 * 2)
+    elif damage == 'extra keys':
+        keys = np.load(os.path.join(path, 'keys.npy'))
+        np.save(os.path.join(path, 'keys.npy'), np.vstack([keys, keys[:1]]))
+    else:
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            f.write('{"dim": 8')
+
+    cache = EmbeddingCache(path, NAMESPACE)
+    _, missing = cache.get_many(texts(0, 5))
+    assert cache.count == 0
+    assert missing == list(range(5))
+
+    # The next save replaces the damaged files
+    cache.put_many(texts(0, 5), vectors(0, 5))
+    cache.save()
+    with open(os.path.join(path, 'meta.json')) as f:
+        assert json.load(f)['count'] == 5
+    assert EmbeddingCache(path, NAMESPACE).get_many(texts(0, 5))[1] == []
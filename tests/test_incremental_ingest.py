@@ -0,0 +1,148 @@
+"""
+Tests for incremental ingestion: the manifest diff against Drive's listing.
+"""
+
+import json
+import os
+
+import faiss
+import pytest
+
+from benchmarks.stubs import StubDriveService
+from chunk_store import ChunkStore
+from conftest import lesson_pages, write_pdf
+
+MTIME = 1700000000
+
+
+def read_manifest():
+    with open('ingest_manifest.json', 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def stored_vector_ids():
+    """Vector IDs in the FAISS index and in the chunk store."""
+    index = faiss.read_index('document.index')
+    store = ChunkStore('chunk_store')
+    try:
+        store_ids = sorted(int(vector_id) for vector_id in store.column('vector_id'))
+        sources = {store[row]['source'] for row in range(len(store))}
+    finally:
+        store.close()
+    index_ids = sorted(int(vector_id) for vector_id in faiss.vector_to_array(index.id_map))
+    return index_ids, store_ids, sources
+
+
+def ingest(drive_folder, make_ingester):
+    ingester = make_ingester(StubDriveService(drive_folder))
+    assert ingester.process_folder('folder')
+    return ingester
+
+
+@pytest.fixture
+def folder(drive_folder):
+    write_pdf(os.path.join(drive_folder, 'fractions.pdf'), lesson_pages('fractions'), MTIME)
+    write_pdf(os.path.join(drive_folder, 'decimals.pdf'), lesson_pages('decimals'), MTIME)
+    write_pdf(os.path.join(drive_folder, 'scanned.pdf'), ['', ''], MTIME)
+    return drive_folder
+
+
+def test_first_run_records_every_file(folder, make_ingester):
+    ingester = ingest(folder, make_ingester)
+
+    files = read_manifest()['files']
+    assert set(files) == {'fractions', 'decimals', 'scanned'}
+    assert files['scanned']['vector_ids'] == []
+    assert files['fractions']['vector_ids'] and files['decimals']['vector_ids']
+    assert ingester.stats.counters['files_without_text'] == 1
+
+    index_ids, store_ids, sources = stored_vector_ids()
+    recorded = sorted(v for entry in files.values() for v in entry['vector_ids'])
+    assert index_ids == store_ids == recorded
+    assert sources == {'fractions.pdf', 'decimals.pdf'}
+
+
+def test_unchanged_folder_downloads_nothing(folder, make_ingester):
+    ingest(folder, make_ingester)
+    manifest = read_manifest()
+
+    ingester = ingest(folder, make_ingester)
+
+    assert 'files_downloaded' not in ingester.stats.counters
+    assert read_manifest() == manifest
+
+
+def test_changed_file_replaces_its_vectors(folder, make_ingester):
+    ingest(folder, make_ingester)
+    before = read_manifest()
+
+    write_pdf(os.path.join(folder, 'fractions.pdf'), lesson_pages('equivalent fractions', pages=3), MTIME + 10)
+    ingester = ingest(folder, make_ingester)
+
+    after = read_manifest()
+    assert ingester.stats.counters['files_downloaded'] == 1
+    assert after['files']['decimals'] == before['files']['decimals']
+    assert not set(after['files']['fractions']['vector_ids']) & set(before['files']['fractions']['vector_ids'])
+
+    index_ids, store_ids, _ = stored_vector_ids()
+    recorded = sorted(v for entry in after['files'].values() for v in entry['vector_ids'])
+    assert index_ids == store_ids == recorded
+
+
+def test_file_that_loses_its_text_drops_old_vectors(folder, make_ingester):
+    ingest(folder, make_ingester)
+    old_ids = read_manifest()['files']['fractions']['vector_ids']
+
+    write_pdf(os.path.join(folder, 'fractions.pdf'), [''], MTIME + 10)
+    ingest(folder, make_ingester)
+
+    files = read_manifest()['files']
+    assert files['fractions']['vector_ids'] == []
+    index_ids, store_ids, sources = stored_vector_ids()
+    assert not set(index_ids) & set(old_ids)
+    assert index_ids == store_ids == sorted(files['decimals']['vector_ids'])
+    assert sources == {'decimals.pdf'}
+
+    # Still blank and unchanged: nothing to do on the next run
+    ingester = ingest(folder, make_ingester)
+    assert 'files_downloaded' not in ingester.stats.counters
+
+
+def test_deleted_file_is_removed(folder, make_ingester):
+    ingest(folder, make_ingester)
+    decimals = read_manifest()['files']['decimals']
+
+    os.remove(os.path.join(folder, 'fractions.pdf'))
+    os.remove(os.path.join(folder, 'scanned.pdf'))
+    ingester = ingest(folder, make_ingester)
+
+    files = read_manifest()['files']
+    assert files == {'decimals': decimals}
+    assert 'files_downloaded' not in ingester.stats.counters
+    index_ids, store_ids, sources = stored_vector_ids()
+    assert index_ids == store_ids == sorted(decimals['vector_ids'])
+    assert sources == {'decimals.pdf'}
+
+
+def test_vector_ids_are_never_reused(folder, make_ingester):
+    ingest(folder, make_ingester)
+    first = read_manifest()
+
+    write_pdf(os.path.join(folder, 'fractions.pdf'), lesson_pages('fractions again'), MTIME + 10)
+    ingest(folder, make_ingester)
+
+    second = read_manifest()
+    assert min(second['files']['fractions']['vector_ids']) >= first['next_id']
+    assert second['next_id'] == max(second['files']['fractions']['vector_ids']) + 1
+
+
+def test_changed_embedding_backend_rebuilds_everything(folder, make_ingester):
+    ingest(folder, make_ingester)
+
+    ingester = make_ingester(StubDriveService(folder), embedding_backend='int8')
+    assert ingester.process_folder('folder')
+
+    assert ingester.stats.counters['files_downloaded'] == 3
+    assert read_manifest()['settings']['embedding_backend'] == 'int8'
+    index_ids, store_ids, _ = stored_vector_ids()
+    assert index_ids == store_ids
@@ -0,0 +1,71 @@
+"""
+Tests for word chunking in DocumentIngester.
+"""
+
+import pytest
+
+from ingest import DocumentIngester
+
+
+def make_ingester(chunk_size, chunk_overlap):
+    return DocumentIngester(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                            embedding_cache_dir=None, stats_path=None)
+
+
+def reference_chunks(words, chunk_size, chunk_overlap):
+    """Chunks of the original single-text algorithm: one per start position."""
+    return [' '.join(words[i:i + chunk_size]) for i in range(0, len(words), chunk_size - chunk_overlap)]
+
+
+@pytest.mark.parametrize('chunk_size, chunk_overlap, word_count', [
+    (10, 3, 47), (10, 3, 10), (10, 0, 30), (7, 6, 20), (300, 50, 1000),
+])
+def test_pages_chunk_like_a_single_text(chunk_size, chunk_overlap, word_count):
+    words = [f"w{i}" for i in range(word_count)]
+    pages = [(page + 1, ' '.join(words[page * 9:(page + 1) * 9])) for page in range((word_count + 8) // 9)]
+
+    chunks = list(make_ingester(chunk_size, chunk_overlap).chunk_pages_by_words(pages))
+
+    assert [c['text'] for c in chunks] == reference_chunks(words, chunk_size, chunk_overlap)
+    for chunk in chunks:
+        assert words[chunk['start_word']:chunk['end_word']] == chunk['text'].split()
+        assert chunk['page_start'] == chunk['start_word'] // 9 + 1
+        assert chunk['page_end'] == (chunk['end_word'] - 1) // 9 + 1
+
+
+def test_consecutive_chunks_share_the_overlap():
+    words = [f"w{i}" for i in range(40)]
+
+    chunks = list(make_ingester(10, 4).chunk_pages_by_words([(1, ' '.join(words))]))
+
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert previous['text'].split()[-4:] == chunk['text'].split()[:4]
+
+
+def test_short_text_is_one_chunk():
+    chunks = list(make_ingester(300, 50).chunk_pages_by_words([(1, 'a short page'), (2, 'and another')]))
+
+    assert len(chunks) == 1
+    assert chunks[0]['text'] == 'a short page and another'
+    assert (chunks[0]['page_start'], chunks[0]['page_end']) == (1, 2)
+
+
+def test_empty_pages_yield_no_chunks():
+    assert list(make_ingester(10, 3).chunk_pages_by_words([(1, ''), (2, '  ')])) == []
+
+
+@pytest.mark.parametrize('chunk_size, chunk_overlap', [(50, 50), (50, 80), (50, -1)])
+def test_invalid_overlap_is_rejected(chunk_size, chunk_overlap):
+    with pytest.raises(ValueError):
+        make_ingester(chunk_size, chunk_overlap)
+
+
+def test_chunk_text_skips_very_short_chunks():
+    ingester = make_ingester(10, 2)
+    text = ' '.join(f"longer-word-{i}" for i in range(10)) + ' tail'
+
+    chunks = ingester.chunk_text(text, 'lesson.pdf')
+
+    assert [c['chunk_id'] for c in chunks] == [0]
+    assert chunks[0]['source'] == 'lesson.pdf'
+    assert chunks[0]['word_count'] == 10
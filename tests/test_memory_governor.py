@@ -0,0 +1,64 @@
+"""
+Tests for the memory governor's budget, LLM shedding and collection eviction.
+"""
+
+import time
+
+import pytest
+
+from collection_registry import Collection, CollectionRegistry
+from memory_governor import MemoryGovernor, MemoryPressureError
+
+MB = 1024 * 1024
+
+
+def governor_at(rss_mb, **options):
+    governor = MemoryGovernor(**options)
+    governor.rss = lambda: int(rss_mb * MB)
+    return governor
+
+
+def test_no_budget_never_collects_or_sheds():
+    governor = governor_at(10 ** 6)
+    hooks = []
+    governor.add_release_hook(lambda: hooks.append(True))
+
+    governor.admit_llm()
+    governor.after_request()
+
+    assert governor.pressure() == 'ok'
+    assert (governor.llm_admitted, governor.llm_shed, governor.collections) == (1, 0, 0)
+    assert hooks == []
+    assert governor.stats()['budget_mb'] is None
+
+
+def test_over_budget_generation_is_shed_after_queueing():
+    governor = governor_at(990, budget_mb=1000, queue_timeout=0.05, poll_interval=0.01, gc_interval=0)
+
+    with pytest.raises(MemoryPressureError):
+        governor.admit_llm()
+
+    assert (governor.llm_queued, governor.llm_shed, governor.llm_admitted) == (1, 1, 0)
+
+
+def test_generation_is_admitted_below_shed_ratio():
+    governor = governor_at(850, budget_mb=1000)
+
+    governor.admit_llm()
+
+    assert governor.pressure() == 'high'
+    assert governor.llm_admitted == 1
+
+
+def test_collections_used_recently_are_not_evicted(tmp_path):
+    registry = CollectionRegistry(root=str(tmp_path))
+    for name in ('old', 'recent'):
+        registry.loaded[name] = Collection(name, str(tmp_path / name))
+    registry.loaded['old'].last_used = time.time() - 60
+
+    assert registry.evict_one(idle_seconds=10)
+    assert list(registry.loaded) == ['recent']
+    assert not registry.evict_one(idle_seconds=10)
+    assert list(registry.loaded) == ['recent']
+    assert registry.evict_one()
+    assert not registry.loaded
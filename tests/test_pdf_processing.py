@@ -0,0 +1,90 @@
+"""
+Tests for PDF extraction in worker processes, what those processes import and
+the spool files the ingestion pipeline streams chunks and embeddings through.
+"""
+
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from benchmarks.stubs import StubDriveService
+from chunk_store import ChunkStore
+from conftest import REPO_ROOT, lesson_pages, write_pdf
+from pdf_processing import read_spooled_chunks
+
+HEAVY_MODULES = ('torch', 'sentence_transformers', 'transformers', 'faiss', 'googleapiclient', 'inference_backends')
+
+
+def imported_modules(statement, cwd):
+    """Heavy modules loaded by a fresh interpreter after running a statement."""
+    code = f"import sys; {statement}; print('loaded:' + ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([REPO_ROOT] + sys.path))
+    result = subprocess.run([sys.executable, '-c', code], cwd=cwd, env=env, capture_output=True, text=True, check=True)
+    # PyMuPDF may print a deprecation notice first
+    line = next(line for line in result.stdout.splitlines() if line.startswith('loaded:'))
+    return [name for name in line[len('loaded:'):].split(',') if name]
+
+
+def stored_chunks():
+    store = ChunkStore('chunk_store')
+    try:
+        return sorted((store[row]['source'], store[row]['chunk_id'], store[row]['text']) for row in range(len(store)))
+    finally:
+        store.close()
+
+
+def test_worker_processes_chunk_like_the_main_process(drive_folder, make_ingester):
+    for topic in ('fractions', 'decimals', 'geometry'):
+        write_pdf(os.path.join(drive_folder, f"{topic}.pdf"), lesson_pages(topic, pages=3))
+
+    assert make_ingester(StubDriveService(drive_folder)).process_folder('folder')
+    in_process = stored_chunks()
+    ingester = make_ingester(StubDriveService(drive_folder), extract_workers=2, incremental=False)
+    assert ingester.process_folder('folder')
+
+    assert stored_chunks() == in_process
+    assert ingester.stats.counters['files_extracted'] == 3
+
+
+def test_workers_and_ingest_import_no_model_stack(tmp_path):
+    assert imported_modules('import pdf_processing', tmp_path) == []
+    # Spawned workers also import ingest.py when it runs as a script
+    assert imported_modules('import ingest', tmp_path) == []
+    assert not os.path.exists(tmp_path / 'ingestion.log')
+
+
+@pytest.mark.parametrize('extract_workers', [0, 2])
+def test_pipeline_spools_chunks_and_embeddings(drive_folder, make_ingester, tmp_path, extract_workers):
+    for topic in ('fractions', 'decimals'):
+        write_pdf(os.path.join(drive_folder, f"{topic}.pdf"), lesson_pages(topic, pages=3))
+    with open(os.path.join(drive_folder, 'broken.pdf'), 'wb') as f:
+        f.write(b'not a pdf')
+    ingester = make_ingester(StubDriveService(drive_folder), extract_workers=extract_workers)
+    work_dir = str(tmp_path / 'spool')
+    os.makedirs(work_dir)
+
+    processed, embeddings = ingester.run_pipeline(ingester.get_pdf_files_from_folder('folder'), 100, work_dir)
+
+    # The broken file is left out and the per-file spools are gone
+    assert sorted(file_info['name'] for file_info, _ in processed) == ['decimals.pdf', 'fractions.pdf']
+    assert sorted(os.listdir(work_dir)) == ['chunks.jsonl', 'embeddings.f32']
+    chunks = list(read_spooled_chunks(os.path.join(work_dir, 'chunks.jsonl')))
+    vector_ids = [vector_id for _, ids in processed for vector_id in ids]
+    assert vector_ids == [chunk['vector_id'] for chunk in chunks] == list(range(100, 100 + len(chunks)))
+    assert isinstance(embeddings, np.memmap)
+    np.testing.assert_allclose(embeddings, ingester.create_embeddings([chunk['text'] for chunk in chunks]))
+
+
+def test_process_pdf_hands_chunks_to_the_sink(drive_folder, make_ingester):
+    path = write_pdf(os.path.join(drive_folder, 'fractions.pdf'), lesson_pages('fractions', pages=3))
+    ingester = make_ingester(StubDriveService(drive_folder))
+    received = []
+
+    count = ingester.process_pdf({'name': 'fractions.pdf'}, path, received.append)
+
+    assert count == len(received) > 1
+    assert [chunk['chunk_id'] for chunk in received] == list(range(count))
+    assert (received[0]['page_start'], received[-1]['page_end']) == (1, 3)
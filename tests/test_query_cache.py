@@ -0,0 +1,175 @@
+"""
+Tests for the query embedding cache, the response cache and query normalization.
+"""
+
+import numpy as np
+import pytest
+
+import query_cache
+from query_cache import QueryEmbeddingCache, ResponseCache, normalize_query
+
+
+class Clock:
+    """Stand-in for time.time that only moves when told to."""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(query_cache.time, 'time', clock)
+    return clock
+
+
+def vector(value, dim=4):
+    return np.full(dim, value, dtype=np.float32)
+
+
+def test_normalize_query_drops_case_whitespace_and_duration():
+    assert normalize_query("  Fractions   Lesson? Duration: 45 minutes") == 'fractions lesson'
+    assert normalize_query("fractions lesson") == normalize_query("FRACTIONS\tLESSON!")
+
+
+def test_hit_returns_the_stored_vector(clock):
+    cache = QueryEmbeddingCache()
+    cache.put('fractions', vector(1.0))
+
+    cached = cache.get('fractions')
+
+    np.testing.assert_array_equal(cached, vector(1.0))
+    assert not cached.flags.writeable
+    assert cache.get('decimals') is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = QueryEmbeddingCache(ttl_seconds=60)
+    cache.put('fractions', vector(1.0))
+
+    clock.now += 60
+    assert cache.get('fractions') is not None
+    clock.now += 1
+    assert cache.get('fractions') is None
+
+    stats = cache.stats()
+    assert stats['expirations'] == 1
+    assert stats['entries'] == 0
+    assert stats['memory_kb'] == 0
+
+
+def test_zero_ttl_keeps_entries(clock):
+    cache = QueryEmbeddingCache(ttl_seconds=0)
+    cache.put('fractions', vector(1.0))
+
+    clock.now += 10 ** 9
+
+    assert cache.get('fractions') is not None
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = QueryEmbeddingCache(max_items=2)
+    cache.put('a', vector(1.0))
+    cache.put('b', vector(2.0))
+    cache.get('a')
+
+    cache.put('c', vector(3.0))
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.evictions == 1
+
+
+def test_byte_limit_evicts_oldest_entries(clock):
+    dim = 1024  # 4 KB per vector
+    cache = QueryEmbeddingCache(max_mb=10 / 1024)  # Room for two vectors and their keys
+    for key in ('a', 'b', 'c'):
+        cache.put(key, vector(1.0, dim))
+
+    assert list(cache.entries) == ['b', 'c']
+    assert cache.bytes <= cache.max_bytes
+    assert cache.evictions == 1
+
+
+def test_replacing_a_key_keeps_byte_count(clock):
+    cache = QueryEmbeddingCache()
+    cache.put('a', vector(1.0))
+    cache.put('a', vector(2.0))
+
+    assert len(cache.entries) == 1
+    assert cache.bytes == vector(2.0).nbytes + len('a')
+    np.testing.assert_array_equal(cache.get('a'), vector(2.0))
+
+
+def test_sqlite_tier_is_shared_between_caches(clock, tmp_path):
+    path = str(tmp_path / 'query_cache.sqlite')
+    writer = QueryEmbeddingCache(backend='sqlite', sqlite_path=path, ttl_seconds=60)
+    reader = QueryEmbeddingCache(backend='sqlite', sqlite_path=path, ttl_seconds=60)
+    writer.put('fractions', vector(1.0))
+
+    np.testing.assert_array_equal(reader.get('fractions'), vector(1.0))
+    assert reader.shared_hits == 1
+    # Now also in the reader's own LRU
+    reader.get('fractions')
+    assert reader.shared_hits == 1
+
+
+def test_sqlite_tier_respects_ttl(clock, tmp_path):
+    path = str(tmp_path / 'query_cache.sqlite')
+    writer = QueryEmbeddingCache(backend='sqlite', sqlite_path=path, ttl_seconds=60)
+    reader = QueryEmbeddingCache(backend='sqlite', sqlite_path=path, ttl_seconds=60)
+    writer.put('fractions', vector(1.0))
+
+    clock.now += 61
+
+    assert reader.get('fractions') is None
+    assert reader.shared_hits == 0
+
+
+def test_response_cache_evicts_least_recently_used():
+    cache = ResponseCache(capacity=2)
+    cache.put(('a', 1), {'response': 'A'})
+    cache.put(('b', 1), {'response': 'B'})
+    cache.get(('a', 1))
+
+    cache.put(('c', 1), {'response': 'C'})
+
+    assert cache.get(('b', 1)) is None
+    assert cache.get(('a', 1)) == {'response': 'A'}
+    assert cache.stats()['entries'] == 2
+
+
+def test_response_cache_returns_copies():
+    cache = ResponseCache()
+    result = {'response': 'A'}
+    cache.put('a', result)
+    result['response'] = 'changed'
+
+    cached = cache.get('a')
+    cached['cached'] = True
+
+    assert cache.get('a') == {'response': 'A'}
+
+
+def test_zero_capacity_disables_response_cache():
+    cache = ResponseCache(capacity=0)
+    cache.put('a', {'response': 'A'})
+
+    assert cache.get('a') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_clear_counts_invalidations():
+    cache = ResponseCache()
+    cache.put('a', {'response': 'A'})
+
+    cache.clear()
+
+    assert cache.get('a') is None
+    stats = cache.stats()
+    assert stats['invalidations'] == 1
+    assert (stats['hits'], stats['misses']) == (0, 1)
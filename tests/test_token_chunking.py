@@ -0,0 +1,112 @@
+"""
+Tests for sentence-aware chunking sized in tokenizer tokens.
+"""
+
+import pytest
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+from transformers import PreTrainedTokenizerFast
+
+from token_chunking import chunk_pages_by_tokens, sentence_spans
+
+
+@pytest.fixture(scope='module')
+def tokenizer():
+    """Fast tokenizer with one token per word or punctuation run."""
+    backend = Tokenizer(WordLevel({'[UNK]': 0}, unk_token='[UNK]'))
+    backend.pre_tokenizer = Whitespace()
+    return PreTrainedTokenizerFast(tokenizer_object=backend, unk_token='[UNK]')
+
+
+def count_tokens(tokenizer, text):
+    return len(tokenizer(text, add_special_tokens=False)['input_ids'])
+
+
+def sentence(number, words=5):
+    return ' '.join(f"word{number}x{i}" for i in range(words)) + '.'
+
+
+def test_chunks_fit_and_are_slices_of_the_document(tokenizer):
+    pages = [(1, ' '.join(sentence(n) for n in range(10))),
+             (2, ' '.join(sentence(n) for n in range(10, 20)))]
+    document = '\n'.join(text for _, text in pages)
+
+    chunks = list(chunk_pages_by_tokens(pages, tokenizer, max_tokens=20))
+
+    assert len(chunks) == 7  # 6 tokens per sentence, 3 sentences per chunk
+    for chunk in chunks:
+        assert chunk['token_count'] <= 20
+        assert chunk['token_count'] == count_tokens(tokenizer, chunk['text'])
+        assert document[chunk['start_char']:chunk['end_char']] == chunk['text']
+    assert chunks[0]['text'] == f"{sentence(0)} {sentence(1)} {sentence(2)}"
+    assert chunks[-1]['text'].endswith(sentence(19))
+
+
+def test_chunks_record_their_pages(tokenizer):
+    pages = [(3, f"{sentence(0)} {sentence(1)}"), (4, sentence(2)), (5, sentence(3))]
+
+    chunks = list(chunk_pages_by_tokens(pages, tokenizer, max_tokens=12))
+
+    assert [(c['page_start'], c['page_end']) for c in chunks] == [(3, 3), (4, 5)]
+
+
+def test_long_sentence_is_split_into_overlapping_windows(tokenizer):
+    long_sentence = ' '.join(f"w{i}" for i in range(25)) + '.'
+
+    chunks = list(chunk_pages_by_tokens([(1, long_sentence)], tokenizer, max_tokens=10, overlap_tokens=2))
+
+    assert all(c['token_count'] <= 10 for c in chunks)
+    assert chunks[0]['text'].split() == [f"w{i}" for i in range(10)]
+    assert chunks[1]['text'].split()[:2] == ['w8', 'w9']
+    assert chunks[-1]['text'].endswith('w24.')
+
+
+def test_overlap_repeats_trailing_sentences(tokenizer):
+    text = ' '.join(sentence(n, words=3) for n in range(6))  # 4 tokens per sentence
+
+    chunks = list(chunk_pages_by_tokens([(1, text)], tokenizer, max_tokens=12, overlap_tokens=4))
+
+    assert chunks[0]['text'] == ' '.join(sentence(n, words=3) for n in range(3))
+    assert chunks[1]['text'].startswith(sentence(2, words=3))
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk['start_char'] < previous['end_char']
+
+
+def test_no_overlap_when_overlap_is_zero(tokenizer):
+    text = ' '.join(sentence(n, words=3) for n in range(6))
+
+    chunks = list(chunk_pages_by_tokens([(1, text)], tokenizer, max_tokens=12))
+
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk['start_char'] > previous['end_char']
+
+
+def test_sentence_across_a_page_break_stays_together(tokenizer):
+    pages = [(1, f"{sentence(0)} The lesson continues"), (2, f"on the next page. {sentence(1)}")]
+
+    chunks = list(chunk_pages_by_tokens(pages, tokenizer, max_tokens=8))
+
+    spanning = [c for c in chunks if 'continues\non the next page.' in c['text']]
+    assert len(spanning) == 1
+    assert (spanning[0]['page_start'], spanning[0]['page_end']) == (1, 2)
+
+
+def test_empty_pages_yield_no_chunks(tokenizer):
+    assert list(chunk_pages_by_tokens([(1, ''), (2, '   \n ')], tokenizer, max_tokens=8)) == []
+
+
+def test_slow_tokenizer_is_rejected():
+    class SlowTokenizer:
+        is_fast = False
+
+    with pytest.raises(ValueError):
+        list(chunk_pages_by_tokens([(1, 'Some text.')], SlowTokenizer(), max_tokens=8))
+
+
+def test_sentence_boundaries():
+    text = "First line wraps\nonto the next. Second sentence!\n\nHeading\nBody text"
+
+    sentences = [text[start:end] for start, end in sentence_spans(text)]
+
+    assert sentences == ["First line wraps\nonto the next.", "Second sentence!", "Heading\nBody text"]
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Educational Assistant - Token-Aware Chunking
+Splits extracted text into chunks that fit the embedding model's sequence
+window, measured with the model's own tokenizer, breaking at sentence
+boundaries where possible.
+
+Sentences are tokenized in batches with a fast (Rust) tokenizer; offset
+mappings tie every token back to a character span, so chunks are exact slices
+of the original text and a sentence longer than the window is cut at a token
+boundary. Documents can be fed page by page, and each chunk records the pages
+it spans.
+"""
+
+import re
+import bisect
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+# A sentence ends at ., ! or ? followed by whitespace, or at a blank line.
+# Single line breaks are PDF line wrapping, not boundaries.
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+|\n\s*\n\s*')
+SENTENCE_END = '.!?'
+
+
+def sentence_spans(text: str, pos: int = 0) -> List[Tuple[int, int]]:
+    """(start, end) character spans of the sentences in text[pos:], without surrounding whitespace."""
+    end_of_text = len(text.rstrip())
+    start = pos
+    while start < end_of_text and text[start].isspace():
+        start += 1
+    spans = []
+    for match in SENTENCE_BOUNDARY.finditer(text, start, end_of_text):
+        if match.start() > start:
+            spans.append((start, match.start()))
+        start = match.end()
+    if start < end_of_text:
+        spans.append((start, end_of_text))
+    return spans
+
+
+def chunk_window(tokenizer: Any, max_seq_length: int) -> int:
+    """Content tokens that fit the model's window once its special tokens ([CLS], [SEP]) are added."""
+    return max(1, max_seq_length - tokenizer.num_special_tokens_to_add(pair=False))
+
+
+def token_units(text: str, spans: List[Tuple[int, int]], tokenizer: Any, max_tokens: int,
+                overlap_tokens: int, batch_size: int) -> List[Tuple[int, int, int]]:
+    """
+    (start, end, token_count) units no longer than max_tokens: whole sentences,
+    or windows of longer ones cut at token boundaries and overlapping by
+    overlap_tokens, like word chunking, since they have no sentence boundary.
+    """
+    step = max(1, max_tokens - overlap_tokens)
+    units = []
+    for first in range(0, len(spans), batch_size):
+        batch = spans[first:first + batch_size]
+        encoded = tokenizer([text[start:end] for start, end in batch], add_special_tokens=False,
+                            return_offsets_mapping=True, return_attention_mask=False)
+        for (start, end), offsets in zip(batch, encoded['offset_mapping']):
+            if not offsets:
+                continue
+            if len(offsets) <= max_tokens:
+                units.append((start, end, len(offsets)))
+                continue
+            for piece in range(0, len(offsets), step):
+                part = offsets[piece:piece + max_tokens]
+                units.append((start + part[0][0], start + part[-1][1], len(part)))
+                if piece + max_tokens >= len(offsets):
+                    break
+    return units
+
+
+def chunk_pages_by_tokens(pages: Iterable[Tuple[int, str]], tokenizer: Any, max_tokens: int,
+                          overlap_tokens: int = 0, batch_size: int = 256) -> Iterator[Dict[str, Any]]:
+    """
+    Split a document, read page by page, into chunks of at most max_tokens tokens.
+
+    Whole sentences are packed into each chunk; consecutive chunks share the
+    trailing sentences of the previous chunk that fit in overlap_tokens. A
+    sentence running onto the next page is held back until that page arrives.
+    Only the text of the chunk being packed is kept, so memory does not grow
+    with the number of pages.
+
+    Args:
+        pages: (page_number, text) pairs in order; the document text they make
+            up, which start_char / end_char refer to, is the pages joined by newlines
+        tokenizer: Fast Hugging Face tokenizer of the embedding model
+        max_tokens: Token budget of a chunk, excluding special tokens
+        overlap_tokens: Token budget of the sentences repeated from the previous chunk
+        batch_size: Sentences tokenized per tokenizer call
+
+    Yields:
+        Dicts with 'text', 'start_char', 'end_char', 'token_count', 'page_start' and 'page_end'
+    """
+    if not getattr(tokenizer, 'is_fast', False):
+        raise ValueError("Token-aware chunking needs a fast tokenizer for offset mappings")
+    max_tokens = max(1, max_tokens)
+
+    buffer = ''        # document text from buffer_start on
+    buffer_start = 0
+    scanned = 0        # document offset up to which sentences have been turned into units
+    page_starts: List[int] = []
+    page_numbers: List[int] = []
+    current: List[Tuple[int, int, int]] = []
+    tokens = 0
+
+    def page_of(offset: int) -> int:
+        return page_numbers[bisect.bisect_right(page_starts, offset) - 1]
+
+    def make_chunk(group: List[Tuple[int, int, int]]) -> Dict[str, Any]:
+        start, end = group[0][0], group[-1][1]
+        return {
+            'text': buffer[start - buffer_start:end - buffer_start],
+            'start_char': start,
+            'end_char': end,
+            'token_count': sum(unit[2] for unit in group),
+            'page_start': page_of(start),
+            'page_end': page_of(end - 1)
+        }
+
+    def pack(spans: List[Tuple[int, int]]) -> Iterator[Dict[str, Any]]:
+        """Pack units greedily, carrying trailing sentences over as overlap."""
+        nonlocal current, tokens
+        for start, end, count in token_units(buffer, spans, tokenizer, max_tokens, overlap_tokens, batch_size):
+            unit = (buffer_start + start, buffer_start + end, count)
+            if current and tokens + count > max_tokens:
+                yield make_chunk(current)
+                carried: List[Tuple[int, int, int]] = []
+                carried_tokens = 0
+                for previous in reversed(current):
+                    if carried_tokens + previous[2] > overlap_tokens:
+                        break
+                    carried.insert(0, previous)
+                    carried_tokens += previous[2]
+                if carried_tokens + count > max_tokens:
+                    carried, carried_tokens = [], 0
+                current, tokens = carried, carried_tokens
+            current.append(unit)
+            tokens += count
+
+    for page_number, text in pages:
+        if page_starts:
+            buffer += '\n'
+        page_starts.append(buffer_start + len(buffer))
+        page_numbers.append(page_number)
+        buffer += text
+
+        spans = sentence_spans(buffer, scanned - buffer_start)
+        # An unfinished last sentence may continue on the next page (held for one page at most)
+        if spans and buffer[spans[-1][1] - 1] not in SENTENCE_END \
+                and buffer_start + spans[-1][0] >= page_starts[-1]:
+            scanned = buffer_start + spans.pop()[0]
+        else:
+            scanned = buffer_start + len(buffer)
+        yield from pack(spans)
+
+        # Drop text that no pending sentence or chunk refers to any more
+        keep = min(current[0][0], scanned) if current else scanned
+        buffer = buffer[keep - buffer_start:]
+        buffer_start = keep
+
+    yield from pack(sentence_spans(buffer, scanned - buffer_start))
+    if current:
+        yield make_chunk(current)
+